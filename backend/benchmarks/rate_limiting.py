@@ -0,0 +1,99 @@
+"""
+Benchmark rate limit checks: slowapi's default path vs the shared engine
+
+The baseline is what slowapi's Limiter ran per request: a fixed window hit
+on limits' in-memory storage. It needs the old dependency installed
+(pip install slowapi). The engine is measured for the per-request decision
+and for one background sync of every active key.
+
+Run from the backend directory:
+    python benchmarks/rate_limiting.py [clients]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add backend to path for benchmarking
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from ratelimit import MemoryStorage, Rate, RateLimiter
+
+HITS = 200_000
+REPEATS = 5
+LIMIT = "1000000/minute"
+
+
+def best_of(func) -> float:
+    """Best-of-REPEATS wall time in seconds"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def slowapi_baseline(keys):
+    """Per-hit microseconds of slowapi's default storage and strategy"""
+    try:
+        from limits import parse
+        from limits.storage import MemoryStorage as LimitsMemoryStorage
+        from limits.strategies import FixedWindowRateLimiter
+    except ImportError:
+        return None
+    strategy = FixedWindowRateLimiter(LimitsMemoryStorage())
+    item = parse(LIMIT)
+
+    def run():
+        for i in range(HITS):
+            strategy.hit(item, keys[i % len(keys)])
+
+    return best_of(run) / HITS * 1_000_000
+
+
+def engine_hits(keys) -> float:
+    """Per-hit microseconds of the sliding window engine"""
+    limiter = RateLimiter(MemoryStorage())
+    rate = Rate.parse(LIMIT)
+
+    def run():
+        for i in range(HITS):
+            limiter.hit(keys[i % len(keys)], rate)
+
+    return best_of(run) / HITS * 1_000_000
+
+
+def engine_sync(keys) -> float:
+    """Milliseconds for one sync with every key active"""
+    limiter = RateLimiter(MemoryStorage())
+    rate = Rate.parse(LIMIT)
+
+    def run():
+        for key in keys:
+            limiter.hit(key, rate)
+        asyncio.run(limiter.sync())
+
+    return best_of(run) * 1000
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    keys = [f"routers.users.get_users:10.0.{i // 256}.{i % 256}" for i in range(clients)]
+
+    baseline_us = slowapi_baseline(keys)
+    engine_us = engine_hits(keys)
+    print(f"clients: {clients}, hits: {HITS}")
+    if baseline_us is None:
+        print("slowapi baseline skipped (pip install slowapi to compare)")
+    else:
+        print(f"slowapi (fixed window, in-memory):     {baseline_us:.2f} us/hit")
+    print(f"engine (sliding window, pre-aggregated): {engine_us:.2f} us/hit")
+    if baseline_us is not None:
+        print(f"ratio: {baseline_us / engine_us:.1f}x")
+    print(f"sync of {clients} active keys: {engine_sync(keys):.2f} ms (off the request path)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark list response serialization: validated response models vs orjson
+
+Run from the backend directory:
+    python benchmarks/serialization.py [rows]
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import TypeAdapter
+
+# Add backend to path for benchmarking
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from beanie.odm.utils.init import Initializer
+from entities.enrollments import Enrollment, EnrollmentResponse
+from serializers import enrollment_serializer
+
+REPEATS = 5
+
+
+def bind_without_server(document_model) -> None:
+    """Initialize Beanie settings for a model without contacting MongoDB"""
+    client = AsyncIOMotorClient("mongodb://localhost:1", connect=False)
+    Initializer.set_default_class_vars(document_model)
+    Initializer.init_settings(None, document_model)
+    document_model.set_collection(client["benchmark"][document_model.Settings.name])
+
+
+def make_rows(count: int) -> List[dict]:
+    """Build enrollment documents as MongoDB returns them"""
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": ObjectId(),
+            "course_id": ObjectId(),
+            "status": "active",
+            "progress": float(i % 100),
+            "enrolled_at": datetime(2024, 1, 1, 9, 30, 0, 123000),
+            "completed_at": None,
+            "last_accessed": datetime(2024, 2, 1, 17, 45, 0, 456000),
+        }
+        for i in range(count)
+    ]
+
+
+def before(rows: List[dict]) -> bytes:
+    """Previous path: Beanie document -> model_dump -> *Response -> FastAPI"""
+    adapter = TypeAdapter(List[EnrollmentResponse])
+    result = []
+    for row in rows:
+        enrollment_dict = Enrollment.model_validate(row).model_dump()
+        if "_id" in enrollment_dict:
+            enrollment_dict["id"] = enrollment_dict.pop("_id")
+        result.append(EnrollmentResponse(**enrollment_dict))
+    # FastAPI validates the return value against response_model, then renders it
+    content = adapter.dump_python(adapter.validate_python(result), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def after(rows: List[dict]) -> bytes:
+    """Current path: projected raw document -> orjson"""
+    return enrollment_serializer.dumps_many(rows)
+
+
+def per_row_microseconds(func, rows: List[dict]) -> float:
+    """Best-of-REPEATS time per row in microseconds"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(rows) * 1_000_000
+
+
+def main() -> None:
+    rows_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    bind_without_server(Enrollment)
+    rows = make_rows(rows_count)
+
+    assert json.loads(before(rows)) == json.loads(after(rows))
+
+    before_us = per_row_microseconds(before, rows)
+    after_us = per_row_microseconds(after, rows)
+    print(f"rows: {rows_count}")
+    print(f"before (model_dump -> Response -> response_model): {before_us:.2f} us/row")
+    print(f"after  (orjson serializer):                        {after_us:.2f} us/row")
+    print(f"speedup: {before_us / after_us:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+In-process read cache for ScottLMS documents and list queries
+
+Entries are raw MongoDB documents (or pages of them) held in an LRU bounded
+by an estimate of their BSON size. Single documents are keyed by collection
+and _id, list pages by collection and the normalized query. Routers call
+invalidate() after every write: the written documents' entries are dropped
+along with every cached list that reads the collection. Listeners (see
+invalidation.py) forward those tags to the other replicas.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+
+import bson
+from beanie import Document
+from bson import json_util
+from prometheus_client import Counter, Gauge
+
+# Cache configuration; CACHE_MAX_BYTES=0 disables caching
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", "5"))
+
+# Bookkeeping overhead charged to every entry on top of its documents
+ENTRY_OVERHEAD_BYTES = 256
+
+# Metrics
+CACHE_HITS = Counter(
+    "cache_hits_total", "Cache lookups served from memory", ["collection"]
+)
+CACHE_MISSES = Counter(
+    "cache_misses_total", "Cache lookups that went to MongoDB", ["collection"]
+)
+CACHE_EVICTIONS = Counter(
+    "cache_evictions_total", "Entries removed from the cache", ["reason"]
+)
+CACHE_BYTES = Gauge("cache_bytes", "Estimated size of cached documents")
+CACHE_ENTRIES = Gauge("cache_entries", "Number of cached entries")
+
+MISSING = object()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float
+    tags: Tuple[str, ...]
+
+
+def collection_name(document_model: Type[Document]) -> str:
+    """Name of the collection a Beanie document class is stored in"""
+    return document_model.Settings.name
+
+
+def document_tag(collection: str, document_id: Any) -> str:
+    """Tag carried by every cached copy of one document"""
+    return f"{collection}/{document_id}"
+
+
+def query_key(collection: str, **query: Any) -> Tuple[str, str, str]:
+    """Cache key for a list query, stable across dict ordering"""
+    return ("query", collection, json_util.dumps(query, sort_keys=True))
+
+
+def document_key(
+    collection: str, document_id: Any, projection: Any
+) -> Tuple[str, str, str]:
+    """Cache key for one document fetched with a projection"""
+    return (
+        "document",
+        collection,
+        json_util.dumps([document_id, projection], sort_keys=True),
+    )
+
+
+def estimate_size(documents: Iterable[Optional[Dict[str, Any]]]) -> int:
+    """Approximate memory held by documents, using their BSON size"""
+    size = ENTRY_OVERHEAD_BYTES
+    for document in documents:
+        if document:
+            size += len(bson.encode(document))
+    return size
+
+
+class DocumentCache:
+    """LRU cache with a byte budget, TTLs and tag-based invalidation"""
+
+    def __init__(
+        self,
+        max_bytes: int = CACHE_MAX_BYTES,
+        ttl: float = CACHE_TTL_SECONDS,
+        negative_ttl: float = CACHE_NEGATIVE_TTL_SECONDS,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.bytes = 0
+        # Bumped by every invalidation; see put(since=...)
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._tagged: Dict[str, Set[Hashable]] = {}
+        # Called with the tags of every local invalidation
+        self._listeners: List[Callable[[List[str]], None]] = []
+
+    @property
+    def enabled(self) -> bool:
+        """Whether values are cached at all"""
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable, collection: str) -> Any:
+        """Return the cached value, or MISSING if absent or expired"""
+        if not self.enabled:
+            return MISSING
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key, "expired")
+            entry = None
+        if entry is None:
+            CACHE_MISSES.labels(collection).inc()
+            return MISSING
+        self._entries.move_to_end(key)
+        CACHE_HITS.labels(collection).inc()
+        return entry.value
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        size: int,
+        tags: Iterable[str],
+        negative: bool = False,
+        since: Optional[int] = None,
+    ) -> None:
+        """
+        Cache a value, evicting least recently used entries to fit
+
+        Args:
+            key: Cache key
+            value: Value to cache; None records that a document does not exist
+            size: Estimated bytes held by value
+            tags: Invalidation tags the entry is removed with
+            negative: Use the shorter TTL for "not found" results
+            since: version read before the value was fetched; if anything was
+                invalidated meanwhile the value may be stale and is not cached
+        """
+        if not self.enabled or size > self.max_bytes:
+            return
+        if since is not None and since != self.version:
+            return
+        if key in self._entries:
+            self._remove(key, "replaced")
+        ttl = self.negative_ttl if negative else self.ttl
+        entry = _Entry(value, size, time.monotonic() + ttl, tuple(tags))
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tagged.setdefault(tag, set()).add(key)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest, "size")
+        self._update_gauges()
+
+    def subscribe(self, listener: Callable[[List[str]], None]) -> None:
+        """Call listener with the tags of every invalidation made in this process"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[List[str]], None]) -> None:
+        """Stop calling a listener added with subscribe"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def invalidate_tags(self, tags: Iterable[str], notify: bool = True) -> None:
+        """
+        Drop every entry carrying any of the tags
+
+        Args:
+            tags: Tags to drop
+            notify: Pass the tags on to listeners; False when applying an
+                invalidation received from another replica
+        """
+        tags = list(tags)
+        self.version += 1
+        for tag in tags:
+            for key in self._tagged.pop(tag, ()):
+                if key in self._entries:
+                    self._remove(key, "invalidated")
+        self._update_gauges()
+        if notify:
+            for listener in self._listeners:
+                listener(tags)
+
+    def invalidate(self, document_model: Type[Document], *document_ids: Any) -> None:
+        """
+        Drop cached copies of written documents and every list of their collection
+
+        Call after any insert, update or delete; pass the IDs of updated or
+        deleted documents (inserts only need the collection).
+        """
+        collection = collection_name(document_model)
+        self.invalidate_tags(
+            [collection]
+            + [document_tag(collection, document_id) for document_id in document_ids]
+        )
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self.version += 1
+        self._entries.clear()
+        self._tagged.clear()
+        self.bytes = 0
+        self._update_gauges()
+
+    def _remove(self, key: Hashable, reason: str) -> None:
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+        CACHE_EVICTIONS.labels(reason).inc()
+
+    def _update_gauges(self) -> None:
+        CACHE_BYTES.set(self.bytes)
+        CACHE_ENTRIES.set(len(self._entries))
+
+
+# Shared cache instance
+document_cache = DocumentCache()
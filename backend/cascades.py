@@ -0,0 +1,166 @@
+"""
+Cascading cleanup after a user or course is deleted
+
+Enrollments referencing the deleted document are removed by background jobs
+so a course with tens of thousands of students does not hold the DELETE
+request open. The job is recorded before the parent is deleted and works in
+batches, saving its progress after each, so a cascade cut short by a restart
+is resumed by another replica (see jobs.resumable) and never leaves orphaned
+enrollments behind.
+"""
+
+import os
+from collections import Counter
+from typing import Dict, Iterable
+
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+
+from cache import document_cache
+from entities.courses import Course
+from entities.enrollments import Enrollment
+from entities.users import User
+from jobs import Job, resumable
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Enrollments deleted per batch; progress is saved after each
+CASCADE_BATCH_SIZE = int(os.getenv("CASCADE_BATCH_SIZE", "200"))
+
+
+async def decrement_enrollment_counts(per_course: Dict[PydanticObjectId, int]) -> None:
+    """Subtract deleted enrollments from each course's enrollment_count"""
+    if not per_course:
+        return
+    await Course.get_motor_collection().bulk_write(
+        [
+            # Pipeline update so the count never drops below zero
+            UpdateOne(
+                {"_id": course_id},
+                [
+                    {
+                        "$set": {
+                            "enrollment_count": {
+                                "$max": [0, {"$subtract": ["$enrollment_count", count]}]
+                            }
+                        }
+                    }
+                ],
+            )
+            for course_id, count in per_course.items()
+        ],
+        ordered=False,
+    )
+    document_cache.invalidate(Course, *per_course)
+
+
+async def recount_enrollments(course_ids: Iterable[PydanticObjectId]) -> None:
+    """Set each course's enrollment_count from its enrollments"""
+    enrollments = Enrollment.get_motor_collection()
+    courses = Course.get_motor_collection()
+    course_ids = list(course_ids)
+    for course_id in course_ids:
+        count = await enrollments.count_documents({"course_id": course_id})
+        await courses.update_one({"_id": course_id}, {"$set": {"enrollment_count": count}})
+    document_cache.invalidate(Course, *course_ids)
+
+
+@resumable("user_delete")
+async def delete_user_enrollments(job: Job) -> None:
+    """
+    Delete a user's enrollments and correct each course's enrollment_count
+
+    Each fetched batch is removed with one delete_many and subtracted from
+    its courses. If fewer were deleted than fetched, the rest were deleted
+    concurrently through the API and already subtracted there, so the
+    batch's courses are recounted instead. The courses of the batch in
+    flight are saved with the job first: if the job is interrupted before
+    its decrements land, the resumed job recounts those courses instead of
+    guessing which decrements were applied.
+    """
+    user_id = job.params["user_id"]
+    enrollments = Enrollment.get_motor_collection()
+
+    # Completes the delete if the job was recorded but the user not yet removed
+    await User.get_motor_collection().delete_one({"_id": user_id})
+    document_cache.invalidate(User, user_id)
+
+    interrupted = job.params.get("batch")
+    if interrupted:
+        logger.warning(
+            "Resuming user %s cascade; recounting %s courses", user_id, len(interrupted)
+        )
+        await recount_enrollments(interrupted)
+
+    job.total = job.processed + await enrollments.count_documents({"user_id": user_id})
+    courses_touched = 0
+    while True:
+        batch = await enrollments.find(
+            {"user_id": user_id}, {"course_id": True}
+        ).limit(CASCADE_BATCH_SIZE).to_list(CASCADE_BATCH_SIZE)
+        if not batch:
+            break
+        job.params["batch"] = [enrollment["course_id"] for enrollment in batch]
+        await job.save()
+
+        result = await enrollments.delete_many(
+            {"_id": {"$in": [enrollment["_id"] for enrollment in batch]}}
+        )
+        document_cache.invalidate(Enrollment)
+        batch_courses = job.params["batch"]
+        if result.deleted_count == len(batch):
+            await decrement_enrollment_counts(Counter(batch_courses))
+        else:
+            # Some were deleted through the API meanwhile, which already
+            # decremented their course; count again rather than guess which
+            await recount_enrollments(set(batch_courses))
+
+        job.processed += len(batch)
+        job.succeeded += result.deleted_count
+        courses_touched += len(set(batch_courses))
+        job.params["batch"] = []
+        await job.save()
+
+    # Enrollments found after the count was taken
+    job.total = job.processed
+    logger.info(
+        "Deleted %s enrollments of user %s across %s courses",
+        job.succeeded,
+        user_id,
+        courses_touched,
+    )
+
+
+@resumable("course_delete")
+async def delete_course_enrollments(job: Job) -> None:
+    """
+    Delete every enrollment in a deleted course
+
+    Batches of fetched IDs are deleted until none remain, so enrollments
+    created while the cascade runs are removed too.
+    """
+    course_id = job.params["course_id"]
+    enrollments = Enrollment.get_motor_collection()
+
+    # Completes the delete if the job was recorded but the course not yet removed
+    await Course.get_motor_collection().delete_one({"_id": course_id})
+    document_cache.invalidate(Course, course_id)
+
+    job.total = job.processed + await enrollments.count_documents({"course_id": course_id})
+    while True:
+        batch = await enrollments.find(
+            {"course_id": course_id}, {"_id": True}
+        ).limit(CASCADE_BATCH_SIZE).to_list(CASCADE_BATCH_SIZE)
+        if not batch:
+            break
+        result = await enrollments.delete_many(
+            {"_id": {"$in": [enrollment["_id"] for enrollment in batch]}}
+        )
+        document_cache.invalidate(Enrollment)
+        job.processed += len(batch)
+        job.succeeded += result.deleted_count
+        await job.save()
+
+    job.total = job.processed
+    logger.info("Deleted %s enrollments of course %s", job.succeeded, course_id)
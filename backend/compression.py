@@ -0,0 +1,305 @@
+"""
+Negotiated response compression for ScottLMS
+
+List responses are verbose JSON; compressing them cuts transfer between the
+frontend pods and the API several times over. The encoding is negotiated
+from Accept-Encoding (zstd, then brotli, then gzip, as installed and
+accepted) and the level is chosen per content type. Large bodies are
+compressed on a worker thread so the event loop keeps serving requests;
+zlib, brotli and zstandard all release the GIL while compressing.
+"""
+
+import asyncio
+import gzip
+import os
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Compression configuration
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Buffered bodies at least this large are compressed off the event loop
+COMPRESSION_OFFLOAD_BYTES = int(os.getenv("COMPRESSION_OFFLOAD_BYTES", str(256 * 1024)))
+# Encodings the server may use, in order of preference
+COMPRESSION_ENCODINGS = [
+    encoding.strip()
+    for encoding in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+    if encoding.strip()
+]
+
+# Levels per content type. Buffered JSON pays for a better ratio; NDJSON
+# exports are streamed chunk by chunk, where throughput matters more.
+COMPRESSION_LEVELS: Dict[str, Dict[str, int]] = {
+    "application/json": {"zstd": 6, "br": 5, "gzip": 6},
+    "application/x-ndjson": {"zstd": 1, "br": 1, "gzip": 1},
+}
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+# Content types worth compressing; everything else passes through
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Metrics
+COMPRESSION_RATIO = Histogram(
+    "http_response_compression_ratio",
+    "Uncompressed response size divided by compressed size",
+    ["encoding"],
+    buckets=(1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, 12.0, 16.0, 32.0),
+)
+COMPRESSION_SECONDS = Histogram(
+    "http_response_compression_seconds",
+    "Time spent compressing one response body",
+    ["encoding"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+COMPRESSION_BYTES = Counter(
+    "http_response_compression_bytes_total",
+    "Response bytes before and after compression",
+    ["encoding", "stage"],
+)
+
+
+# Encodings supported by this process
+AVAILABLE_ENCODINGS = [
+    encoding
+    for encoding in COMPRESSION_ENCODINGS
+    if encoding == "gzip"
+    or (encoding == "br" and brotli is not None)
+    or (encoding == "zstd" and zstandard is not None)
+]
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """Compress a complete body"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def stream_compressor(
+    encoding: str, level: int
+) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """
+    Incremental compressor for streamed bodies
+
+    Returns:
+        (compress_chunk, finish); compress_chunk flushes so every chunk
+        reaches the client as soon as it is produced
+    """
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return (
+            lambda chunk: compressor.compress(chunk)
+            + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        return (
+            lambda chunk: compressor.process(chunk) + compressor.flush(),
+            compressor.finish,
+        )
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return (
+        lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def negotiate_encoding(
+    accept_encoding: str, available: List[str] = AVAILABLE_ENCODINGS
+) -> Optional[str]:
+    """
+    Pick the encoding for a response from the request's Accept-Encoding
+
+    The client's highest q-value wins; ties go to the server's preference
+    order in available. Returns None when identity should be used.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best = None
+    for preference, encoding in enumerate(available):
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > 0 and (best is None or q > best[0]):
+            best = (q, preference, encoding)
+    return best[2] if best else None
+
+
+def compression_level(content_type: str, encoding: str) -> int:
+    """Level to use for a content type, falling back to DEFAULT_LEVELS"""
+    media_type = content_type.split(";")[0].strip().lower()
+    return COMPRESSION_LEVELS.get(media_type, DEFAULT_LEVELS)[encoding]
+
+
+def _record(encoding: str, original: int, compressed: int, seconds: float) -> None:
+    COMPRESSION_SECONDS.labels(encoding).observe(seconds)
+    COMPRESSION_BYTES.labels(encoding, "original").inc(original)
+    COMPRESSION_BYTES.labels(encoding, "compressed").inc(compressed)
+    if compressed:
+        COMPRESSION_RATIO.labels(encoding).observe(original / compressed)
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    """
+    Demote a strong ETag to weak
+
+    A strong tag promises byte-identical bodies, which no longer holds once
+    the body is encoded; If-None-Match compares weakly, so revalidation with
+    either form keeps working.
+    """
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the negotiated encoding"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_BYTES,
+        offload_size: int = COMPRESSION_OFFLOAD_BYTES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(
+            send, encoding, self.minimum_size, self.offload_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-request state: holds the start message until the body shows its size"""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int, offload_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.stream: Optional[Tuple[Callable[[bytes], bytes], Callable[[], bytes]]] = None
+        self.original = self.compressed = 0
+        self.seconds = 0.0
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            )
+            if not self.passthrough or message["status"] == 304:
+                # Whether or not this body ends up compressed, a client that
+                # negotiated an encoding always sees the same weak tag
+                _weaken_etag(MutableHeaders(raw=message["headers"]))
+            return
+        if message["type"] != "http.response.body":
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._flush_start()
+            await self._send(message)
+        elif self.start is not None:
+            await self._first_body(message)
+        elif self.stream is not None:
+            await self._send(self._stream_chunk(message))
+        else:
+            await self._send(message)
+
+    async def _flush_start(self) -> None:
+        if self.start is not None:
+            await self._send(self.start)
+            self.start = None
+
+    async def _first_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not more_body and len(body) < self.minimum_size:
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        level = compression_level(headers.get("content-type", ""), self.encoding)
+        headers.add_vary_header("Accept-Encoding")
+        headers["Content-Encoding"] = self.encoding
+
+        if more_body:
+            del headers["Content-Length"]
+            self.stream = stream_compressor(self.encoding, level)
+            await self._flush_start()
+            await self._send(self._stream_chunk(message))
+            return
+
+        started = time.perf_counter()
+        if len(body) >= self.offload_size:
+            compressed = await asyncio.get_running_loop().run_in_executor(
+                None, compress, body, self.encoding, level
+            )
+        else:
+            compressed = compress(body, self.encoding, level)
+        _record(self.encoding, len(body), len(compressed), time.perf_counter() - started)
+        headers["Content-Length"] = str(len(compressed))
+        await self._flush_start()
+        await self._send({**message, "body": compressed})
+
+    def _stream_chunk(self, message: Message) -> Message:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        compress_chunk, finish = self.stream
+        started = time.perf_counter()
+        compressed = compress_chunk(body) if body else b""
+        if not more_body:
+            compressed += finish()
+        self.seconds += time.perf_counter() - started
+        self.original += len(body)
+        self.compressed += len(compressed)
+        if not more_body:
+            _record(self.encoding, self.original, self.compressed, self.seconds)
+        return {**message, "body": compressed}
@@ -0,0 +1,68 @@
+"""
+Conditional GET support for ScottLMS responses
+
+JSON responses to GET requests carry a strong ETag computed from the body.
+A client that sends the tag back in If-None-Match receives 304 Not Modified
+without a body. Bodies are rebuilt from the read cache, so revalidating an
+unchanged resource usually costs neither a database query nor the payload.
+"""
+
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+# Sent with every conditional response; no-cache makes clients revalidate
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", "private, no-cache")
+
+# Headers describing the body, left out of 304 responses
+_BODY_HEADERS = ("content-length", "content-type")
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong entity tag for a response body"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an entity tag
+
+    If-None-Match uses the weak comparison (RFC 9110 13.1.2), so a W/ prefix
+    on either side is ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def conditional_response(request: Request, response: Response) -> Response:
+    """
+    Tag a GET response and replace it with 304 if the client's copy is current
+
+    Args:
+        request: Incoming request, possibly carrying If-None-Match
+        response: Complete response whose body is already rendered
+
+    Returns:
+        The response with ETag and Cache-Control set, or a bodiless 304
+        carrying the same headers
+    """
+    etag = compute_etag(response.body)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if not etag_matches(request.headers.get("if-none-match"), etag):
+        return response
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name not in _BODY_HEADERS
+    }
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -2,10 +2,21 @@
 Database configuration and connection management
 """
 
+import asyncio
 import os
+import random
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
+from prometheus_client import Counter
+from pymongo.errors import DuplicateKeyError
 from logs import get_logger
+from metrics import command_listener
+from pool import pool_listener, pool_options, warm_pool
+from slowqueries import slow_query_monitor
+from timing import SERVER_TIMING, database_timing_listener
 
 logger = get_logger(__name__)
 
@@ -13,50 +24,250 @@ logger = get_logger(__name__)
 # Database configuration
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017/scottlms")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "scottlms")
+# Pause after the first failed connection attempt; doubled after each
+# further failure up to the maximum
+DB_CONNECT_RETRY_SECONDS = float(os.getenv("DB_CONNECT_RETRY_SECONDS", "1"))
+DB_CONNECT_RETRY_MAX_SECONDS = float(os.getenv("DB_CONNECT_RETRY_MAX_SECONDS", "30"))
+
+# Metrics
+DB_CONNECT_ATTEMPTS = Counter(
+    "database_connect_attempts_total", "Startup connection attempts by outcome", ["result"]
+)
 
 # Global database client
 client: AsyncIOMotorClient = None
 
+# Whether init_db has completed, i.e. Beanie models can be used
+connected = False
+
+# Background index synchronization started by init_db
+index_sync_task: Optional[asyncio.Task] = None
+
+
+def get_document_models() -> List[type]:
+    """Return the Beanie document models managed by the application"""
+    # Import models here to avoid circular imports
+    from entities.users import User
+    from entities.courses import Course
+    from entities.enrollments import Enrollment
+    from entities.jobs import JobRecord
+
+    return [User, Course, Enrollment, JobRecord]
+
+
+@contextmanager
+def deferred_indexes(document_models: List[type]):
+    """
+    Hide Settings.indexes from init_beanie
+
+    Beanie 1.23 builds declared indexes inline during init_beanie and has no
+    option to skip that; on a large collection the build would hold up pod
+    startup. The declarations are restored once init_beanie returns so
+    build_unique_indexes and sync_indexes can build them.
+    """
+    declared = {model: getattr(model.Settings, "indexes", []) for model in document_models}
+    for model in document_models:
+        model.Settings.indexes = []
+    try:
+        yield
+    finally:
+        for model, indexes in declared.items():
+            model.Settings.indexes = indexes
+
+
+async def build_unique_indexes(document_models: List[type]) -> None:
+    """
+    Create the unique indexes the API relies on to reject duplicates
+
+    Unlike the others these are built before the application serves: until
+    one exists duplicates can be inserted, and those would then stop it from
+    ever being built. Creating an index that already exists is a no-op.
+
+    Raises:
+        Exception: If a build fails, e.g. because duplicates already exist
+    """
+    for model in document_models:
+        indexes = [
+            index
+            for index in getattr(model.Settings, "indexes", [])
+            if index.document.get("unique")
+        ]
+        if indexes:
+            names = await model.get_motor_collection().create_indexes(indexes)
+            logger.info("Unique indexes ready for %s: %s", model.Settings.name, ', '.join(names))
+
+
+async def sync_indexes() -> None:
+    """Create the indexes declared on each document model's Settings"""
+    for model in get_document_models():
+        indexes = getattr(model.Settings, "indexes", [])
+        if not indexes:
+            continue
+        try:
+            names = await model.get_motor_collection().create_indexes(indexes)
+            logger.info("Indexes in sync for %s: %s", model.Settings.name, ', '.join(names))
+        except Exception as e:
+            # A failed build (e.g. duplicates under a unique index) must not
+            # stop the others; index_report lists it as missing
+            logger.error("Failed to sync indexes for %s: %s", model.Settings.name, e)
+
+
+def indexes_synced() -> bool:
+    """Whether the background index sync has finished"""
+    return index_sync_task is not None and index_sync_task.done()
+
+
+async def index_report() -> Dict[str, Any]:
+    """
+    Compare declared indexes with those present in MongoDB
+
+    Returns:
+        Per collection: declared index names that are missing, indexes present
+        but not declared, and indexes with no recorded use since the server
+        started (from $indexStats)
+    """
+    report = {"sync_complete": indexes_synced(), "collections": {}}
+    for model in get_document_models():
+        collection = model.get_motor_collection()
+        declared = [index.document["name"] for index in model.Settings.indexes]
+        existing = await collection.index_information()
+        usage = {
+            stats["name"]: stats["accesses"]["ops"]
+            async for stats in collection.aggregate([{"$indexStats": {}}])
+        }
+        report["collections"][model.Settings.name] = {
+            "missing": [name for name in declared if name not in existing],
+            "undeclared": [
+                name for name in existing if name != "_id_" and name not in declared
+            ],
+            "unused": [
+                name for name in existing if name != "_id_" and usage.get(name, 0) == 0
+            ],
+            "usage": usage,
+        }
+    return report
+
 
 async def init_db() -> None:
     """Initialize database connection and collections"""
-    global client
+    global client, connected, index_sync_task
 
     try:
-        # Import models here to avoid circular imports
-        from entities.users import User
-        from entities.courses import Course
-        from entities.enrollments import Enrollment
+        document_models = get_document_models()
+        if client is not None:
+            # Left over from a failed attempt, along with the index sync it
+            # may have started
+            await slow_query_monitor.stop()
+            if index_sync_task is not None and not index_sync_task.done():
+                index_sync_task.cancel()
+            client.close()
 
-        # Create MongoDB client
-        client = AsyncIOMotorClient(MONGODB_URL)
+        # Create MongoDB client with the configured pool
+        listeners = [pool_listener, command_listener]
+        if slow_query_monitor.enabled:
+            listeners.append(slow_query_monitor)
+        if SERVER_TIMING:
+            listeners.append(database_timing_listener)
+        client = AsyncIOMotorClient(
+            MONGODB_URL, event_listeners=listeners, **pool_options()
+        )
 
-        # Test connection
+        # Test connection and open the pool before the first request
         await client.admin.command("ping")
         logger.info("Connected to MongoDB successfully")
+        await warm_pool(client)
 
-        # Initialize Beanie with document models
-        await init_beanie(
-            database=client[DATABASE_NAME],
-            document_models=[User, Course, Enrollment],
-        )
+        # Initialize Beanie with document models; indexes are built afterwards
+        with deferred_indexes(document_models):
+            await init_beanie(
+                database=client[DATABASE_NAME],
+                document_models=document_models,
+            )
 
         logger.info("Database collections initialized successfully")
 
+        await build_unique_indexes(document_models)
+        await slow_query_monitor.start(client[DATABASE_NAME])
+        # The remaining indexes are built in the background. Each connection
+        # syncs on its own client; creating indexes that already exist is a no-op
+        index_sync_task = asyncio.create_task(sync_indexes())
+        connected = True
+
     except Exception as e:
-        logger.error(f"Failed to connect to MongoDB: {str(e)}")
+        logger.error("Failed to connect to MongoDB: %s", e)
         raise
 
 
+async def connect_with_retry(connect: Callable[[], Awaitable[None]] = init_db) -> None:
+    """
+    Await connect until it succeeds, backing off exponentially between attempts
+
+    Each pause is drawn from the upper half of the current backoff so that
+    replicas restarted together do not retry in lockstep.
+    """
+    backoff = DB_CONNECT_RETRY_SECONDS
+    attempt = 1
+    while True:
+        try:
+            await connect()
+            DB_CONNECT_ATTEMPTS.labels("succeeded").inc()
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            DB_CONNECT_ATTEMPTS.labels("failed").inc()
+            pause = random.uniform(backoff / 2, backoff)
+            logger.warning(
+                "Database connection attempt %s failed, retrying in %.1fs: %s",
+                attempt, pause, e
+            )
+            await asyncio.sleep(pause)
+            backoff = min(backoff * 2, DB_CONNECT_RETRY_MAX_SECONDS)
+            attempt += 1
+
+
+async def ping() -> None:
+    """
+    Round trip to MongoDB
+
+    Raises:
+        ConnectionError: If init_db has not completed
+    """
+    if not connected:
+        raise ConnectionError("Database not connected yet")
+    await client.admin.command("ping")
+
+
 async def close_db() -> None:
     """Close database connection"""
-    global client
+    global client, connected
+
+    connected = False
+
+    if index_sync_task and not index_sync_task.done():
+        index_sync_task.cancel()
+
+    await slow_query_monitor.stop()
 
     if client:
         client.close()
         logger.info("Database connection closed")
 
 
+def duplicate_key_fields(error: DuplicateKeyError) -> List[str]:
+    """
+    Fields of the unique index an insert or update collided with
+
+    Args:
+        error: DuplicateKeyError raised by MongoDB
+
+    Returns:
+        Field names from the violated index's key pattern (empty if unknown)
+    """
+    details = error.details or {}
+    return list(details.get("keyPattern", {}))
+
+
 def get_database():
     """Get database instance"""
     return client[DATABASE_NAME]
@@ -5,7 +5,17 @@ Contains all data models for the application
 
 from .users import User, UserCreate, UserUpdate, UserResponse
 from .courses import Course, CourseCreate, CourseUpdate, CourseResponse
-from .enrollments import Enrollment, EnrollmentCreate, EnrollmentResponse
+from .enrollments import (
+    Enrollment,
+    EnrollmentCreate,
+    EnrollmentResponse,
+    EnrichedEnrollmentResponse,
+    BulkEnrollmentResult,
+    BulkEnrollmentResponse,
+)
+from .stats import GroupCounts, StatsResponse
+from .jobs import JobStatus, JobError, JobResponse, JobRecord
+from .lookups import LookupRequest, LookupResponse
 
 __all__ = [
     "User",
@@ -19,4 +29,15 @@ __all__ = [
     "Enrollment",
     "EnrollmentCreate",
     "EnrollmentResponse",
+    "EnrichedEnrollmentResponse",
+    "BulkEnrollmentResult",
+    "BulkEnrollmentResponse",
+    "GroupCounts",
+    "StatsResponse",
+    "JobStatus",
+    "JobError",
+    "JobResponse",
+    "JobRecord",
+    "LookupRequest",
+    "LookupResponse",
 ]
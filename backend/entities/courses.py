@@ -7,6 +7,7 @@ from enum import Enum
 from typing import List, Optional
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel, Field, ConfigDict
+from pymongo import ASCENDING, IndexModel
 
 
 class CourseStatus(str, Enum):
@@ -65,6 +66,28 @@ class Course(CourseBase, Document):
 
     class Settings:
         name = "courses"
+        # Synced in the background by database.sync_indexes
+        indexes = [
+            IndexModel([("instructor_id", ASCENDING), ("_id", ASCENDING)]),
+            # Status filter and per-status counts, paged by _id
+            IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("tags", ASCENDING)]),
+            # One (field, _id) index per sort the API offers, matching the
+            # _id tiebreak pagination.sort_spec adds
+            IndexModel([("title", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("price", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("enrollment_count", ASCENDING), ("_id", ASCENDING)]),
+            # Status filter (e.g. the published catalog) with each sort. An
+            # instructor's courses are few enough to sort after the
+            # (instructor_id, _id) scan
+            IndexModel([("status", ASCENDING), ("title", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel(
+                [("status", ASCENDING), ("enrollment_count", ASCENDING), ("_id", ASCENDING)]
+            ),
+        ]
 
 
 class CourseResponse(CourseBase):
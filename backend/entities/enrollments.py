@@ -4,9 +4,12 @@ Enrollment entity for ScottLMS
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel, Field, ConfigDict
+from pymongo import ASCENDING, IndexModel
+
+from .courses import CourseStatus
 
 
 class EnrollmentStatus(str, Enum):
@@ -55,6 +58,31 @@ class Enrollment(EnrollmentBase, Document):
 
     class Settings:
         name = "enrollments"
+        # Unique indexes are built before serving (database.build_unique_indexes),
+        # the rest in the background by database.sync_indexes
+        indexes = [
+            # Also finds a user's enrollments, which are few enough to sort
+            # after the scan
+            IndexModel([("user_id", ASCENDING), ("course_id", ASCENDING)], unique=True),
+            # Per-course pages ordered by _id; also covers the {_id}
+            # projection used to find streamed page boundaries
+            IndexModel([("course_id", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("enrolled_at", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("progress", ASCENDING), ("_id", ASCENDING)]),
+            # A course's enrollments can run to tens of thousands, so each
+            # sort gets a (course_id, field, _id) index
+            IndexModel([("course_id", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("course_id", ASCENDING), ("progress", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel(
+                [("course_id", ASCENDING), ("enrolled_at", ASCENDING), ("_id", ASCENDING)]
+            ),
+            # The status filter and most recent first listing of a user's
+            # enrollments
+            IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("user_id", ASCENDING), ("enrolled_at", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("enrolled_at", ASCENDING), ("_id", ASCENDING)]),
+        ]
 
 
 class EnrollmentResponse(EnrollmentBase):
@@ -64,3 +92,46 @@ class EnrollmentResponse(EnrollmentBase):
     enrolled_at: datetime
     completed_at: Optional[datetime] = None
     last_accessed: Optional[datetime] = None
+
+
+class EnrollmentUserSummary(BaseModel):
+    """Student fields shown alongside an enrollment"""
+
+    first_name: str
+    last_name: str
+    email: str
+
+
+class EnrollmentCourseSummary(BaseModel):
+    """Course fields shown alongside an enrollment"""
+
+    title: str
+    status: CourseStatus
+
+
+class EnrichedEnrollmentResponse(EnrollmentResponse):
+    """Enrollment response with the student and course it refers to"""
+
+    user: Optional[EnrollmentUserSummary] = Field(
+        None, description="Student, or null if the user no longer exists"
+    )
+    course: Optional[EnrollmentCourseSummary] = Field(
+        None, description="Course, or null if the course no longer exists"
+    )
+
+
+class BulkEnrollmentResult(BaseModel):
+    """Outcome of one item in a bulk enrollment request"""
+
+    index: int = Field(..., description="Position of the item in the request body")
+    created: bool
+    id: Optional[PydanticObjectId] = Field(None, description="ID of the new enrollment")
+    detail: Optional[str] = Field(None, description="Why the item was not created")
+
+
+class BulkEnrollmentResponse(BaseModel):
+    """Summary of a bulk enrollment request"""
+
+    created: int
+    failed: int
+    results: List[BulkEnrollmentResult]
@@ -0,0 +1,76 @@
+"""
+Background job models for ScottLMS
+"""
+
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
+
+
+class JobStatus(str, Enum):
+    """Background job states"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobError(BaseModel):
+    """One item a job could not process"""
+
+    item: int = Field(..., description="Row or item number the error refers to")
+    detail: str = Field(..., description="Why the item failed")
+
+
+class JobResponse(BaseModel):
+    """Progress of a background job"""
+
+    id: str
+    kind: str = Field(..., description="What the job does, e.g. user_import")
+    status: JobStatus
+    total: Optional[int] = Field(None, description="Items to process, if known")
+    processed: int = Field(0, description="Items handled so far")
+    succeeded: int = 0
+    failed: int = 0
+    errors: List[JobError] = Field(
+        default_factory=list, description="First failures, capped at MAX_JOB_ERRORS"
+    )
+    detail: Optional[str] = Field(None, description="Why the job itself failed")
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class JobRecord(Document):
+    """Background job state in MongoDB, written by jobs.Job after every batch"""
+
+    id: str
+    kind: str
+    status: JobStatus = JobStatus.PENDING
+    params: Dict[str, Any] = Field(
+        default_factory=dict, description="What the job works on, for resuming it"
+    )
+    total: Optional[int] = None
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    errors: List[JobError] = Field(default_factory=list)
+    detail: Optional[str] = None
+    owner: Optional[str] = Field(None, description="Process holding the job's lease")
+    lease_until: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "jobs"
+        # Synced in the background by database.sync_indexes
+        indexes = [
+            # Unfinished jobs whose lease lapsed, found by the job supervisor
+            IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)]),
+            # Finished jobs past JOB_RETENTION_SECONDS, pruned by the supervisor
+            IndexModel([("finished_at", ASCENDING)]),
+        ]
@@ -0,0 +1,24 @@
+"""
+Batch lookup models for ScottLMS
+"""
+
+from typing import Generic, List, TypeVar
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+
+ItemT = TypeVar("ItemT")
+
+
+class LookupRequest(BaseModel):
+    """IDs to fetch in one request"""
+
+    ids: List[PydanticObjectId] = Field(..., description="IDs to look up")
+
+
+class LookupResponse(BaseModel, Generic[ItemT]):
+    """Documents found for a lookup, in the order requested"""
+
+    items: List[ItemT]
+    missing: List[PydanticObjectId] = Field(
+        default_factory=list, description="Requested IDs that do not exist"
+    )
@@ -0,0 +1,25 @@
+"""
+Aggregate statistics models for ScottLMS
+"""
+
+from datetime import datetime
+from typing import Dict
+from pydantic import BaseModel, Field
+
+
+class GroupCounts(BaseModel):
+    """Document total plus a breakdown by one field"""
+
+    total: int = Field(..., description="Number of documents")
+    breakdown: Dict[str, int] = Field(
+        default_factory=dict, description="Document count per field value"
+    )
+
+
+class StatsResponse(BaseModel):
+    """Aggregate counts across the LMS collections"""
+
+    users: GroupCounts = Field(..., description="Users by role")
+    courses: GroupCounts = Field(..., description="Courses by status")
+    enrollments: GroupCounts = Field(..., description="Enrollments by status")
+    generated_at: datetime = Field(..., description="When the counts were computed")
@@ -7,6 +7,7 @@ from enum import Enum
 from typing import Optional
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
+from pymongo import ASCENDING, IndexModel
 
 
 class UserRole(str, Enum):
@@ -54,6 +55,24 @@ class User(UserBase, Document):
 
     class Settings:
         name = "users"
+        # Unique indexes are built before serving (database.build_unique_indexes),
+        # the rest in the background by database.sync_indexes
+        indexes = [
+            IndexModel([("email", ASCENDING)], unique=True),
+            IndexModel([("username", ASCENDING)], unique=True),
+            # Role filter and per-role counts, paged by _id
+            IndexModel([("role", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+            # One (field, _id) index per sort the API offers, matching the
+            # _id tiebreak pagination.sort_spec adds; email and username are
+            # unique, so they sort without it on the indexes above
+            IndexModel([("first_name", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("last_name", ASCENDING), ("_id", ASCENDING)]),
+            # Role filter with the usual directory orders; other sorts walk
+            # the (field, _id) index and skip the other roles
+            IndexModel([("role", ASCENDING), ("last_name", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("role", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        ]
 
 
 class UserResponse(UserBase):
@@ -0,0 +1,106 @@
+"""
+Readiness of this replica to serve traffic
+
+/health only proves the process is alive. /ready answers whether requests
+routed here can succeed: startup has finished connecting to MongoDB, and
+the last ping got through. The ping runs on a timer in the background, so
+the probe endpoint itself never touches the database and stays cheap however
+often Kubernetes polls it.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import Gauge
+
+from database import indexes_synced, ping
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Probe configuration
+READINESS_INTERVAL_SECONDS = float(os.getenv("READINESS_INTERVAL_SECONDS", "5"))
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+# Metrics
+READY = Gauge("app_ready", "Whether this replica reports itself ready (1) or not (0)")
+
+
+class ReadinessProbe:
+    """Cached database reachability, refreshed every interval seconds"""
+
+    def __init__(
+        self,
+        interval: float = READINESS_INTERVAL_SECONDS,
+        timeout: float = READINESS_TIMEOUT_SECONDS,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.started = False
+        self.database = "connecting"
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether startup finished and the database answered the last ping"""
+        return self.started and self.database == "ok"
+
+    async def check(self) -> None:
+        """Ping the database and remember the outcome"""
+        try:
+            await asyncio.wait_for(ping(), self.timeout)
+            if self.database != "ok":
+                logger.info("Database reachable, replica ready")
+            self.database, self.error = "ok", None
+        except ConnectionError as e:
+            self.database, self.error = "connecting", str(e)
+        except Exception as e:
+            if self.database == "ok":
+                logger.error("Database unreachable, replica not ready: %s", e)
+            self.database, self.error = "unreachable", str(e) or type(e).__name__
+        self.checked_at = time.time()
+        READY.set(1 if self.ready else 0)
+
+    def mark_started(self) -> None:
+        """Record that startup finished; readiness now follows the pings"""
+        self.started = True
+        READY.set(1 if self.ready else 0)
+
+    def status(self) -> Tuple[bool, Dict[str, Any]]:
+        """Readiness and the details behind it"""
+        return self.ready, {
+            "status": "ready" if self.ready else "not ready",
+            "startup": "complete" if self.started else "in progress",
+            "database": self.database,
+            "error": self.error,
+            "indexes": "synced" if indexes_synced() else "building",
+            "checked_at": self.checked_at,
+        }
+
+    async def start(self) -> None:
+        """Start pinging in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop pinging and report not ready"""
+        self.started = False
+        READY.set(0)
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+
+# Shared probe; started by the application lifespan
+readiness = ReadinessProbe()
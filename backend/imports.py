@@ -0,0 +1,143 @@
+"""
+Bulk user import from CSV or NDJSON uploads
+
+Rows are read from the spooled upload in batches. Each batch is checked
+against the database with one query, hashed in parallel on the bulk hashing
+process pool and written with one unordered insert_many. The unique email
+and username indexes stay the final word on duplicates.
+"""
+
+import os
+from itertools import islice
+from typing import IO, Any, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from cache import document_cache
+from entities.users import User, UserCreate
+from jobs import Job
+from logs import get_logger
+from passwords import password_hasher
+from uploads import read_rows, validation_detail
+
+logger = get_logger(__name__)
+
+# Rows hashed and inserted together
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Largest upload accepted by POST /api/users/import
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", str(50 * 1024 * 1024)))
+
+
+class UserImport:
+    """Imports one upload, remembering emails and usernames already seen"""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.emails: Set[str] = set()
+        self.usernames: Set[str] = set()
+
+    def validate(
+        self, rows: List[Tuple[int, Optional[Dict[str, Any]]]]
+    ) -> List[Tuple[int, UserCreate]]:
+        """Validate rows and drop duplicates within the upload"""
+        valid = []
+        for row_number, fields in rows:
+            if fields is None:
+                self.job.record_error(row_number, "Row could not be parsed")
+                continue
+            try:
+                user_data = UserCreate.model_validate(fields)
+            except ValidationError as e:
+                self.job.record_error(row_number, validation_detail(e))
+                continue
+            if user_data.email in self.emails:
+                self.job.record_error(row_number, "Duplicate email earlier in upload")
+                continue
+            if user_data.username in self.usernames:
+                self.job.record_error(row_number, "Duplicate username earlier in upload")
+                continue
+            self.emails.add(user_data.email)
+            self.usernames.add(user_data.username)
+            valid.append((row_number, user_data))
+        return valid
+
+    async def drop_existing(
+        self, valid: List[Tuple[int, UserCreate]]
+    ) -> List[Tuple[int, UserCreate]]:
+        """Drop users whose email or username is taken, before paying for a hash"""
+        if not valid:
+            return valid
+        emails = [user_data.email for _, user_data in valid]
+        usernames = [user_data.username for _, user_data in valid]
+        cursor = User.get_motor_collection().find(
+            {"$or": [{"email": {"$in": emails}}, {"username": {"$in": usernames}}]},
+            {"email": True, "username": True},
+        )
+        taken_emails, taken_usernames = set(), set()
+        async for document in cursor:
+            taken_emails.add(document.get("email"))
+            taken_usernames.add(document.get("username"))
+
+        remaining = []
+        for row_number, user_data in valid:
+            if user_data.email in taken_emails:
+                self.job.record_error(row_number, "User with this email already exists")
+            elif user_data.username in taken_usernames:
+                self.job.record_error(row_number, "User with this username already exists")
+            else:
+                remaining.append((row_number, user_data))
+        return remaining
+
+    async def insert(self, valid: List[Tuple[int, UserCreate]]) -> None:
+        """Hash passwords in parallel and insert the batch"""
+        if not valid:
+            return
+        hashes = await password_hasher.hash_many(
+            [user_data.password for _, user_data in valid]
+        )
+        users = [
+            User(**user_data.model_dump(exclude={"password"}), hashed_password=hashed)
+            for (_, user_data), hashed in zip(valid, hashes)
+        ]
+
+        write_errors = {}
+        try:
+            await User.insert_many(users, ordered=False)
+        except BulkWriteError as e:
+            # Users created concurrently with the import still hit the unique indexes
+            write_errors = {error["index"]: error for error in e.details["writeErrors"]}
+        document_cache.invalidate(User)
+
+        for position, (row_number, _) in enumerate(valid):
+            error = write_errors.get(position)
+            if error is None:
+                self.job.succeeded += 1
+            elif error.get("code") == 11000:
+                field = "username" if "username" in error.get("keyPattern", {}) else "email"
+                self.job.record_error(row_number, f"User with this {field} already exists")
+            else:
+                self.job.record_error(row_number, "Failed to create user")
+
+    async def run(self, upload: IO[bytes], ndjson: bool) -> None:
+        """
+        Import every row of the upload, saving job progress per batch
+
+        The upload is spooled on this replica, so an import cut short by a
+        restart is marked failed rather than resumed.
+        """
+        try:
+            rows = read_rows(upload, ndjson)
+            while True:
+                batch = list(islice(rows, IMPORT_BATCH_SIZE))
+                if not batch:
+                    break
+                valid = self.validate(batch)
+                valid = await self.drop_existing(valid)
+                await self.insert(valid)
+                self.job.processed += len(batch)
+                await self.job.save()
+            # The line count taken while spooling is only an estimate
+            self.job.total = self.job.processed
+        finally:
+            upload.close()
@@ -0,0 +1,245 @@
+"""
+Cross-replica cache invalidation
+
+Every API replica keeps its own read cache (cache.py). Tags invalidated on
+one replica are published on a bus and applied by all the others, so a write
+on one pod evicts the stale entries on every pod. Two backends are available:
+
+- mongo: messages are appended to a capped collection that every replica
+  follows with a tailable cursor; works on a standalone mongod, no replica
+  set or change streams needed
+- memory: messages are delivered to the other buses in the same process;
+  for tests and single-process development
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Set
+
+from prometheus_client import Counter, Histogram
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from cache import DocumentCache, document_cache
+from database import get_database
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Bus configuration
+CACHE_INVALIDATION_BACKEND = os.getenv("CACHE_INVALIDATION_BACKEND", "mongo")
+INVALIDATION_COLLECTION = os.getenv("INVALIDATION_COLLECTION", "cache_invalidations")
+# Size of the capped collection; only the last few seconds of messages matter
+INVALIDATION_COLLECTION_BYTES = int(
+    os.getenv("INVALIDATION_COLLECTION_BYTES", str(1024 * 1024))
+)
+# Pause before re-opening the tailable cursor after it dies or fails
+INVALIDATION_RETRY_SECONDS = 1.0
+
+# Metrics
+INVALIDATIONS_PUBLISHED = Counter(
+    "cache_invalidations_published_total",
+    "Invalidation messages sent to other replicas",
+)
+INVALIDATIONS_RECEIVED = Counter(
+    "cache_invalidations_received_total",
+    "Invalidation messages applied from other replicas",
+)
+INVALIDATION_FAILURES = Counter(
+    "cache_invalidation_failures_total",
+    "Errors publishing or following invalidation messages",
+    ["operation"],
+)
+INVALIDATION_LAG = Histogram(
+    "cache_invalidation_lag_seconds",
+    "Time from publishing an invalidation to applying it on another replica",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+
+class InvalidationBus:
+    """
+    Forwards a cache's local invalidations and applies those of other replicas
+
+    Local invalidations are collected by a cache listener and published by a
+    background task, so request handlers never wait on the bus. Tags queued
+    while a publish is in flight go out together in the next message.
+    """
+
+    def __init__(self, cache: DocumentCache = document_cache):
+        self.cache = cache
+        self.origin = uuid.uuid4().hex
+        self._pending: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        """Whether start() has been called without a matching stop()"""
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Begin publishing local invalidations and applying remote ones"""
+        if self.running:
+            return
+        self.cache.subscribe(self._enqueue)
+        self._tasks = [asyncio.create_task(self._publish_loop())]
+        follow = self.follow()
+        if follow is not None:
+            self._tasks.append(asyncio.create_task(follow))
+
+    async def stop(self) -> None:
+        """Publish anything still queued and stop the background tasks"""
+        self.cache.unsubscribe(self._enqueue)
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        """Deliver a message to the other replicas"""
+        raise NotImplementedError
+
+    def follow(self):
+        """Coroutine that receives messages, or None if send delivers them directly"""
+        return None
+
+    def receive(self, message: Dict[str, Any]) -> None:
+        """Apply a message, ignoring those this replica published itself"""
+        if message.get("origin") == self.origin or not message.get("tags"):
+            return
+        self.cache.invalidate_tags(message["tags"], notify=False)
+        INVALIDATIONS_RECEIVED.inc()
+        INVALIDATION_LAG.observe(max(0.0, time.time() - message["published_at"]))
+
+    async def flush(self) -> None:
+        """Publish the tags queued so far in one message"""
+        if not self._pending:
+            return
+        tags, self._pending = sorted(self._pending), set()
+        message = {"origin": self.origin, "tags": tags, "published_at": time.time()}
+        try:
+            await self.send(message)
+            INVALIDATIONS_PUBLISHED.inc()
+        except Exception as e:
+            # Other replicas keep the stale entries until they expire
+            INVALIDATION_FAILURES.labels("publish").inc()
+            logger.error("Failed to publish cache invalidation: %s", e)
+
+    def _enqueue(self, tags: List[str]) -> None:
+        self._pending.update(tags)
+        self._wakeup.set()
+
+    async def _publish_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.flush()
+
+
+class MemoryBus(InvalidationBus):
+    """Delivers messages to every running MemoryBus in this process"""
+
+    _buses: List["MemoryBus"] = []
+
+    async def start(self) -> None:
+        await super().start()
+        if self not in MemoryBus._buses:
+            MemoryBus._buses.append(self)
+
+    async def stop(self) -> None:
+        if self in MemoryBus._buses:
+            MemoryBus._buses.remove(self)
+        await super().stop()
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        for bus in list(MemoryBus._buses):
+            bus.receive(message)
+
+
+class MongoBus(InvalidationBus):
+    """Publishes to a capped collection that every replica tails"""
+
+    def __init__(
+        self,
+        cache: DocumentCache = document_cache,
+        collection_name: str = INVALIDATION_COLLECTION,
+        size: int = INVALIDATION_COLLECTION_BYTES,
+    ):
+        super().__init__(cache)
+        self.collection_name = collection_name
+        self.size = size
+
+    @property
+    def collection(self):
+        return get_database()[self.collection_name]
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        await self.collection.insert_one(message)
+
+    async def ensure_collection(self) -> None:
+        """Create the capped collection, seeding it so a tailable cursor stays open"""
+        try:
+            await self.collection.database.create_collection(
+                self.collection_name, capped=True, size=self.size
+            )
+        except CollectionInvalid:
+            pass
+        # A tailable cursor on an empty capped collection is closed at once
+        if await self.collection.find_one({}, {"_id": True}) is None:
+            await self.collection.insert_one(
+                {"origin": self.origin, "tags": [], "published_at": time.time()}
+            )
+
+    def follow(self):
+        return self._tail()
+
+    async def _tail(self) -> None:
+        while True:
+            try:
+                await self.ensure_collection()
+                newest = await self.collection.find_one(
+                    {}, {"_id": True}, sort=[("$natural", -1)]
+                )
+                # Messages before newest were published before this cursor
+                # existed; anything missed meanwhile is covered by the clear
+                self.cache.clear()
+                cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                seen_newest = newest is None
+                while cursor.alive:
+                    async for message in cursor:
+                        if seen_newest:
+                            self.receive(message)
+                        elif message["_id"] == newest["_id"]:
+                            seen_newest = True
+                # The cursor dies when its position is overwritten, after
+                # which messages may have been missed; start over
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                INVALIDATION_FAILURES.labels("follow").inc()
+                logger.error("Cache invalidation cursor failed: %s", e)
+            await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+
+def create_bus(
+    backend: str = CACHE_INVALIDATION_BACKEND, cache: DocumentCache = document_cache
+) -> InvalidationBus:
+    """
+    Build the bus selected by CACHE_INVALIDATION_BACKEND
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if backend == "mongo":
+        return MongoBus(cache)
+    if backend == "memory":
+        return MemoryBus(cache)
+    raise ValueError(f"Unknown cache invalidation backend: {backend}")
+
+
+# Shared bus for document_cache; started by the application lifespan
+invalidation_bus = create_bus()
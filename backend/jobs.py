@@ -0,0 +1,374 @@
+"""
+Background jobs for long-running bulk operations
+
+Jobs run as asyncio tasks on the replica that started them, but their state
+lives in the MongoDB jobs collection and is written after every batch, so
+any replica can report a job's progress and it survives a restart. The
+replica running a job holds a lease on it that the job supervisor renews.
+When a replica stops without finishing a job its lease lapses and another
+replica takes the job over: kinds registered with @resumable run again from
+their saved state, others are marked failed.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from entities.jobs import JobError, JobRecord, JobResponse, JobStatus
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# How long finished jobs stay queryable
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# A running job whose lease is not renewed for this long is taken over
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Failures recorded per job; further failures are only counted
+MAX_JOB_ERRORS = 100
+
+# Holder of the leases of jobs started by this process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobLost(Exception):
+    """The job's lease lapsed and another replica took it over"""
+
+
+@dataclass
+class Job:
+    """Progress of one background job"""
+
+    kind: str
+    total: Optional[int] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.PENDING
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    errors: List[JobError] = field(default_factory=list)
+    detail: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    task: Optional[asyncio.Task] = None
+
+    def record_error(self, item: int, detail: str) -> None:
+        """Count a failed item, keeping the first MAX_JOB_ERRORS details"""
+        self.failed += 1
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors.append(JobError(item=item, detail=detail))
+
+    def to_response(self) -> JobResponse:
+        """Snapshot the job for an API response"""
+        return JobResponse(
+            id=self.id,
+            kind=self.kind,
+            status=self.status,
+            total=self.total,
+            processed=self.processed,
+            succeeded=self.succeeded,
+            failed=self.failed,
+            errors=list(self.errors),
+            detail=self.detail,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+        )
+
+    def to_document(self) -> Dict[str, Any]:
+        """The job's fields as stored in the jobs collection"""
+        return {
+            "_id": self.id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "params": self.params,
+            "total": self.total,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors": [error.model_dump() for error in self.errors],
+            "detail": self.detail,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "Job":
+        """Rebuild a job from the jobs collection"""
+        return cls(
+            id=document["_id"],
+            kind=document["kind"],
+            status=JobStatus(document["status"]),
+            params=document.get("params") or {},
+            total=document.get("total"),
+            processed=document.get("processed", 0),
+            succeeded=document.get("succeeded", 0),
+            failed=document.get("failed", 0),
+            errors=[JobError(**error) for error in document.get("errors", [])],
+            detail=document.get("detail"),
+            created_at=document["created_at"],
+            finished_at=document.get("finished_at"),
+        )
+
+    async def save(self) -> None:
+        """
+        Write the job's progress and renew its lease
+
+        Raises:
+            JobLost: If another replica has taken the job over
+        """
+        document = self.to_document()
+        del document["_id"]
+        document.update(_lease())
+        result = await _collection().update_one(
+            {"_id": self.id, "owner": WORKER_ID}, {"$set": document}
+        )
+        if result.matched_count == 0:
+            raise JobLost(f"Job {self.id} is held by another replica")
+
+
+JobWork = Callable[[Job], Awaitable[None]]
+
+# Jobs started or taken over by this process and still running
+_running: Dict[str, Job] = {}
+# Work able to continue a job of the given kind from its saved state
+_resumable: Dict[str, JobWork] = {}
+
+
+def _collection():
+    return JobRecord.get_motor_collection()
+
+
+def _lease() -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "owner": WORKER_ID,
+        "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+        "updated_at": now,
+    }
+
+
+def resumable(kind: str) -> Callable[[JobWork], JobWork]:
+    """
+    Register work as able to resume jobs of kind
+
+    The work must read what to do from job.params and be safe to run again
+    after being interrupted at any point.
+    """
+
+    def register(work: JobWork) -> JobWork:
+        _resumable[kind] = work
+        return work
+
+    return register
+
+
+async def _finish(job: Job) -> None:
+    job.finished_at = datetime.utcnow()
+    try:
+        await job.save()
+    except Exception as e:
+        logger.error("Failed to record the outcome of job %s: %s", job.id, e)
+
+
+async def _release(job: Job) -> None:
+    """Let the lease lapse now so another replica resumes the job at once"""
+    try:
+        await _collection().update_one(
+            {"_id": job.id, "owner": WORKER_ID},
+            {"$set": {"lease_until": datetime.utcnow()}},
+        )
+    except Exception as e:
+        logger.error("Failed to release job %s: %s", job.id, e)
+
+
+async def _run(job: Job, work: JobWork) -> None:
+    try:
+        job.status = JobStatus.RUNNING
+        await job.save()
+        await work(job)
+        job.status = JobStatus.COMPLETED
+        logger.info(
+            "Job %s (%s) completed: %s succeeded, %s failed",
+            job.id,
+            job.kind,
+            job.succeeded,
+            job.failed,
+        )
+    except JobLost:
+        logger.warning("Job %s (%s) was taken over by another replica", job.id, job.kind)
+        return
+    except asyncio.CancelledError:
+        if job.kind in _resumable:
+            await _release(job)
+            logger.info("Job %s (%s) left for another replica to resume", job.id, job.kind)
+        else:
+            job.status = JobStatus.FAILED
+            job.detail = "Cancelled during shutdown"
+            await _finish(job)
+        raise
+    except Exception as e:
+        job.status = JobStatus.FAILED
+        job.detail = str(e)
+        logger.error("Job %s (%s) failed: %s", job.id, job.kind, e)
+    finally:
+        _running.pop(job.id, None)
+    await _finish(job)
+
+
+async def create_job(
+    kind: str, total: Optional[int] = None, params: Optional[Dict[str, Any]] = None
+) -> Job:
+    """
+    Record a pending job, leased to this process
+
+    A job that is never run, e.g. because the process stopped first, is
+    taken over once its lease lapses.
+
+    Args:
+        kind: Short job type name reported to clients
+        total: Number of items to process, if known up front
+        params: What the job works on; needed to resume it elsewhere
+    """
+    job = Job(kind=kind, total=total, params=params or {})
+    document = job.to_document()
+    document.update(_lease())
+    await _collection().insert_one(document)
+    return job
+
+
+def run_job(job: Job, work: JobWork) -> None:
+    """Run work for a recorded job in the background"""
+    _running[job.id] = job
+    job.task = asyncio.create_task(_run(job, work))
+    logger.info("Started job %s (%s)", job.id, job.kind)
+
+
+async def start_job(
+    kind: str,
+    work: JobWork,
+    total: Optional[int] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> Job:
+    """
+    Record a job and run work for it in the background
+
+    Args:
+        kind: Short job type name reported to clients
+        work: Coroutine function that processes items and updates the job
+        total: Number of items to process, if known up front
+        params: What the job works on; needed to resume it elsewhere
+
+    Returns:
+        The recorded job; poll get_job(job.id) for progress
+    """
+    job = await create_job(kind, total, params)
+    run_job(job, work)
+    return job
+
+
+async def get_job(job_id: str) -> Optional[JobResponse]:
+    """Look up a job started by any replica"""
+    job = _running.get(job_id)
+    if job is not None:
+        # Fresher than the copy saved after the last batch
+        return job.to_response()
+    document = await _collection().find_one({"_id": job_id})
+    return Job.from_document(document).to_response() if document else None
+
+
+async def cancel_jobs() -> None:
+    """Cancel jobs still running, e.g. on shutdown"""
+    tasks = [job.task for job in _running.values() if job.task and not job.task.done()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class JobSupervisor:
+    """
+    Keeps this replica's leases alive and takes over abandoned jobs
+
+    Every interval it renews the leases of the jobs running here, claims
+    unfinished jobs whose lease lapsed and deletes finished jobs older than
+    JOB_RETENTION_SECONDS.
+    """
+
+    def __init__(self, interval: float = JOB_LEASE_SECONDS / 3):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def renew(self) -> None:
+        """Extend the leases of the jobs running in this process"""
+        if _running:
+            await _collection().update_many(
+                {"_id": {"$in": list(_running)}, "owner": WORKER_ID}, {"$set": _lease()}
+            )
+
+    async def recover(self) -> int:
+        """
+        Claim unfinished jobs whose lease lapsed
+
+        Returns:
+            Number of jobs claimed
+        """
+        claimed = 0
+        while True:
+            document = await _collection().find_one_and_update(
+                {
+                    "status": {"$in": [JobStatus.PENDING.value, JobStatus.RUNNING.value]},
+                    "lease_until": {"$lt": datetime.utcnow()},
+                },
+                {"$set": _lease()},
+                return_document=ReturnDocument.AFTER,
+            )
+            if document is None:
+                return claimed
+            claimed += 1
+            job = Job.from_document(document)
+            work = _resumable.get(job.kind)
+            if work is not None:
+                logger.info("Resuming job %s (%s)", job.id, job.kind)
+                run_job(job, work)
+            else:
+                logger.warning("Job %s (%s) was interrupted and cannot resume", job.id, job.kind)
+                job.status = JobStatus.FAILED
+                job.detail = "Interrupted when the replica running it stopped"
+                await _finish(job)
+
+    async def prune(self) -> None:
+        """Delete jobs that finished more than JOB_RETENTION_SECONDS ago"""
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_RETENTION_SECONDS)
+        await _collection().delete_many({"finished_at": {"$lt": cutoff}})
+
+    async def start(self) -> None:
+        """Start supervising in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop supervising; running jobs are left to cancel_jobs"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.renew()
+                await self.recover()
+                await self.prune()
+            except Exception as e:
+                logger.error("Job supervision failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+# Shared supervisor; started once the database is connected
+job_supervisor = JobSupervisor()
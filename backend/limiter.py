@@ -3,39 +3,230 @@ Rate limiting configuration for ScottLMS
 Centralized rate limiting setup with enum-based limits
 """
 
+import functools
+import inspect
+import math
+import os
 from enum import Enum
-from fastapi import FastAPI
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from slowapi.util import get_remote_address
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from ratelimit import Rate, RateLimiter, RateLimitResult, create_storage
 
 
 class RateLimit(Enum):
     """Rate limit configurations for different HTTP methods"""
-    
+
     # HTTP Method-based limits
     GET = "200/minute"      # Read operations (users, courses, enrollments)
-    POST = "50/minute"      # Create operations (new users, courses, enrollments)  
+    POST = "50/minute"      # Create operations (new users, courses, enrollments)
     PUT = "50/minute"       # Update operations (modify existing data)
     DELETE = "20/minute"    # Delete operations (remove data)
-    
+    BULK = "5/minute"       # Bulk writes (each request carries many items)
+
     # Special endpoint limits (for future use)
     # AUTH = "10/minute"      # Authentication endpoints
     # ADMIN = "100/minute"    # Admin-only endpoints
 
 
+# Cost units each client may spend per period across all routes. Routes
+# cost 1 unit unless declared otherwise; list routes pay for the rows asked for
+RATE_LIMIT_BUDGET = os.getenv("RATE_LIMIT_BUDGET", "2000/minute")
+# Rows a list request may ask for per unit of cost
+RATE_LIMIT_ROWS_PER_UNIT = int(os.getenv("RATE_LIMIT_ROWS_PER_UNIT", "100"))
+
+# Proxies in front of the API that append to X-Forwarded-For (e.g. the
+# ingress); 0 keys clients by the socket peer address
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+
+
+def client_address(request: Request) -> str:
+    """
+    Address of the client as seen by the outermost trusted proxy
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so with N trusted proxies the client is the Nth entry
+    from the right. Entries further left are supplied by the client and
+    cannot be trusted.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if RATE_LIMIT_PROXY_HOPS <= 0:
+        return peer
+    forwarded = [
+        address.strip()
+        for address in request.headers.get("x-forwarded-for", "").split(",")
+        if address.strip()
+    ]
+    if not forwarded:
+        return peer
+    return forwarded[-min(RATE_LIMIT_PROXY_HOPS, len(forwarded))]
+
+
+def rows_cost(arguments: Dict[str, Any]) -> int:
+    """
+    Cost of a list request: one unit plus one per RATE_LIMIT_ROWS_PER_UNIT rows
+
+    Rows are the IDs sent to an ?ids= or /lookup request, otherwise the page
+    size asked for with ?limit=. Both are known before the query runs, so an
+    expensive request is refused before it reaches MongoDB.
+
+    Args:
+        arguments: The endpoint's arguments by name
+    """
+    lookup = arguments.get("lookup_data")
+    if lookup is not None:
+        rows = len(lookup.ids)
+    elif arguments.get("ids"):
+        rows = arguments["ids"].count(",") + 1
+    elif arguments.get("params") is not None:
+        rows = arguments["params"].limit
+    else:
+        rows = 0
+    return 1 + rows // RATE_LIMIT_ROWS_PER_UNIT
+
+
+def rate_limit_headers(rate: Rate, result: RateLimitResult) -> Dict[str, str]:
+    """RateLimit-* headers (IETF draft) describing a check's outcome"""
+    return {
+        "RateLimit-Limit": str(rate.amount),
+        "RateLimit-Remaining": str(result.remaining),
+        "RateLimit-Reset": str(math.ceil(result.reset_after)),
+        "RateLimit-Policy": f"{rate.amount};w={rate.period:g}",
+    }
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is over its route's limit"""
+
+    def __init__(self, rate: Rate, result: RateLimitResult):
+        super().__init__(str(rate))
+        self.rate = rate
+        self.result = result
+
+
+Cost = Union[int, Callable[[Dict[str, Any]], int]]
+
+
+class Limiter:
+    """
+    Per-route limits plus a cost budget per client, decorating FastAPI endpoints
+
+    Every request counts once against its route's limit and spends its cost
+    from the client's budget, so expensive routes are throttled in
+    proportion to the load they cause.
+    """
+
+    def __init__(
+        self,
+        engine: RateLimiter,
+        budget: str = RATE_LIMIT_BUDGET,
+        key_func: Callable[[Request], str] = client_address,
+    ):
+        self.engine = engine
+        self.budget = Rate.parse(budget)
+        self.key_func = key_func
+
+    def limit(self, limit_value: str, cost: Cost = 1) -> Callable:
+        """
+        Limit an endpoint to limit_value requests per client
+
+        The endpoint must take a `request: Request` parameter.
+
+        Args:
+            limit_value: Requests allowed per client, e.g. "200/minute"
+            cost: Budget units per request, or a function of the endpoint's
+                arguments returning them (see rows_cost)
+        """
+        rate = Rate.parse(limit_value)
+
+        def decorator(func: Callable) -> Callable:
+            scope = f"{func.__module__}.{func.__name__}"
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                arguments = signature.bind_partial(*args, **kwargs).arguments
+                units = cost(arguments) if callable(cost) else cost
+                self.check(arguments["request"], scope, rate, units)
+                return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def check(
+        self, request: Request, scope: str, rate: Rate, cost: int = 1
+    ) -> RateLimitResult:
+        """
+        Count a request against its route limit and charge its cost to the budget
+
+        Both limits are checked before either is counted, so a request one of
+        them refuses costs nothing. The outcome closest to exhaustion is kept
+        on request.state.rate_limit for the RateLimit-* response headers.
+
+        Raises:
+            RateLimitExceeded: If the client is over either limit
+        """
+        client = self.key_func(request)
+        limits = [rate, self.budget]
+        results = self.engine.hit_all(
+            [(f"{scope}:{client}", rate, 1), (f"budget:{client}", self.budget, cost)]
+        )
+        checks: List[Tuple[Rate, RateLimitResult]] = list(zip(limits, results))
+        for limit, result in checks:
+            if not result.allowed:
+                request.state.rate_limit = (limit, result)
+                raise RateLimitExceeded(limit, result)
+        request.state.rate_limit = min(
+            checks, key=lambda check: check[1].remaining / check[0].amount
+        )
+        return request.state.rate_limit[1]
+
+    async def start(self) -> None:
+        """Start sharing counts with the other replicas"""
+        await self.engine.start()
+
+    async def stop(self) -> None:
+        """Stop sharing counts"""
+        await self.engine.stop()
+
+
+async def rate_limit_exceeded_handler(
+    request: Request, exc: RateLimitExceeded
+) -> JSONResponse:
+    """429 naming the limit, with Retry-After in whole seconds"""
+    return JSONResponse(
+        {"error": f"Rate limit exceeded: {exc.rate}"},
+        status_code=429,
+        headers={
+            **rate_limit_headers(exc.rate, exc.result),
+            "Retry-After": str(max(1, math.ceil(exc.result.retry_after))),
+        },
+    )
+
+
+async def add_rate_limit_headers(request: Request, call_next):
+    """Report the remaining budget on every rate limited response"""
+    response = await call_next(request)
+    checked = getattr(request.state, "rate_limit", None)
+    if checked is not None and response.status_code != 429:
+        response.headers.update(rate_limit_headers(*checked))
+    return response
+
+
 # Create shared limiter instance
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(RateLimiter(create_storage()))
 
 def setup_rate_limiting(app: FastAPI) -> None:
     """
     Configure rate limiting for the FastAPI application
-    
+
     Args:
         app: FastAPI application instance
     """
     # Add rate limiting error handler
     app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-    app.add_middleware(SlowAPIMiddleware)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+    app.middleware("http")(add_rate_limit_headers)
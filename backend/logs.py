@@ -1,11 +1,71 @@
 """
 Logging configuration for ScottLMS
+
+Records are never written on the thread that logs them. A QueueHandler
+puts them on a bounded queue and a QueueListener thread encodes them as
+JSON lines and writes them to stdout, so a slow or blocked stdout holds up
+the listener instead of the event loop. When the queue is full records are
+dropped and counted rather than waited for. The listener is started by the
+application lifespan (start_logging); until then records wait in the queue.
+
+Call sites pass arguments lazily (logger.info("Created %s", user_id))
+rather than pre-formatting f-strings, so records below the level or
+sampled out are never formatted at all.
+
+High-volume loggers can be sampled: LOG_SAMPLING="timing=0.01" keeps 1% of
+the INFO and DEBUG records of the timing logger and its children. Warnings
+and errors are always kept.
 """
 
+import atexit
+import copy
 import logging
+import os
+import queue
+import random
+import re
 import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional, Union
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Union
+
+import orjson
+from prometheus_client import Counter
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "json" for one JSON object per line, "text" for the plain format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Records waiting to be written; further records are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Comma-separated logger=rate pairs, e.g. "timing=0.01,uvicorn.access=0.1"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Servers' loggers that write on the calling thread unless routed through the queue
+ROUTED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Request ids: accepted from X-Request-ID when they look like one
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Metrics
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped because the queue was full", ["level"]
+)
+LOG_RECORDS_SAMPLED_OUT = Counter(
+    "log_records_sampled_out_total", "Log records skipped by LOG_SAMPLING", ["logger"]
+)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed in extra
+_RECORD_FIELDS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
 
 
 class LogLevel(Enum):
@@ -23,25 +83,213 @@ class LogLevel(Enum):
         return getattr(logging, self.value)
 
 
-def setup_logging(level: Optional[Union[str, LogLevel]] = LogLevel.INFO) -> None:
+def parse_sampling(value: str) -> Dict[str, float]:
+    """
+    Parse LOG_SAMPLING into sample rates per logger name
+
+    Args:
+        value: Comma-separated logger=rate pairs
+
+    Returns:
+        Rates between 0 and 1 keyed by logger name
+    """
+    rates = {}
+    for pair in value.split(","):
+        if not pair.strip():
+            continue
+        name, _, rate = pair.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            raise ValueError(f"Invalid LOG_SAMPLING entry: {pair!r}")
+    return rates
+
+
+def current_request_id() -> Optional[str]:
+    """Id of the request being handled, if any"""
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the id of the request that logged them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the INFO and DEBUG records of configured loggers
+
+    A rule applies to the logger it names and its children; the longest
+    matching name wins.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._rules: Dict[str, Optional[str]] = {}
+
+    def _rule(self, name: str) -> Optional[str]:
+        rule = self._rules.get(name, "")
+        if rule == "":
+            rule = None
+            for prefix in self.rates:
+                if name == prefix or name.startswith(prefix + "."):
+                    if rule is None or len(prefix) > len(rule):
+                        rule = prefix
+            self._rules[name] = rule
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        rule = self._rule(record.name)
+        if rule is None or random.random() < self.rates[rule]:
+            return True
+        LOG_RECORDS_SAMPLED_OUT.labels(rule).inc()
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Puts records on the queue without waiting for room
+
+    Only the message is resolved before queueing, so arguments mutated
+    after the call cannot change what gets logged; the stock handler would
+    also run the full formatter here, which is left to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A copy, so other handlers of the same record still see its args
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(record.levelname).inc()
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop waits for room rather than failing on a full queue"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is when the record is emitted"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+def setup_logging(
+    level: Optional[Union[str, LogLevel]] = None,
+    log_format: str = LOG_FORMAT,
+    queue_size: int = LOG_QUEUE_SIZE,
+    sampling: str = LOG_SAMPLING,
+) -> None:
     """
-    Setup basic logging configuration
+    Setup queued logging on the root logger
+
+    Records are queued from now on but only written once start_logging has
+    run. Calling it again replaces the previous configuration.
 
     Args:
-        level: Logging level (can be string or LogLevel enum)
+        level: Logging level (can be string or LogLevel enum), LOG_LEVEL if not given
+        log_format: "json" or "text"
+        queue_size: Records allowed to wait for the writer thread
+        sampling: Sample rates per logger, as in LOG_SAMPLING
     """
+    global _listener, _handler
+
     if isinstance(level, LogLevel):
         log_level = level.level_value
     elif isinstance(level, str):
         log_level = getattr(logging, level.upper())
     else:
-        log_level = LogLevel.INFO.level_value
+        log_level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
+
+    shutdown_logging()
 
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)],
+    output = _StdoutHandler()
+    output.setFormatter(
+        JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
     )
+    log_queue: queue.Queue = queue.Queue(queue_size)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(parse_sampling(sampling)))
+    _handler.addFilter(RequestIdFilter())
+    _listener = DrainingQueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    root.addHandler(_handler)
+    for name in ROUTED_LOGGERS:
+        server_logger = logging.getLogger(name)
+        server_logger.handlers.clear()
+        server_logger.propagate = True
+
+
+def start_logging() -> None:
+    """Start writing queued records; called once the application starts"""
+    if _listener is not None and _listener._thread is None:
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and remove the queue handler"""
+    global _listener, _handler
+
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        # Stopping a listener that never started would wait forever on a full queue
+        if _listener._thread is not None:
+            _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -55,3 +303,40 @@ def get_logger(name: str) -> logging.Logger:
         Logger instance
     """
     return logging.getLogger(name)
+
+
+class RequestIdMiddleware:
+    """
+    Gives every request an id for its log records
+
+    A well-formed X-Request-ID from the client or a proxy is kept so logs
+    can be joined across services; otherwise one is generated. The id is
+    echoed in the response's X-Request-ID header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(raw=message["headers"])[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,180 @@
+"""
+Batch lookups of documents by ID for ScottLMS
+
+Clients resolving many references (e.g. the users behind a page of
+enrollments) fetch them with one $in query instead of one request per ID.
+Documents are served from the read cache where possible, including
+remembered misses.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Type
+
+from beanie import Document
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Response, status
+
+from cache import (
+    MISSING,
+    collection_name,
+    document_cache,
+    document_key,
+    document_tag,
+    estimate_size,
+)
+from serializers import DocumentSerializer
+
+# Most IDs accepted by one lookup
+MAX_LOOKUP_IDS = int(os.getenv("MAX_LOOKUP_IDS", "1000"))
+# Response header listing requested IDs that do not exist
+MISSING_IDS_HEADER = "X-Missing-Ids"
+# How many missing IDs that header lists (about 25 bytes each), so it stays
+# well under proxies' header size limits; POST /lookup returns them all
+MAX_MISSING_IDS_HEADER = int(os.getenv("MAX_MISSING_IDS_HEADER", "100"))
+# Response header with the number of missing IDs, including unlisted ones
+MISSING_COUNT_HEADER = "X-Missing-Count"
+
+
+@dataclass
+class Lookup:
+    """Documents found for a list of IDs"""
+
+    items: List[Dict[str, Any]]
+    missing: List[ObjectId]
+
+
+def unique_ids(ids: Iterable[ObjectId]) -> List[ObjectId]:
+    """
+    Drop repeated IDs, keeping first occurrences in order
+
+    Raises:
+        HTTPException: 400 if more than MAX_LOOKUP_IDS remain
+    """
+    ids = list(dict.fromkeys(ObjectId(value) for value in ids))
+    if len(ids) > MAX_LOOKUP_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_LOOKUP_IDS} ids may be looked up at once",
+        )
+    return ids
+
+
+def parse_ids(ids: str) -> List[ObjectId]:
+    """
+    Parse a comma-separated ?ids= parameter
+
+    Raises:
+        HTTPException: 400 if an ID is malformed or too many are given
+    """
+    parsed = []
+    for value in ids.split(","):
+        value = value.strip()
+        if not value:
+            continue
+        try:
+            parsed.append(ObjectId(value))
+        except (InvalidId, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid id '{value}'"
+            )
+    return unique_ids(parsed)
+
+
+async def fetch_by_ids(
+    document_model: Type[Document],
+    ids: List[ObjectId],
+    projection: Optional[Dict[str, Any]] = None,
+) -> Lookup:
+    """
+    Fetch documents by ID, with a single $in query for those not cached
+
+    Args:
+        document_model: Beanie document class to query
+        ids: IDs to fetch, already de-duplicated
+        projection: Fields to return
+
+    Returns:
+        Found documents in the order requested, plus the IDs not found
+    """
+    name = collection_name(document_model)
+    found = {}
+    uncached = []
+    for object_id in ids:
+        cached = document_cache.get(document_key(name, object_id, projection), name)
+        if cached is MISSING:
+            uncached.append(object_id)
+        elif cached is not None:
+            found[object_id] = cached
+
+    if uncached:
+        version = document_cache.version
+        cursor = document_model.get_motor_collection().find(
+            {"_id": {"$in": uncached}}, projection
+        )
+        fetched = {document["_id"]: document async for document in cursor}
+        for object_id in uncached:
+            document = fetched.get(object_id)
+            # Misses are cached too, with the shorter negative TTL
+            document_cache.put(
+                document_key(name, object_id, projection),
+                document,
+                estimate_size([document]),
+                [document_tag(name, object_id)],
+                negative=document is None,
+                since=version,
+            )
+        found.update(fetched)
+
+    return Lookup(
+        items=[found[object_id] for object_id in ids if object_id in found],
+        missing=[object_id for object_id in ids if object_id not in found],
+    )
+
+
+async def existing_ids(
+    document_model: Type[Document], ids: Iterable[ObjectId]
+) -> Set[ObjectId]:
+    """Return which of the given IDs exist, using one $in query on _id"""
+    ids = list(ids)
+    if not ids:
+        return set()
+    cursor = document_model.get_motor_collection().find(
+        {"_id": {"$in": ids}}, {"_id": True}
+    )
+    return {document["_id"] async for document in cursor}
+
+
+async def fetch_document(
+    document_model: Type[Document],
+    document_id: ObjectId,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Fetch one raw document by ID through the read cache"""
+    lookup = await fetch_by_ids(document_model, [document_id], projection)
+    return lookup.items[0] if lookup.items else None
+
+
+def lookup_list_response(serializer: DocumentSerializer, lookup: Lookup) -> Response:
+    """
+    JSON array of the found documents, with missing IDs in headers
+
+    X-Missing-Ids lists the first MAX_MISSING_IDS_HEADER of them and
+    X-Missing-Count says how many there are in all.
+    """
+    response = serializer.response(lookup.items)
+    if lookup.missing:
+        response.headers[MISSING_IDS_HEADER] = ",".join(
+            map(str, lookup.missing[:MAX_MISSING_IDS_HEADER])
+        )
+        response.headers[MISSING_COUNT_HEADER] = str(len(lookup.missing))
+    return response
+
+
+def lookup_response(serializer: DocumentSerializer, lookup: Lookup) -> Response:
+    """{"items": [...], "missing": [...]} body for POST lookups"""
+    return Response(
+        content=serializer.dumps_envelope(lookup.items, missing=lookup.missing),
+        media_type="application/json",
+    )
@@ -3,23 +3,63 @@ ScottLMS - Simplified Learning Management System
 Main FastAPI application entry point
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import init_db
-from logs import setup_logging
-from routers import users, courses, enrollments
+from cache import document_cache
+from compression import CompressionMiddleware
+from database import close_db, connect_with_retry, init_db
+from health import readiness
+from invalidation import invalidation_bus
+from jobs import cancel_jobs, job_supervisor
+from logs import RequestIdMiddleware, setup_logging, start_logging
+from metrics import setup_metrics
+from passwords import password_hasher
+from routers import users, courses, enrollments, stats, admin, jobs
 from limiter import limiter, setup_rate_limiting, RateLimit
+from timing import SERVER_TIMING, ServerTimingMiddleware
+
+
+async def connect_services() -> None:
+    """Connect to MongoDB and start the services that share state through it"""
+    await init_db()
+    await limiter.start()
+    await job_supervisor.start()
+    if document_cache.enabled:
+        await invalidation_bus.start()
+
+
+async def start_services() -> None:
+    """Retry connect_services until it succeeds, then report ready"""
+    await connect_with_retry(connect_services)
+    readiness.mark_started()
+    await readiness.check()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
-    # Startup
-    await init_db()
+    # Startup: write the log records queued since import, from a thread of
+    # this process rather than at import time
+    start_logging()
+    # Serve /health at once and connect in the background; /ready
+    # keeps traffic away until the connection is up
+    await readiness.start()
+    startup = asyncio.create_task(start_services())
     yield
-    # Shutdown - cleanup if needed
+    # Shutdown
+    startup.cancel()
+    await asyncio.gather(startup, return_exceptions=True)
+    await readiness.stop()
+    await invalidation_bus.stop()
+    await limiter.stop()
+    await job_supervisor.stop()
+    await cancel_jobs()
+    password_hasher.shutdown()
+    await close_db()
 
 
 # Create FastAPI application
@@ -30,12 +70,20 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Compress large responses with the encoding the client accepts. Added first
+# so it wraps the routes directly and sees whole bodies rather than the
+# re-streamed output of the middleware added after it.
+app.add_middleware(CompressionMiddleware)
+
 # Setup rate limiting
 setup_rate_limiting(app)
 
 # Setup logging
 setup_logging()
 
+# Setup Prometheus metrics endpoint
+setup_metrics(app)
+
 # Add CORS middleware
 import os
 
@@ -58,7 +106,21 @@ app.add_middleware(
         "Authorization",
         "X-Requested-With"
     ],  # Specific headers only
-    expose_headers=["X-Total-Count"],  # Only expose necessary headers
+    expose_headers=[
+        "X-Total-Count",
+        "X-Next-Cursor",
+        "X-Missing-Ids",
+        "X-Missing-Count",
+        "Location",
+        "ETag",
+        "RateLimit-Limit",
+        "RateLimit-Remaining",
+        "RateLimit-Reset",
+        "RateLimit-Policy",
+        "Retry-After",
+        "Server-Timing",
+        "X-Request-ID",
+    ],  # Only expose necessary headers
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
@@ -72,10 +134,17 @@ async def root(request: Request):
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check: the process is serving requests; never touches MongoDB"""
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check from the cached database probe; 503 until ready"""
+    ready, details = readiness.status()
+    return JSONResponse(details, status_code=200 if ready else 503)
+
+
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
     """Add security headers to all responses"""
@@ -91,10 +160,21 @@ async def add_security_headers(request: Request, call_next):
     return response
 
 
+# Added last so it is outermost: its middleware phase covers everything above
+if SERVER_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Outermost of all, so every log line of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
+
 # Include API routers
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(courses.router, prefix="/api/courses", tags=["courses"])
 app.include_router(enrollments.router, prefix="/api/enrollments", tags=["enrollments"])
+app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
 if __name__ == "__main__":
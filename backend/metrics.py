@@ -0,0 +1,180 @@
+"""
+Prometheus metrics endpoint for ScottLMS
+
+Besides the /metrics endpoint this module records per-route HTTP metrics and
+per-command MongoDB timings. Routes are labelled by their template (e.g.
+/api/users/{user_id}) rather than the raw path, so label cardinality stays
+bounded by the number of routes.
+"""
+
+import time
+from threading import Lock
+from typing import Dict, Tuple
+
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Label for requests that match no route, e.g. 404s for arbitrary paths
+UNMATCHED_ROUTE = "unmatched"
+
+# Metrics
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", ["method", "route"]
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Response body bytes sent, after compression",
+    ["method", "route"],
+    buckets=(100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000),
+)
+MONGODB_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds",
+    "Round trip time of MongoDB commands as reported by the driver",
+    ["command", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+MONGODB_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed", ["command", "collection"]
+)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route a request will be dispatched to
+
+    Matched against the same compiled path patterns the router uses, but
+    before dispatch, so the in-progress gauge can be labelled while the
+    request is still running.
+    """
+    path = scope["path"]
+    method = scope["method"]
+    partial = None
+    for route in scope["app"].router.routes:
+        path_regex = getattr(route, "path_regex", None)
+        if path_regex is None:
+            # Mounts and custom routes; slower but complete
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            continue
+        if path_regex.match(path) is None:
+            continue
+        methods = getattr(route, "methods", None)
+        if methods is None or method in methods:
+            return route.path
+        if partial is None:
+            # Path matches but the method does not (405)
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording count, latency, size and concurrency per route"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_RESPONSE_SIZE.labels(method, route).observe(size)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            in_progress.dec()
+
+
+def command_collection(command_name: str, command: Dict) -> str:
+    """Collection a command targets, or "" for server and database commands"""
+    if command_name == "getMore":
+        return command.get("collection", "")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Exports MongoDB command durations to Prometheus
+
+    Succeeded and failed events do not carry the command document, so the
+    collection is remembered from the started event by request ID. The
+    driver calls these from its own threads.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._collections: Dict[Tuple[int, int], str] = {}
+
+    def started(self, event):
+        collection = command_collection(event.command_name, event.command)
+        with self._lock:
+            self._collections[(event.request_id, event.operation_id)] = collection
+
+    def _finish(self, event) -> str:
+        with self._lock:
+            return self._collections.pop((event.request_id, event.operation_id), "")
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        MONGODB_COMMAND_DURATION.labels(event.command_name, collection).observe(
+            event.duration_micros / 1_000_000
+        )
+
+    def failed(self, event):
+        collection = self._finish(event)
+        MONGODB_COMMAND_DURATION.labels(event.command_name, collection).observe(
+            event.duration_micros / 1_000_000
+        )
+        MONGODB_COMMAND_FAILURES.labels(event.command_name, collection).inc()
+
+
+# Registered on the client created by init_db
+command_listener = CommandMetricsListener()
+
+
+def setup_metrics(app: FastAPI) -> None:
+    """
+    Expose the default Prometheus registry at /metrics and record route metrics
+
+    Args:
+        app: FastAPI application instance
+    """
+    # Wraps every middleware added before it, so latency includes their work
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,330 @@
+"""
+Keyset (cursor) pagination helpers for ScottLMS list endpoints
+"""
+
+import asyncio
+import base64
+import binascii
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from beanie import Document
+from bson import Decimal128, ObjectId, json_util
+from fastapi import HTTPException, Query, Request, Response, status
+
+from cache import MISSING, collection_name, document_cache, estimate_size, query_key
+
+# Page size configuration
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+# Largest page a streamed (?stream=true or NDJSON) response may return
+MAX_STREAM_PAGE_SIZE = int(os.getenv("MAX_STREAM_PAGE_SIZE", "100000"))
+
+# Response headers carrying pagination metadata
+TOTAL_COUNT_HEADER = "X-Total-Count"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Types a sort value or _id in a cursor may have
+CURSOR_VALUE_TYPES = (str, int, float, bool, datetime, ObjectId, Decimal128, type(None))
+
+
+@dataclass
+class PageParams:
+    """Paging options shared by every list endpoint"""
+
+    limit: int
+    after: Optional[str]
+    stream: bool
+    ndjson: bool
+
+
+def page_params(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_STREAM_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
+    stream: bool = Query(False, description="Stream the page as a JSON array"),
+) -> PageParams:
+    """
+    FastAPI dependency parsing the paging query parameters
+
+    Requests sending "Accept: application/x-ndjson" are streamed as NDJSON.
+    Only streamed responses may ask for more than MAX_PAGE_SIZE documents.
+    """
+    ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    stream = stream or ndjson
+    if not stream and limit > MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"limit may not exceed {MAX_PAGE_SIZE} unless the response is streamed",
+        )
+    return PageParams(limit=limit, after=after, stream=stream, ndjson=ndjson)
+
+
+@dataclass
+class Page:
+    """A single page of raw documents plus its pagination metadata"""
+
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    total: int
+
+
+def encode_cursor(sort_value: Any, last_id: Any) -> str:
+    """
+    Encode the position after the last returned document as an opaque cursor
+
+    Args:
+        sort_value: Value of the sort key on the last document
+        last_id: ObjectId of the last document (tie-breaker)
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json_util.dumps(
+        [sort_value, last_id], json_options=json_util.CANONICAL_JSON_OPTIONS
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or holds anything
+            other than CURSOR_VALUE_TYPES, which could inject query operators
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = json_util.loads(base64.urlsafe_b64decode(padded).decode("utf-8"))
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError("cursor must hold a sort value and an id")
+        # Anything else could act as a query operator: a {"$ne": ...}
+        # document, or a regular expression matched by equality
+        if not all(isinstance(part, CURSOR_VALUE_TYPES) for part in value):
+            raise ValueError("cursor values must be plain sort values")
+        return value
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor"
+        )
+
+
+def position_filter(
+    sort_value: Any,
+    last_id: Any,
+    sort_field: str = "_id",
+    descending: bool = False,
+    after: bool = True,
+) -> Dict[str, Any]:
+    """
+    Build the MongoDB filter selecting documents relative to a position
+
+    Documents are ordered by (sort_field, _id) so the position is unique
+    even when several documents share the same sort value.
+
+    Args:
+        sort_value: Sort key value at the position
+        last_id: ObjectId at the position
+        sort_field: Field the documents are ordered by
+        descending: Whether the order is from highest to lowest
+        after: Select documents strictly after the position when True,
+            otherwise documents up to and including it
+    """
+    if after:
+        key_op = id_op = "$lt" if descending else "$gt"
+    else:
+        key_op = "$gt" if descending else "$lt"
+        id_op = key_op + "e"
+    if sort_field == "_id":
+        return {"_id": {id_op: last_id}}
+    return {
+        "$or": [
+            {sort_field: {key_op: sort_value}},
+            {sort_field: sort_value, "_id": {id_op: last_id}},
+        ]
+    }
+
+
+def keyset_filter(
+    cursor: str, sort_field: str = "_id", descending: bool = False
+) -> Dict[str, Any]:
+    """Build the MongoDB filter selecting documents strictly after a cursor"""
+    sort_value, last_id = decode_cursor(cursor)
+    return position_filter(sort_value, last_id, sort_field, descending)
+
+
+def unique_sort(document_model: Type[Document], sort_field: str) -> bool:
+    """
+    Whether sort_field alone orders documents without ties
+
+    True for fields with a unique single-field index, whose order needs no
+    _id tiebreak and so can be walked on that index alone.
+    """
+    if sort_field == "_id":
+        return True
+    return any(
+        list(index.document["key"]) == [sort_field] and index.document.get("unique")
+        for index in getattr(document_model.Settings, "indexes", [])
+    )
+
+
+def sort_spec(
+    sort_field: str = "_id", descending: bool = False, unique: bool = False
+) -> List[Tuple[str, int]]:
+    """
+    Return the (sort_field, _id) sort specification for a keyset order
+
+    The _id tiebreak is left out when sort_field is unique (see unique_sort).
+    """
+    direction = -1 if descending else 1
+    sort = [(sort_field, direction)]
+    if sort_field != "_id" and not unique:
+        sort.append(("_id", direction))
+    return sort
+
+
+def after_query(
+    filters: Dict[str, Any],
+    after: Optional[str],
+    sort_field: str = "_id",
+    descending: bool = False,
+) -> Dict[str, Any]:
+    """Combine list filters with the keyset condition of an optional cursor"""
+    if not after:
+        return filters
+    return {"$and": [filters, keyset_filter(after, sort_field, descending)]}
+
+
+def page_pipeline(
+    query: Dict[str, Any],
+    sort_field: str = "_id",
+    descending: bool = False,
+    limit: Optional[int] = None,
+    stages: Optional[List[Dict[str, Any]]] = None,
+    unique: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Build an aggregation pipeline that pages first and then runs stages
+
+    Matching, sorting and limiting come first so MongoDB walks the same
+    indexes as the equivalent find(); the extra stages (e.g. $lookup) only
+    ever see the documents of one page.
+    """
+    pipeline = [{"$match": query}, {"$sort": dict(sort_spec(sort_field, descending, unique))}]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    return pipeline + list(stages or [])
+
+
+async def count_documents(
+    document_model: Type[Document], filters: Dict[str, Any]
+) -> int:
+    """Count matching documents, using the collection estimate when unfiltered"""
+    collection = document_model.get_motor_collection()
+    if not filters:
+        return await collection.estimated_document_count()
+    return await collection.count_documents(filters)
+
+
+async def paginate(
+    document_model: Type[Document],
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    sort_field: str = "_id",
+    descending: bool = False,
+    projection: Optional[Dict[str, Any]] = None,
+    stages: Optional[List[Dict[str, Any]]] = None,
+) -> Page:
+    """
+    Fetch one page of raw documents ordered by (sort_field, _id)
+
+    Documents are read straight from the Motor collection, skipping Beanie
+    model construction; pair with a DocumentSerializer to build responses.
+    Pages are served from the read cache until a write to any collection
+    they read invalidates them.
+
+    Args:
+        document_model: Beanie document class to query
+        filters: MongoDB filter applied before paging
+        limit: Maximum number of documents to return
+        after: Cursor returned with the previous page
+        sort_field: Document field to order by
+        descending: Whether to order from highest to lowest
+        projection: Fields to fetch (all fields when None); ignored with stages
+        stages: Aggregation stages run on the page, e.g. $lookup joins; they
+            must keep _id and sort_field for the next cursor
+
+    Returns:
+        Page with the documents, the next cursor (None on the last page)
+        and the total number of documents matching the filters
+    """
+    filters = filters or {}
+    query = after_query(filters, after, sort_field, descending)
+    if projection is not None:
+        projection = {**projection, sort_field: 1}
+
+    name = collection_name(document_model)
+    cache_key = query_key(
+        name,
+        filters=filters,
+        limit=limit,
+        after=after,
+        sort=[sort_field, descending],
+        projection=projection,
+        stages=stages,
+    )
+    cached = document_cache.get(cache_key, name)
+    if cached is not MISSING:
+        return cached
+    version = document_cache.version
+
+    # Fetch one extra document to know whether another page exists
+    collection = document_model.get_motor_collection()
+    unique = unique_sort(document_model, sort_field)
+    if stages:
+        cursor = collection.aggregate(
+            page_pipeline(query, sort_field, descending, limit + 1, stages, unique)
+        )
+    else:
+        cursor = (
+            collection.find(query, projection)
+            .sort(sort_spec(sort_field, descending, unique))
+            .limit(limit + 1)
+        )
+    documents, total = await asyncio.gather(
+        cursor.to_list(length=limit + 1),
+        count_documents(document_model, filters),
+    )
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+
+    page = Page(items=documents, next_cursor=next_cursor, total=total)
+    # Joined collections invalidate the page too
+    tags = [name] + [
+        stage["$lookup"]["from"] for stage in stages or [] if "$lookup" in stage
+    ]
+    document_cache.put(cache_key, page, estimate_size(documents), tags, since=version)
+    return page
+
+
+def pagination_headers(total: int, next_cursor: Optional[str]) -> Dict[str, str]:
+    """Build the response headers describing a page"""
+    headers = {TOTAL_COUNT_HEADER: str(total)}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return headers
+
+
+def set_pagination_headers(response: Response, page: Page) -> None:
+    """Expose the total count and next cursor of a page as response headers"""
+    response.headers.update(pagination_headers(page.total, page.next_cursor))
@@ -0,0 +1,191 @@
+"""
+Password hashing for ScottLMS
+
+bcrypt with 12 rounds costs roughly 250ms of CPU per hash, so hashing runs
+on a dedicated, size-limited thread pool instead of the event loop. bcrypt
+releases the GIL while hashing, so worker threads hash in parallel. Bulk
+imports hash on a separate process pool sized to the container's CPU quota
+so they never compete with interactive sign-ups for the thread pool.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+import bcrypt
+from prometheus_client import Counter, Gauge, Histogram
+
+from logs import get_logger
+from timing import timed
+
+logger = get_logger(__name__)
+
+# Pool configuration
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))
+# Processes used by bulk imports; 0 sizes the pool to the CPU quota
+IMPORT_HASH_PROCESSES = int(os.getenv("IMPORT_HASH_PROCESSES", "0"))
+
+# Metrics
+HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "Password hashes waiting for a free worker"
+)
+HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight", "Password hashes queued or running"
+)
+HASH_WAIT_SECONDS = Histogram(
+    "password_hash_wait_seconds",
+    "Time a password hash waited in the queue",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HASH_DURATION_SECONDS = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent computing a password hash",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2),
+)
+HASH_REJECTED = Counter(
+    "password_hash_rejected_total", "Password hashes rejected because the queue was full"
+)
+
+
+def cpu_quota() -> int:
+    """
+    Number of CPUs this container may use
+
+    Reads the cgroup v2 (cpu.max) or v1 (cfs quota/period) CPU limit, since
+    os.cpu_count() reports the host's CPUs rather than the pod's limit.
+    """
+    limits = (
+        ("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+    )
+    for quota_path, period_path in limits:
+        try:
+            with open(quota_path) as f:
+                values = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    values.append(f.read().strip())
+            quota, period = values[0], values[1]
+            if quota not in ("max", "-1"):
+                return max(1, int(quota) // int(period))
+        except (OSError, ValueError, IndexError):
+            continue
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class HashingPoolFull(Exception):
+    """Raised when the hash queue is full and the request should be retried"""
+
+
+def hash_password(password: str) -> str:
+    """
+    Secure password hashing with bcrypt
+
+    Uses 12 rounds for strong security while maintaining reasonable performance.
+    This matches the hashing used in the MongoDB initialization script.
+    Blocks for the whole hash; use password_hasher.hash from async code.
+
+    Args:
+        password: Plain text password to hash
+
+    Returns:
+        bcrypt hash string that can be safely stored in the database
+    """
+    # Generate salt and hash password with 12 rounds (same as Node.js script)
+    salt = bcrypt.gensalt(rounds=12)
+    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
+
+
+class PasswordHasher:
+    """Bounded worker pool that hashes passwords off the event loop"""
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def _update_gauges(self) -> None:
+        HASH_IN_FLIGHT.set(self.pending)
+        HASH_QUEUE_DEPTH.set(max(0, self.pending - self.workers))
+
+    def _timed_hash(self, password: str, enqueued_at: float) -> str:
+        started_at = time.perf_counter()
+        HASH_WAIT_SECONDS.observe(started_at - enqueued_at)
+        try:
+            return hash_password(password)
+        finally:
+            HASH_DURATION_SECONDS.observe(time.perf_counter() - started_at)
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password on the worker pool
+
+        Raises:
+            HashingPoolFull: if every worker is busy and the queue is full
+        """
+        if self.pending >= self.capacity:
+            HASH_REJECTED.inc()
+            raise HashingPoolFull()
+
+        self.pending += 1
+        self._update_gauges()
+        try:
+            loop = asyncio.get_running_loop()
+            with timed("hashing"):
+                return await loop.run_in_executor(
+                    self._executor, self._timed_hash, password, time.perf_counter()
+                )
+        finally:
+            self.pending -= 1
+            self._update_gauges()
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        # Started on first import rather than at startup; spawn avoids
+        # forking a process that already runs the event loop and driver threads
+        if self._process_pool is None:
+            processes = IMPORT_HASH_PROCESSES or cpu_quota()
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info("Started bulk password hashing pool with %s processes", processes)
+        return self._process_pool
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash a batch of passwords in parallel on the bulk import process pool
+
+        Args:
+            passwords: Plain text passwords to hash
+
+        Returns:
+            bcrypt hashes in the same order as passwords
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_process_pool()
+        with timed("hashing"):
+            return await asyncio.gather(
+                *(loop.run_in_executor(pool, hash_password, password) for password in passwords)
+            )
+
+    def shutdown(self) -> None:
+        """Stop the worker threads and processes once queued hashes finish"""
+        self._executor.shutdown(wait=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True)
+        logger.info("Password hashing pool stopped")
+
+
+# Shared hasher instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,196 @@
+"""
+MongoDB connection pool settings, warmup and metrics
+
+Pool sizing and timeouts come from the environment so each deployment can
+size its pools against the server's connection budget: with N API replicas
+MongoDB sees up to N * MONGODB_MAX_POOL_SIZE connections. Checkouts that
+wait longer than MONGODB_WAIT_QUEUE_TIMEOUT_MS fail instead of queueing
+silently, and a CMAP listener exports checkout waits and pool occupancy.
+"""
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import Any, Dict, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Pool configuration
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+# Connections kept open while idle, and opened during startup
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))
+# Connections being established at once per server
+MONGODB_MAX_CONNECTING = int(os.getenv("MONGODB_MAX_CONNECTING", "2"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+# Longest a request waits for a free connection before failing
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")
+)
+# How long startup waits for the pool to reach MONGODB_MIN_POOL_SIZE
+MONGODB_WARMUP_SECONDS = float(os.getenv("MONGODB_WARMUP_SECONDS", "5"))
+
+# Metrics
+POOL_CHECKOUT_WAIT = Histogram(
+    "mongodb_pool_checkout_wait_seconds",
+    "Time from requesting a pooled connection to receiving it",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 2.5),
+)
+POOL_CHECKOUT_FAILURES = Counter(
+    "mongodb_pool_checkout_failures_total",
+    "Connection checkouts that failed, by reason",
+    ["reason"],
+)
+POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections", "Open pooled connections", ["address"]
+)
+POOL_CONNECTIONS_IN_USE = Gauge(
+    "mongodb_pool_connections_in_use", "Pooled connections checked out", ["address"]
+)
+POOL_WAITING = Gauge(
+    "mongodb_pool_waiting", "Checkouts waiting for a connection", ["address"]
+)
+POOL_MAX_SIZE = Gauge("mongodb_pool_max_size", "Configured maximum pool size")
+POOL_CLEARED = Counter(
+    "mongodb_pool_cleared_total", "Pools cleared after a server error", ["address"]
+)
+
+
+def pool_options() -> Dict[str, Any]:
+    """Keyword arguments for AsyncIOMotorClient built from the pool settings"""
+    return {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "maxConnecting": MONGODB_MAX_CONNECTING,
+        "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    }
+
+
+def _address(address: Tuple[str, int]) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Exports connection pool events to Prometheus
+
+    The driver calls these from its own threads, so the counts it keeps for
+    warmup are guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._open: Dict[str, int] = defaultdict(int)
+
+    def open_connections(self) -> int:
+        """Open connections across all servers"""
+        with self._lock:
+            return sum(self._open.values())
+
+    def pool_created(self, event):
+        POOL_MAX_SIZE.set(MONGODB_MAX_POOL_SIZE)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        POOL_CLEARED.labels(_address(event.address)).inc()
+
+    def pool_closed(self, event):
+        address = _address(event.address)
+        with self._lock:
+            self._open.pop(address, None)
+        POOL_CONNECTIONS.labels(address).set(0)
+        POOL_CONNECTIONS_IN_USE.labels(address).set(0)
+        POOL_WAITING.labels(address).set(0)
+
+    def connection_created(self, event):
+        address = _address(event.address)
+        with self._lock:
+            self._open[address] += 1
+        POOL_CONNECTIONS.labels(address).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        address = _address(event.address)
+        with self._lock:
+            if self._open[address] > 0:
+                self._open[address] -= 1
+        POOL_CONNECTIONS.labels(address).dec()
+
+    def connection_check_out_started(self, event):
+        POOL_WAITING.labels(_address(event.address)).inc()
+
+    def connection_check_out_failed(self, event):
+        POOL_WAITING.labels(_address(event.address)).dec()
+        POOL_CHECKOUT_FAILURES.labels(event.reason).inc()
+        if event.duration is not None:
+            POOL_CHECKOUT_WAIT.observe(event.duration)
+
+    def connection_checked_out(self, event):
+        address = _address(event.address)
+        POOL_WAITING.labels(address).dec()
+        POOL_CONNECTIONS_IN_USE.labels(address).inc()
+        if event.duration is not None:
+            POOL_CHECKOUT_WAIT.observe(event.duration)
+
+    def connection_checked_in(self, event):
+        POOL_CONNECTIONS_IN_USE.labels(_address(event.address)).dec()
+
+
+# Registered on the client created by init_db
+pool_listener = PoolMetricsListener()
+
+
+async def warm_pool(
+    client,
+    target: int = MONGODB_MIN_POOL_SIZE,
+    timeout: float = MONGODB_WARMUP_SECONDS,
+    listener: PoolMetricsListener = pool_listener,
+) -> int:
+    """
+    Open pooled connections before the first request needs them
+
+    Concurrent pings open connections in parallel; the driver's background
+    maintenance then tops the pool up to minPoolSize, which is waited for
+    up to timeout seconds. Startup continues with a smaller pool if the
+    target is not reached in time.
+
+    Returns:
+        Open connections when warmup finished
+    """
+    if target <= 0:
+        return listener.open_connections()
+    started = time.perf_counter()
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(target)))
+    deadline = started + timeout
+    while listener.open_connections() < target and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    opened = listener.open_connections()
+    elapsed = time.perf_counter() - started
+    if opened < target:
+        logger.warning(
+            "Connection pool warmup reached %s/%s connections in %.2fs",
+            opened,
+            target,
+            elapsed,
+        )
+    else:
+        logger.info(
+            "Connection pool warmed up with %s connections in %.2fs", opened, elapsed
+        )
+    return opened
@@ -0,0 +1,72 @@
+"""
+Query parameter translation helpers for ScottLMS list endpoints
+"""
+
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+def parse_sort(sort: Optional[str], allowed: Iterable[str]) -> Tuple[str, bool]:
+    """
+    Parse a sort parameter such as "-created_at"
+
+    Args:
+        sort: Field name, prefixed with "-" for descending order
+        allowed: Field names clients may sort by
+
+    Returns:
+        Tuple of (field name, descending flag); defaults to ("_id", False)
+
+    Raises:
+        HTTPException: 400 if the field is not sortable
+    """
+    if not sort:
+        return "_id", False
+
+    descending = sort.startswith("-")
+    field = sort.lstrip("-+")
+    if field not in allowed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot sort by '{field}'. Allowed: {', '.join(sorted(allowed))}",
+        )
+    return field, descending
+
+
+def search_filter(term: Optional[str], fields: Iterable[str]) -> Dict[str, Any]:
+    """Build a case-insensitive substring match across several fields"""
+    if not term:
+        return {}
+    pattern = {"$regex": re.escape(term.strip()), "$options": "i"}
+    return {"$or": [{field: pattern} for field in fields]}
+
+
+def range_filter(
+    field: str, minimum: Optional[float] = None, maximum: Optional[float] = None
+) -> Dict[str, Any]:
+    """Build an inclusive range match, skipping open bounds"""
+    bounds = {}
+    if minimum is not None:
+        bounds["$gte"] = minimum
+    if maximum is not None:
+        bounds["$lte"] = maximum
+    if not bounds:
+        return {}
+    if minimum is not None and maximum is not None and minimum > maximum:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {field} range: minimum is greater than maximum",
+        )
+    return {field: bounds}
+
+
+def combine_filters(*filters: Dict[str, Any]) -> Dict[str, Any]:
+    """AND together non-empty filters, keeping the result flat when possible"""
+    present = [f for f in filters if f]
+    if not present:
+        return {}
+    if len(present) == 1:
+        return present[0]
+    return {"$and": present}
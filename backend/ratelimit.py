@@ -0,0 +1,383 @@
+"""
+Rate limiting engine shared by all API replicas
+
+Limits are enforced with a sliding window counter: a key keeps one count
+for the current fixed window and one for the previous window, and the
+previous count is weighted by how much of it still overlaps the sliding
+window. That is O(1) state per key, and unlike a log of timestamps the
+state is plain counters that replicas can sum in MongoDB with $inc.
+
+Each replica decides locally from the totals last read from storage plus
+its own hits since then; a background task pushes those hits and pulls new
+totals every RATE_LIMIT_SYNC_SECONDS. Requests never wait on MongoDB, and a
+client spread over several replicas can overshoot a limit by at most what
+it sends within one sync interval.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from prometheus_client import Counter, Histogram
+from pymongo import UpdateOne
+
+from database import get_database
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Rate limit configuration
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "mongo")
+RATE_LIMIT_COLLECTION = os.getenv("RATE_LIMIT_COLLECTION", "rate_limits")
+RATE_LIMIT_SYNC_SECONDS = float(os.getenv("RATE_LIMIT_SYNC_SECONDS", "0.25"))
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE_PATTERN = re.compile(
+    r"\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*"
+)
+
+# Metrics
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total", "Rate limit checks by outcome", ["result"]
+)
+# Label lookups resolved once; hit() runs on every request
+_ALLOWED = RATE_LIMIT_DECISIONS.labels("allowed")
+_DENIED = RATE_LIMIT_DECISIONS.labels("denied")
+RATE_LIMIT_SYNC_TIME = Histogram(
+    "rate_limit_sync_seconds",
+    "Time to exchange rate limit counts with shared storage",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+RATE_LIMIT_SYNC_FAILURES = Counter(
+    "rate_limit_sync_failures_total", "Failed exchanges with shared storage"
+)
+
+
+@dataclass(frozen=True)
+class Rate:
+    """A limit of amount hits per period seconds"""
+
+    amount: int
+    period: float
+    text: str
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        """
+        Parse a limit such as "200/minute" or "10 per 5 seconds"
+
+        Raises:
+            ValueError: If the string is not a rate
+        """
+        match = _RATE_PATTERN.fullmatch(value.lower())
+        if not match:
+            raise ValueError(f"Invalid rate limit: {value}")
+        amount, multiple, unit = match.groups()
+        return cls(int(amount), int(multiple or 1) * _PERIODS[unit], value)
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class RateLimitResult(NamedTuple):
+    """Outcome of one rate limit check"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until a request of the same cost would be allowed (0 if allowed)
+    retry_after: float
+    # Seconds until the current window closes and its hits start to age out
+    reset_after: float
+
+
+class RateLimitStorage:
+    """Shared counts of hits per window bucket"""
+
+    async def start(self) -> None:
+        """Prepare the storage, e.g. create indexes"""
+
+    async def exchange(
+        self, increments: Dict[str, int], expiries: Dict[str, float]
+    ) -> Dict[str, int]:
+        """
+        Add increments to their buckets and read the totals of active buckets
+
+        Args:
+            increments: Hits to add per bucket ID
+            expiries: Every bucket ID to read, with the Unix time after which
+                it no longer matters
+
+        Returns:
+            Current total per bucket ID; buckets without hits may be missing
+        """
+        raise NotImplementedError
+
+
+class MemoryStorage(RateLimitStorage):
+    """Counts kept in this process; shared by limiters built on the same instance"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.counts: Dict[str, int] = {}
+        self.expiries: Dict[str, float] = {}
+
+    async def exchange(
+        self, increments: Dict[str, int], expiries: Dict[str, float]
+    ) -> Dict[str, int]:
+        now = self.clock()
+        for bucket in [b for b, expires in self.expiries.items() if expires <= now]:
+            del self.expiries[bucket]
+            self.counts.pop(bucket, None)
+        for bucket, count in increments.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+            self.expiries.setdefault(bucket, expiries[bucket])
+        return {bucket: self.counts[bucket] for bucket in expiries if bucket in self.counts}
+
+
+class MongoStorage(RateLimitStorage):
+    """Counts in a MongoDB collection, one document per key and window"""
+
+    def __init__(self, collection_name: str = RATE_LIMIT_COLLECTION):
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return get_database()[self.collection_name]
+
+    async def start(self) -> None:
+        # Buckets delete themselves once their window can no longer matter
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def exchange(
+        self, increments: Dict[str, int], expiries: Dict[str, float]
+    ) -> Dict[str, int]:
+        if increments:
+            await self.collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": bucket},
+                        {
+                            "$inc": {"count": count},
+                            "$setOnInsert": {
+                                "expires_at": datetime.utcfromtimestamp(expiries[bucket])
+                            },
+                        },
+                        upsert=True,
+                    )
+                    for bucket, count in increments.items()
+                ],
+                ordered=False,
+            )
+        cursor = self.collection.find({"_id": {"$in": list(expiries)}}, {"count": True})
+        return {document["_id"]: document["count"] async for document in cursor}
+
+
+# (key, period, window number)
+Bucket = Tuple[str, float, int]
+
+
+def bucket_id(bucket: Bucket) -> str:
+    """Storage ID of a bucket"""
+    key, period, window = bucket
+    return f"{key}|{period:g}|{window}"
+
+
+class RateLimiter:
+    """Sliding window counters, decided locally and synchronized in the background"""
+
+    def __init__(
+        self,
+        storage: Optional[RateLimitStorage] = None,
+        sync_interval: float = RATE_LIMIT_SYNC_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.storage = storage
+        self.sync_interval = sync_interval
+        self.clock = clock
+        # Totals last read from storage, hits not pushed yet, and when each
+        # active bucket stops mattering
+        self._totals: Dict[Bucket, int] = {}
+        self._pending: Dict[Bucket, int] = {}
+        self._expiries: Dict[Bucket, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def hit(self, key: str, rate: Rate, cost: int = 1) -> RateLimitResult:
+        """
+        Count a request of the given cost against key, unless it is over the limit
+
+        Args:
+            key: Client and route the limit applies to
+            rate: Limit to enforce
+            cost: Budget the request consumes
+
+        Returns:
+            Whether the request is allowed, with the budget left
+        """
+        return self.hit_all([(key, rate, cost)])[0]
+
+    def hit_all(self, limits: Sequence[Tuple[str, Rate, int]]) -> List[RateLimitResult]:
+        """
+        Count a request against several limits, only if every one allows it
+
+        A request refused by one limit uses up none of the others.
+
+        Args:
+            limits: (key, rate, cost) of each limit the request is subject to
+
+        Returns:
+            The outcome of each limit, in order
+        """
+        results = [self._check(key, rate, cost) for key, rate, cost in limits]
+        if not all(result.allowed for result in results):
+            _DENIED.inc()
+            return results
+        for key, rate, cost in limits:
+            self._record(key, rate, cost)
+        _ALLOWED.inc()
+        return results
+
+    def _check(self, key: str, rate: Rate, cost: int) -> RateLimitResult:
+        """Outcome of counting a request against key, without counting it"""
+        period = rate.period
+        window, offset = divmod(self.clock(), period)
+        window = int(window)
+        current = (key, period, window)
+        previous = (key, period, window - 1)
+        totals, pending = self._totals, self._pending
+        previous_count = totals.get(previous, 0) + pending.get(previous, 0)
+        current_count = totals.get(current, 0) + pending.get(current, 0)
+        used = previous_count * (1 - offset / period) + current_count
+
+        if used + cost > rate.amount:
+            return RateLimitResult(
+                allowed=False,
+                limit=rate.amount,
+                remaining=max(0, math.floor(rate.amount - used)),
+                retry_after=self._retry_after(
+                    rate, offset, previous_count, current_count, cost
+                ),
+                reset_after=period - offset,
+            )
+
+        return RateLimitResult(
+            allowed=True,
+            limit=rate.amount,
+            remaining=max(0, math.floor(rate.amount - used - cost)),
+            retry_after=0.0,
+            reset_after=period - offset,
+        )
+
+    def _record(self, key: str, rate: Rate, cost: int) -> None:
+        """Count a request of the given cost against key"""
+        period = rate.period
+        window = int(self.clock() // period)
+        current = (key, period, window)
+        self._pending[current] = self._pending.get(current, 0) + cost
+        if current not in self._expiries:
+            self._expiries[current] = (window + 2) * period
+            self._expiries.setdefault((key, period, window - 1), (window + 1) * period)
+
+    @staticmethod
+    def _retry_after(
+        rate: Rate, offset: float, previous: int, current: int, cost: int
+    ) -> float:
+        """Seconds until the weighted count leaves room for cost, with no new hits"""
+        if cost > rate.amount:
+            return rate.period
+        room = rate.amount - current - cost
+        if room >= 0 and previous > 0:
+            # Wait for the previous window's weight to shrink enough
+            return max(0.0, (1 - room / previous) * rate.period - offset)
+        # Wait for the current window to become the previous one
+        wait = rate.period - offset
+        if current > 0:
+            wait += max(0.0, 1 - (rate.amount - cost) / current) * rate.period
+        return wait
+
+    async def sync(self) -> None:
+        """Drop expired buckets, push local hits to storage and pull active totals"""
+        now = self.clock()
+        for bucket in [b for b, expires in self._expiries.items() if expires <= now]:
+            del self._expiries[bucket]
+            self._totals.pop(bucket, None)
+            self._pending.pop(bucket, None)
+        if self.storage is None or not self._expiries:
+            return
+
+        pushed = {bucket: count for bucket, count in self._pending.items() if count}
+        started = time.perf_counter()
+        totals = await self.storage.exchange(
+            {bucket_id(bucket): count for bucket, count in pushed.items()},
+            {bucket_id(bucket): expires for bucket, expires in self._expiries.items()},
+        )
+        RATE_LIMIT_SYNC_TIME.observe(time.perf_counter() - started)
+
+        # Hits made while the exchange was in flight stay pending
+        for bucket, count in pushed.items():
+            remaining = self._pending.get(bucket, 0) - count
+            if remaining > 0:
+                self._pending[bucket] = remaining
+            else:
+                self._pending.pop(bucket, None)
+        for bucket in self._expiries:
+            self._totals[bucket] = totals.get(bucket_id(bucket), 0)
+
+    async def start(self) -> None:
+        """
+        Prepare storage and start the background synchronization
+
+        Without storage the loop still runs, to release the buckets of idle
+        keys.
+        """
+        if self._task is not None:
+            return
+        if self.storage is not None:
+            await self.storage.start()
+        self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        """Stop synchronizing, pushing the last pending hits first"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.error("Failed to push rate limit counts on shutdown: %s", e)
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                # Limits keep being enforced per replica until storage is back
+                RATE_LIMIT_SYNC_FAILURES.inc()
+                logger.error("Failed to synchronize rate limit counts: %s", e)
+
+
+def create_storage(backend: str = RATE_LIMIT_STORAGE) -> Optional[RateLimitStorage]:
+    """
+    Build the storage selected by RATE_LIMIT_STORAGE
+
+    "mongo" shares counts across replicas, "memory" keeps them in this
+    process and "local" skips synchronization altogether.
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if backend == "mongo":
+        return MongoStorage()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "local":
+        return None
+    raise ValueError(f"Unknown rate limit storage: {backend}")
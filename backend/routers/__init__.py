@@ -3,6 +3,6 @@ Routers package for ScottLMS
 Contains all API route handlers
 """
 
-from . import users, courses, enrollments
+from . import users, courses, enrollments, stats, admin, jobs
 
-__all__ = ["users", "courses", "enrollments"]
+__all__ = ["users", "courses", "enrollments", "stats", "admin", "jobs"]
@@ -0,0 +1,46 @@
+"""
+Administrative API routes
+"""
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+
+from database import get_database, index_report
+from logs import get_logger
+from limiter import limiter, RateLimit
+from slowqueries import worst_queries
+from timing import TimedRoute
+
+logger = get_logger(__name__)
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/indexes")
+@limiter.limit(RateLimit.GET.value)
+async def get_index_report(request: Request):
+    """List declared indexes that are missing and existing indexes that are unused"""
+    try:
+        return await index_report()
+    except Exception as e:
+        logger.error("Error building index report: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to build index report",
+        )
+
+
+@router.get("/slow-queries")
+@limiter.limit(RateLimit.GET.value)
+async def get_slow_queries(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    hours: float = Query(24, gt=0, le=24 * 30),
+):
+    """List the slow query shapes that took the most total time"""
+    try:
+        return await worst_queries(get_database(), limit=limit, hours=hours)
+    except Exception as e:
+        logger.error("Error building slow query report: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to build slow query report",
+        )
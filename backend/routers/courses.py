@@ -2,17 +2,64 @@
 Course API routes
 """
 
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Request
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from beanie import PydanticObjectId
 
-from entities.courses import Course, CourseCreate, CourseUpdate, CourseResponse
+from entities.courses import (
+    Course,
+    CourseCreate,
+    CourseUpdate,
+    CourseResponse,
+    CourseStatus,
+)
+from cache import document_cache
+from cascades import delete_course_enrollments
+from conditional import conditional_response
+from entities.jobs import JobResponse
 from entities.users import User
+from entities.lookups import LookupRequest, LookupResponse
+from jobs import create_job, run_job
 from logs import get_logger
-from limiter import limiter, RateLimit
+from limiter import limiter, rows_cost, RateLimit
+from pagination import PageParams, page_params, paginate, set_pagination_headers
+from serializers import course_serializer
+from streaming import stream_page
+from lookups import (
+    fetch_by_ids,
+    fetch_document,
+    lookup_list_response,
+    lookup_response,
+    parse_ids,
+    unique_ids,
+)
+from queries import combine_filters, parse_sort, range_filter, search_filter
+from timing import TimedRoute
 
 logger = get_logger(__name__)
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Fields clients may pass to ?sort= and match with ?search=
+SORT_FIELDS = ("title", "price", "status", "created_at", "enrollment_count")
+SEARCH_FIELDS = ("title", "description")
+
+
+def course_filters(
+    course_status: Optional[CourseStatus] = None,
+    instructor_id: Optional[PydanticObjectId] = None,
+    tags: Optional[List[str]] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    search: Optional[str] = None,
+) -> dict:
+    """Translate course list query parameters into a MongoDB filter"""
+    return combine_filters(
+        {"status": course_status.value} if course_status else {},
+        {"instructor_id": instructor_id} if instructor_id else {},
+        {"tags": {"$all": tags}} if tags else {},
+        range_filter("price", price_min, price_max),
+        search_filter(search, SEARCH_FIELDS),
+    )
 
 
 @router.post("/", response_model=CourseResponse, status_code=status.HTTP_201_CREATED)
@@ -29,43 +76,87 @@ async def create_course(request: Request, course_data: CourseCreate):
 
         course = Course(**course_data.model_dump())
         await course.save()
+        document_cache.invalidate(Course)
 
-        logger.info(f"Created course: {course.title}")
-        # Convert _id to id for response
-        course_dict = course.model_dump()
-        if "_id" in course_dict:
-            course_dict["id"] = course_dict.pop("_id")
-        return CourseResponse(**course_dict)
+        logger.info("Created course: %s", course.title)
+        return course_serializer.response(course, status.HTTP_201_CREATED)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creating course: {str(e)}")
+        logger.error("Error creating course: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create course",
         )
 
 
+@router.post("/lookup", response_model=LookupResponse[CourseResponse])
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def lookup_courses(request: Request, lookup_data: LookupRequest):
+    """Fetch courses by ID in one query, reporting IDs that do not exist"""
+    try:
+        lookup = await fetch_by_ids(
+            Course, unique_ids(lookup_data.ids), course_serializer.projection
+        )
+        return lookup_response(course_serializer, lookup)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error looking up courses: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to look up courses",
+        )
+
+
 @router.get("/", response_model=List[CourseResponse])
-@limiter.limit(RateLimit.GET.value)
-async def get_courses(request: Request):
-    """Get all courses"""
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def get_courses(
+    request: Request,
+    params: PageParams = Depends(page_params),
+    ids: Optional[str] = Query(
+        None, description="Comma-separated IDs to fetch instead of a page"
+    ),
+    course_status: Optional[CourseStatus] = Query(None, alias="status"),
+    instructor_id: Optional[PydanticObjectId] = None,
+    tags: Optional[List[str]] = Query(None, description="Courses carrying all tags"),
+    price_min: Optional[float] = Query(None, ge=0),
+    price_max: Optional[float] = Query(None, ge=0),
+    search: Optional[str] = Query(None, max_length=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix - for descending"),
+):
+    """Get a page of courses"""
     try:
-        courses = await Course.find_all().to_list()
-        result = []
-        for course in courses:
-            course_dict = course.model_dump()
-            # Handle both _id and id cases
-            if "_id" in course_dict:
-                course_dict["id"] = course_dict.pop("_id")
-            elif "id" not in course_dict:
-                # If neither _id nor id exists, use the course.id property
-                course_dict["id"] = course.id
-            result.append(CourseResponse(**course_dict))
-        return result
+        if ids:
+            lookup = await fetch_by_ids(Course, parse_ids(ids), course_serializer.projection)
+            return conditional_response(
+                request, lookup_list_response(course_serializer, lookup)
+            )
+        sort_field, descending = parse_sort(sort, SORT_FIELDS)
+        filters = course_filters(
+            course_status, instructor_id, tags, price_min, price_max, search
+        )
+        if params.stream:
+            return await stream_page(
+                Course, course_serializer, filters, params, sort_field, descending
+            )
+        page = await paginate(
+            Course,
+            filters,
+            limit=params.limit,
+            after=params.after,
+            sort_field=sort_field,
+            descending=descending,
+            projection=course_serializer.projection,
+        )
+        response = course_serializer.response(page.items)
+        set_pagination_headers(response, page)
+        return conditional_response(request, response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching courses: {str(e)}")
+        logger.error("Error fetching courses: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch courses",
@@ -77,20 +168,16 @@ async def get_courses(request: Request):
 async def get_course(request: Request, course_id: PydanticObjectId):
     """Get a specific course by ID"""
     try:
-        course = await Course.get(course_id)
+        course = await fetch_document(Course, course_id, course_serializer.projection)
         if not course:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Course not found"
             )
-        # Convert _id to id for response
-        course_dict = course.model_dump()
-        if "_id" in course_dict:
-            course_dict["id"] = course_dict.pop("_id")
-        return CourseResponse(**course_dict)
+        return conditional_response(request, course_serializer.response(course))
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching course {course_id}: {str(e)}")
+        logger.error("Error fetching course %s: %s", course_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch course",
@@ -108,33 +195,40 @@ async def update_course(request: Request, course_id: PydanticObjectId, course_da
                 status_code=status.HTTP_404_NOT_FOUND, detail="Course not found"
             )
 
-        # Update fields
+        # $set only the changed fields so concurrent enrollment_count
+        # increments are not overwritten by a full-document save
         update_data = course_data.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(course, field, value)
-
-        await course.save()
-        logger.info(f"Updated course: {course.title}")
-        # Convert _id to id for response
-        course_dict = course.model_dump()
-        if "_id" in course_dict:
-            course_dict["id"] = course_dict.pop("_id")
-        return CourseResponse(**course_dict)
+        if update_data:
+            await course.set(update_data)
+        document_cache.invalidate(Course, course_id)
+        logger.info("Updated course: %s", course.title)
+        return course_serializer.response(course)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating course {course_id}: {str(e)}")
+        logger.error("Error updating course %s: %s", course_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update course",
         )
 
 
-@router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{course_id}", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED
+)
 @limiter.limit(RateLimit.DELETE.value)
-async def delete_course(request: Request, course_id: PydanticObjectId):
-    """Delete a course"""
+async def delete_course(
+    request: Request, response: Response, course_id: PydanticObjectId
+):
+    """
+    Delete a course and queue removal of its enrollments
+
+    The course is gone once this returns; its enrollments are deleted by a
+    background job whose progress is at the URL in the Location header. The
+    job is recorded before the course is deleted, so a restart part way
+    through is resumed rather than leaving orphaned enrollments.
+    """
     try:
         course = await Course.get(course_id)
         if not course:
@@ -142,13 +236,19 @@ async def delete_course(request: Request, course_id: PydanticObjectId):
                 status_code=status.HTTP_404_NOT_FOUND, detail="Course not found"
             )
 
+        job = await create_job("course_delete", params={"course_id": course_id})
         await course.delete()
-        logger.info(f"Deleted course: {course.title}")
+        document_cache.invalidate(Course, course_id)
+        logger.info("Deleted course: %s", course.title)
+
+        run_job(job, delete_course_enrollments)
+        response.headers["Location"] = f"/api/jobs/{job.id}"
+        return job.to_response()
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting course {course_id}: {str(e)}")
+        logger.error("Error deleting course %s: %s", course_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete course",
@@ -156,21 +256,38 @@ async def delete_course(request: Request, course_id: PydanticObjectId):
 
 
 @router.get("/instructor/{instructor_id}", response_model=List[CourseResponse])
-@limiter.limit(RateLimit.GET.value)
-async def get_courses_by_instructor(request: Request, instructor_id: PydanticObjectId):
-    """Get all courses by a specific instructor"""
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def get_courses_by_instructor(
+    request: Request,
+    instructor_id: PydanticObjectId,
+    params: PageParams = Depends(page_params),
+    course_status: Optional[CourseStatus] = Query(None, alias="status"),
+    sort: Optional[str] = Query(None, description="Sort field, prefix - for descending"),
+):
+    """Get a page of courses by a specific instructor"""
     try:
-        courses = await Course.find(Course.instructor_id == instructor_id).to_list()
-        result = []
-        for course in courses:
-            # Convert _id to id for response
-            course_dict = course.model_dump()
-            if "_id" in course_dict:
-                course_dict["id"] = course_dict.pop("_id")
-            result.append(CourseResponse(**course_dict))
-        return result
+        sort_field, descending = parse_sort(sort, SORT_FIELDS)
+        filters = course_filters(course_status, instructor_id)
+        if params.stream:
+            return await stream_page(
+                Course, course_serializer, filters, params, sort_field, descending
+            )
+        page = await paginate(
+            Course,
+            filters,
+            limit=params.limit,
+            after=params.after,
+            sort_field=sort_field,
+            descending=descending,
+            projection=course_serializer.projection,
+        )
+        response = course_serializer.response(page.items)
+        set_pagination_headers(response, page)
+        return conditional_response(request, response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching courses for instructor {instructor_id}: {str(e)}")
+        logger.error("Error fetching courses for instructor %s: %s", instructor_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch instructor courses",
@@ -2,23 +2,113 @@
 Enrollment API routes
 """
 
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Request
+import asyncio
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from beanie import PydanticObjectId
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from entities.enrollments import (
     Enrollment,
     EnrollmentCreate,
     EnrollmentUpdate,
     EnrollmentResponse,
+    EnrollmentStatus,
+    EnrichedEnrollmentResponse,
+    BulkEnrollmentResult,
+    BulkEnrollmentResponse,
 )
+from cache import document_cache
+from conditional import conditional_response
 from entities.users import User
 from entities.courses import Course
+from entities.lookups import LookupRequest, LookupResponse
 from logs import get_logger
-from limiter import limiter, RateLimit
+from limiter import limiter, rows_cost, RateLimit
+from pagination import PageParams, page_params, paginate, set_pagination_headers
+from serializers import enriched_enrollment_serializer, enrollment_serializer
+from streaming import stream_page
+from lookups import (
+    existing_ids,
+    fetch_by_ids,
+    fetch_document,
+    lookup_list_response,
+    lookup_response,
+    parse_ids,
+    unique_ids,
+)
+from queries import combine_filters, parse_sort, range_filter
+from uploads import read_items, validation_detail
+from timing import TimedRoute
 
 logger = get_logger(__name__)
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Fields clients may pass to ?sort=
+SORT_FIELDS = ("status", "progress", "enrolled_at")
+
+# Joins the student and course onto each enrollment of a page. Both $lookup
+# stages match on the joined collection's _id index, one probe per enrollment
+ENRICHMENT_STAGES: List[Dict[str, Any]] = [
+    {
+        "$lookup": {
+            "from": User.Settings.name,
+            "localField": "user_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 0, "first_name": 1, "last_name": 1, "email": 1}}],
+            "as": "user",
+        }
+    },
+    {
+        "$lookup": {
+            "from": Course.Settings.name,
+            "localField": "course_id",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 0, "title": 1, "status": 1}}],
+            "as": "course",
+        }
+    },
+    {
+        "$project": {
+            **enrollment_serializer.projection,
+            "user": {"$first": "$user"},
+            "course": {"$first": "$course"},
+        }
+    },
+]
+
+# Items accepted by one bulk enrollment request
+MAX_BULK_ENROLLMENTS = int(os.getenv("MAX_BULK_ENROLLMENTS", "10000"))
+
+
+def enrollment_filters(
+    enrollment_status: Optional[EnrollmentStatus] = None,
+    user_id: Optional[PydanticObjectId] = None,
+    course_id: Optional[PydanticObjectId] = None,
+    progress_min: Optional[float] = None,
+    progress_max: Optional[float] = None,
+) -> dict:
+    """Translate enrollment list query parameters into a MongoDB filter"""
+    return combine_filters(
+        {"user_id": user_id} if user_id else {},
+        {"course_id": course_id} if course_id else {},
+        {"status": enrollment_status.value} if enrollment_status else {},
+        range_filter("progress", progress_min, progress_max),
+    )
+
+
+async def release_enrollment_count(course_id: PydanticObjectId) -> None:
+    """Atomically decrement a course's enrollment count, never below zero"""
+    await Course.get_motor_collection().update_one(
+        {"_id": course_id, "enrollment_count": {"$gt": 0}},
+        {"$inc": {"enrollment_count": -1}},
+    )
+    document_cache.invalidate(Course, course_id)
 
 
 @router.post(
@@ -28,100 +118,312 @@ router = APIRouter()
 async def create_enrollment(request: Request, enrollment_data: EnrollmentCreate):
     """Create a new enrollment"""
     try:
-        # Verify user and course exist
-        user = await User.get(enrollment_data.user_id)
-        if not user:
+        # Check the user exists while bumping the course's enrollment count;
+        # a matched update doubles as the course existence check
+        user_count, course_update = await asyncio.gather(
+            User.get_motor_collection().count_documents(
+                {"_id": enrollment_data.user_id}, limit=1
+            ),
+            Course.get_motor_collection().update_one(
+                {"_id": enrollment_data.course_id}, {"$inc": {"enrollment_count": 1}}
+            ),
+        )
+        if not user_count:
+            if course_update.matched_count:
+                await release_enrollment_count(enrollment_data.course_id)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="User not found"
             )
-
-        course = await Course.get(enrollment_data.course_id)
-        if not course:
+        if not course_update.matched_count:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Course not found"
             )
 
-        # Check if already enrolled
-        existing_enrollment = await Enrollment.find_one(
-            Enrollment.user_id == enrollment_data.user_id,
-            Enrollment.course_id == enrollment_data.course_id,
-        )
-        if existing_enrollment:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User is already enrolled in this course",
-            )
-
+        # The unique (user_id, course_id) index rejects repeat enrollments
         enrollment = Enrollment(**enrollment_data.model_dump())
-        await enrollment.save()
-
-        # Update course enrollment count
-        course.enrollment_count += 1
-        await course.save()
+        try:
+            await enrollment.insert()
+        except Exception:
+            await release_enrollment_count(enrollment_data.course_id)
+            raise
+        document_cache.invalidate(Enrollment)
+        document_cache.invalidate(Course, enrollment_data.course_id)
 
         logger.info(
-            f"Created enrollment: User {enrollment.user_id} in Course {enrollment.course_id}"
+            "Created enrollment: User %s in Course %s",
+            enrollment.user_id, enrollment.course_id
         )
-        # Convert _id to id for response
-        enrollment_dict = enrollment.model_dump()
-        if "_id" in enrollment_dict:
-            enrollment_dict["id"] = enrollment_dict.pop("_id")
-        return EnrollmentResponse(**enrollment_dict)
+        return enrollment_serializer.response(enrollment, status.HTTP_201_CREATED)
 
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already enrolled in this course",
+        )
     except Exception as e:
-        logger.error(f"Error creating enrollment: {str(e)}")
+        logger.error("Error creating enrollment: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create enrollment",
         )
 
 
+@router.post("/bulk", response_model=BulkEnrollmentResponse)
+@limiter.limit(RateLimit.BULK.value)
+async def create_enrollments_bulk(request: Request):
+    """
+    Create many enrollments from a JSON array or NDJSON request body
+
+    Items are validated as the body streams in. Users and courses are checked
+    with one $in query each, enrollments are written with a single unordered
+    insert_many and each course's enrollment_count gets one aggregated $inc.
+    Failed items are reported per index without stopping the rest.
+    """
+    try:
+        results: Dict[int, BulkEnrollmentResult] = {}
+        pending: Dict[int, EnrollmentCreate] = {}
+        seen = set()
+        count = 0
+        async for item in read_items(request, MAX_BULK_ENROLLMENTS):
+            index, count = count, count + 1
+            try:
+                enrollment_data = EnrollmentCreate.model_validate(item)
+            except ValidationError as e:
+                results[index] = BulkEnrollmentResult(
+                    index=index, created=False, detail=validation_detail(e)
+                )
+                continue
+            pair = (enrollment_data.user_id, enrollment_data.course_id)
+            if pair in seen:
+                results[index] = BulkEnrollmentResult(
+                    index=index, created=False, detail="Duplicate of an earlier item"
+                )
+                continue
+            seen.add(pair)
+            pending[index] = enrollment_data
+
+        found_users, found_courses = await asyncio.gather(
+            existing_ids(User, {data.user_id for data in pending.values()}),
+            existing_ids(Course, {data.course_id for data in pending.values()}),
+        )
+
+        enrollments: Dict[int, Enrollment] = {}
+        for index, enrollment_data in pending.items():
+            if enrollment_data.user_id not in found_users:
+                detail = "User not found"
+            elif enrollment_data.course_id not in found_courses:
+                detail = "Course not found"
+            else:
+                enrollments[index] = Enrollment(
+                    id=PydanticObjectId(), **enrollment_data.model_dump()
+                )
+                continue
+            results[index] = BulkEnrollmentResult(index=index, created=False, detail=detail)
+
+        # Unordered, so one duplicate does not stop the remaining inserts
+        write_errors = {}
+        if enrollments:
+            try:
+                await Enrollment.insert_many(list(enrollments.values()), ordered=False)
+            except BulkWriteError as e:
+                write_errors = {error["index"]: error for error in e.details["writeErrors"]}
+            document_cache.invalidate(Enrollment)
+
+        per_course = Counter()
+        for position, (index, enrollment) in enumerate(enrollments.items()):
+            error = write_errors.get(position)
+            if error is None:
+                per_course[enrollment.course_id] += 1
+                results[index] = BulkEnrollmentResult(
+                    index=index, created=True, id=enrollment.id
+                )
+            else:
+                detail = (
+                    "User is already enrolled in this course"
+                    if error.get("code") == 11000
+                    else "Failed to create enrollment"
+                )
+                results[index] = BulkEnrollmentResult(
+                    index=index, created=False, detail=detail
+                )
+
+        if per_course:
+            try:
+                await Course.get_motor_collection().bulk_write(
+                    [
+                        UpdateOne({"_id": course_id}, {"$inc": {"enrollment_count": n}})
+                        for course_id, n in per_course.items()
+                    ],
+                    ordered=False,
+                )
+                document_cache.invalidate(Course, *per_course)
+            except Exception as e:
+                # The enrollments exist; report them rather than failing the request
+                logger.error("Error updating enrollment counts after bulk insert: %s", e)
+
+        created = sum(per_course.values())
+        logger.info("Bulk enrollment: %s created, %s failed", created, count - created)
+        return BulkEnrollmentResponse(
+            created=created,
+            failed=count - created,
+            results=[results[index] for index in range(count)],
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error creating enrollments in bulk: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create enrollments",
+        )
+
+
+@router.post("/lookup", response_model=LookupResponse[EnrollmentResponse])
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def lookup_enrollments(request: Request, lookup_data: LookupRequest):
+    """Fetch enrollments by ID in one query, reporting IDs that do not exist"""
+    try:
+        lookup = await fetch_by_ids(
+            Enrollment, unique_ids(lookup_data.ids), enrollment_serializer.projection
+        )
+        return lookup_response(enrollment_serializer, lookup)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error looking up enrollments: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to look up enrollments",
+        )
+
+
 @router.get("/", response_model=List[EnrollmentResponse])
-@limiter.limit(RateLimit.GET.value)
-async def get_enrollments(request: Request):
-    """Get all enrollments"""
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def get_enrollments(
+    request: Request,
+    params: PageParams = Depends(page_params),
+    ids: Optional[str] = Query(
+        None, description="Comma-separated IDs to fetch instead of a page"
+    ),
+    enrollment_status: Optional[EnrollmentStatus] = Query(None, alias="status"),
+    user_id: Optional[PydanticObjectId] = None,
+    course_id: Optional[PydanticObjectId] = None,
+    progress_min: Optional[float] = Query(None, ge=0, le=100),
+    progress_max: Optional[float] = Query(None, ge=0, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix - for descending"),
+):
+    """Get a page of enrollments"""
     try:
-        enrollments = await Enrollment.find_all().to_list()
-        result = []
-        for enrollment in enrollments:
-            enrollment_dict = enrollment.model_dump()
-            # Handle both _id and id cases
-            if "_id" in enrollment_dict:
-                enrollment_dict["id"] = enrollment_dict.pop("_id")
-            elif "id" not in enrollment_dict:
-                # If neither _id nor id exists, use the enrollment.id property
-                enrollment_dict["id"] = enrollment.id
-            result.append(EnrollmentResponse(**enrollment_dict))
-        return result
+        if ids:
+            lookup = await fetch_by_ids(Enrollment, parse_ids(ids), enrollment_serializer.projection)
+            return conditional_response(
+                request, lookup_list_response(enrollment_serializer, lookup)
+            )
+        sort_field, descending = parse_sort(sort, SORT_FIELDS)
+        filters = enrollment_filters(
+            enrollment_status, user_id, course_id, progress_min, progress_max
+        )
+        if params.stream:
+            return await stream_page(
+                Enrollment, enrollment_serializer, filters, params, sort_field, descending
+            )
+        page = await paginate(
+            Enrollment,
+            filters,
+            limit=params.limit,
+            after=params.after,
+            sort_field=sort_field,
+            descending=descending,
+            projection=enrollment_serializer.projection,
+        )
+        response = enrollment_serializer.response(page.items)
+        set_pagination_headers(response, page)
+        return conditional_response(request, response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching enrollments: {str(e)}")
+        logger.error("Error fetching enrollments: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch enrollments",
         )
 
 
+@router.get("/enriched", response_model=List[EnrichedEnrollmentResponse])
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def get_enriched_enrollments(
+    request: Request,
+    params: PageParams = Depends(page_params),
+    enrollment_status: Optional[EnrollmentStatus] = Query(None, alias="status"),
+    user_id: Optional[PydanticObjectId] = None,
+    course_id: Optional[PydanticObjectId] = None,
+    progress_min: Optional[float] = Query(None, ge=0, le=100),
+    progress_max: Optional[float] = Query(None, ge=0, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix - for descending"),
+):
+    """
+    Get a page of enrollments with student name/email and course title/status
+
+    Filters, sorting and paging match GET /api/enrollments/ and run before
+    the joins, so only the enrollments on the page are looked up.
+    """
+    try:
+        sort_field, descending = parse_sort(sort, SORT_FIELDS)
+        filters = enrollment_filters(
+            enrollment_status, user_id, course_id, progress_min, progress_max
+        )
+        if params.stream:
+            return await stream_page(
+                Enrollment,
+                enriched_enrollment_serializer,
+                filters,
+                params,
+                sort_field,
+                descending,
+                stages=ENRICHMENT_STAGES,
+            )
+        page = await paginate(
+            Enrollment,
+            filters,
+            limit=params.limit,
+            after=params.after,
+            sort_field=sort_field,
+            descending=descending,
+            stages=ENRICHMENT_STAGES,
+        )
+        response = enriched_enrollment_serializer.response(page.items)
+        set_pagination_headers(response, page)
+        return conditional_response(request, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching enriched enrollments: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch enriched enrollments",
+        )
+
+
 @router.get("/{enrollment_id}", response_model=EnrollmentResponse)
 @limiter.limit(RateLimit.GET.value)
 async def get_enrollment(request: Request, enrollment_id: PydanticObjectId):
     """Get a specific enrollment by ID"""
     try:
-        enrollment = await Enrollment.get(enrollment_id)
+        enrollment = await fetch_document(
+            Enrollment, enrollment_id, enrollment_serializer.projection
+        )
         if not enrollment:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Enrollment not found"
             )
-        # Convert _id to id for response
-        enrollment_dict = enrollment.model_dump()
-        if "_id" in enrollment_dict:
-            enrollment_dict["id"] = enrollment_dict.pop("_id")
-        return EnrollmentResponse(**enrollment_dict)
+        return conditional_response(request, enrollment_serializer.response(enrollment))
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching enrollment {enrollment_id}: {str(e)}")
+        logger.error("Error fetching enrollment %s: %s", enrollment_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch enrollment",
@@ -148,18 +450,15 @@ async def update_enrollment(
             setattr(enrollment, field, value)
 
         await enrollment.save()
+        document_cache.invalidate(Enrollment, enrollment_id)
 
-        logger.info(f"Updated enrollment: {enrollment_id}")
-        # Convert _id to id for response
-        enrollment_dict = enrollment.model_dump()
-        if "_id" in enrollment_dict:
-            enrollment_dict["id"] = enrollment_dict.pop("_id")
-        return EnrollmentResponse(**enrollment_dict)
+        logger.info("Updated enrollment: %s", enrollment_id)
+        return enrollment_serializer.response(enrollment)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating enrollment {enrollment_id}: {str(e)}")
+        logger.error("Error updating enrollment %s: %s", enrollment_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update enrollment",
@@ -171,25 +470,24 @@ async def update_enrollment(
 async def delete_enrollment(request: Request, enrollment_id: PydanticObjectId):
     """Delete an enrollment"""
     try:
-        enrollment = await Enrollment.get(enrollment_id)
+        enrollment = await Enrollment.get_motor_collection().find_one_and_delete(
+            {"_id": enrollment_id}, projection={"course_id": True}
+        )
         if not enrollment:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Enrollment not found"
             )
 
-        # Update course enrollment count
-        course = await Course.get(enrollment.course_id)
-        if course:
-            course.enrollment_count = max(0, course.enrollment_count - 1)
-            await course.save()
+        document_cache.invalidate(Enrollment, enrollment_id)
 
-        await enrollment.delete()
-        logger.info(f"Deleted enrollment: {enrollment_id}")
+        # Update course enrollment count
+        await release_enrollment_count(enrollment["course_id"])
+        logger.info("Deleted enrollment: %s", enrollment_id)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting enrollment {enrollment_id}: {str(e)}")
+        logger.error("Error deleting enrollment %s: %s", enrollment_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete enrollment",
@@ -197,21 +495,38 @@ async def delete_enrollment(request: Request, enrollment_id: PydanticObjectId):
 
 
 @router.get("/user/{user_id}", response_model=List[EnrollmentResponse])
-@limiter.limit(RateLimit.GET.value)
-async def get_user_enrollments(request: Request, user_id: PydanticObjectId):
-    """Get all enrollments for a specific user"""
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def get_user_enrollments(
+    request: Request,
+    user_id: PydanticObjectId,
+    params: PageParams = Depends(page_params),
+    enrollment_status: Optional[EnrollmentStatus] = Query(None, alias="status"),
+    sort: Optional[str] = Query(None, description="Sort field, prefix - for descending"),
+):
+    """Get a page of enrollments for a specific user"""
     try:
-        enrollments = await Enrollment.find(Enrollment.user_id == user_id).to_list()
-        result = []
-        for enrollment in enrollments:
-            # Convert _id to id for response
-            enrollment_dict = enrollment.model_dump()
-            if "_id" in enrollment_dict:
-                enrollment_dict["id"] = enrollment_dict.pop("_id")
-            result.append(EnrollmentResponse(**enrollment_dict))
-        return result
+        sort_field, descending = parse_sort(sort, SORT_FIELDS)
+        filters = enrollment_filters(enrollment_status, user_id=user_id)
+        if params.stream:
+            return await stream_page(
+                Enrollment, enrollment_serializer, filters, params, sort_field, descending
+            )
+        page = await paginate(
+            Enrollment,
+            filters,
+            limit=params.limit,
+            after=params.after,
+            sort_field=sort_field,
+            descending=descending,
+            projection=enrollment_serializer.projection,
+        )
+        response = enrollment_serializer.response(page.items)
+        set_pagination_headers(response, page)
+        return conditional_response(request, response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching enrollments for user {user_id}: {str(e)}")
+        logger.error("Error fetching enrollments for user %s: %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch user enrollments",
@@ -219,21 +534,38 @@ async def get_user_enrollments(request: Request, user_id: PydanticObjectId):
 
 
 @router.get("/course/{course_id}", response_model=List[EnrollmentResponse])
-@limiter.limit(RateLimit.GET.value)
-async def get_course_enrollments(request: Request, course_id: PydanticObjectId):
-    """Get all enrollments for a specific course"""
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def get_course_enrollments(
+    request: Request,
+    course_id: PydanticObjectId,
+    params: PageParams = Depends(page_params),
+    enrollment_status: Optional[EnrollmentStatus] = Query(None, alias="status"),
+    sort: Optional[str] = Query(None, description="Sort field, prefix - for descending"),
+):
+    """Get a page of enrollments for a specific course"""
     try:
-        enrollments = await Enrollment.find(Enrollment.course_id == course_id).to_list()
-        result = []
-        for enrollment in enrollments:
-            # Convert _id to id for response
-            enrollment_dict = enrollment.model_dump()
-            if "_id" in enrollment_dict:
-                enrollment_dict["id"] = enrollment_dict.pop("_id")
-            result.append(EnrollmentResponse(**enrollment_dict))
-        return result
+        sort_field, descending = parse_sort(sort, SORT_FIELDS)
+        filters = enrollment_filters(enrollment_status, course_id=course_id)
+        if params.stream:
+            return await stream_page(
+                Enrollment, enrollment_serializer, filters, params, sort_field, descending
+            )
+        page = await paginate(
+            Enrollment,
+            filters,
+            limit=params.limit,
+            after=params.after,
+            sort_field=sort_field,
+            descending=descending,
+            projection=enrollment_serializer.projection,
+        )
+        response = enrollment_serializer.response(page.items)
+        set_pagination_headers(response, page)
+        return conditional_response(request, response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching enrollments for course {course_id}: {str(e)}")
+        logger.error("Error fetching enrollments for course %s: %s", course_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch course enrollments",
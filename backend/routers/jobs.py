@@ -0,0 +1,35 @@
+"""
+Background job API routes
+"""
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from entities.jobs import JobResponse
+from jobs import get_job
+from logs import get_logger
+from limiter import limiter, RateLimit
+from timing import TimedRoute
+
+logger = get_logger(__name__)
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+@limiter.limit(RateLimit.GET.value)
+async def get_job_status(request: Request, job_id: str):
+    """Get the progress of a background job started by any replica"""
+    try:
+        job = await get_job(job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+            )
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching job %s: %s", job_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch job",
+        )
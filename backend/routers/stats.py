@@ -0,0 +1,97 @@
+"""
+Aggregate statistics API routes
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Optional, Type
+
+from beanie import Document
+from fastapi import APIRouter, HTTPException, Request, status
+
+from entities.courses import Course, CourseStatus
+from entities.enrollments import Enrollment, EnrollmentStatus
+from entities.stats import GroupCounts, StatsResponse
+from entities.users import User, UserRole
+from logs import get_logger
+from limiter import limiter, RateLimit
+from timing import TimedRoute
+
+logger = get_logger(__name__)
+router = APIRouter(route_class=TimedRoute)
+
+# How long computed stats are served before being recomputed
+STATS_CACHE_SECONDS = float(os.getenv("STATS_CACHE_SECONDS", "5"))
+
+_cached_stats: Optional[StatsResponse] = None
+_cached_at = 0.0
+_refresh_lock = asyncio.Lock()
+
+
+async def count_by(
+    document_model: Type[Document], field: str, values: Type[Enum]
+) -> GroupCounts:
+    """
+    Count a collection's documents per value of an enum field
+
+    Each value is an equality count on an indexed field, so MongoDB answers
+    from the index without fetching documents; all counts run concurrently.
+    """
+    collection = document_model.get_motor_collection()
+    counts = await asyncio.gather(
+        collection.estimated_document_count(),
+        *(collection.count_documents({field: value.value}) for value in values),
+    )
+    total, per_value = counts[0], counts[1:]
+    return GroupCounts(
+        total=total,
+        breakdown={value.value: count for value, count in zip(values, per_value)},
+    )
+
+
+async def compute_stats() -> StatsResponse:
+    """Compute totals and breakdowns for users, courses and enrollments"""
+    users, courses, enrollments = await asyncio.gather(
+        count_by(User, "role", UserRole),
+        count_by(Course, "status", CourseStatus),
+        count_by(Enrollment, "status", EnrollmentStatus),
+    )
+    return StatsResponse(
+        users=users,
+        courses=courses,
+        enrollments=enrollments,
+        generated_at=datetime.utcnow(),
+    )
+
+
+async def get_cached_stats() -> StatsResponse:
+    """Return stats no older than STATS_CACHE_SECONDS, recomputing at most once"""
+    global _cached_stats, _cached_at
+
+    if _cached_stats and time.monotonic() - _cached_at < STATS_CACHE_SECONDS:
+        return _cached_stats
+
+    async with _refresh_lock:
+        # Another request may have refreshed while we waited for the lock
+        if _cached_stats and time.monotonic() - _cached_at < STATS_CACHE_SECONDS:
+            return _cached_stats
+        _cached_stats = await compute_stats()
+        _cached_at = time.monotonic()
+        return _cached_stats
+
+
+@router.get("/", response_model=StatsResponse)
+@limiter.limit(RateLimit.GET.value)
+async def get_stats(request: Request):
+    """Get totals and breakdowns by user role, course status and enrollment status"""
+    try:
+        return await get_cached_stats()
+    except Exception as e:
+        logger.error("Error computing stats: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to compute stats",
+        )
@@ -2,36 +2,59 @@
 User API routes
 """
 
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Request
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from beanie import PydanticObjectId
-import bcrypt
+from pymongo.errors import DuplicateKeyError
 
-from entities.users import User, UserCreate, UserUpdate, UserResponse
+from cache import document_cache
+from cascades import delete_user_enrollments
+from conditional import conditional_response
+from database import duplicate_key_fields
+from entities.jobs import JobResponse
+from entities.lookups import LookupRequest, LookupResponse
+from entities.users import User, UserCreate, UserUpdate, UserResponse, UserRole
+from imports import MAX_IMPORT_BYTES, UserImport
+from jobs import create_job, run_job, start_job
 from logs import get_logger
-from limiter import limiter, RateLimit
+from passwords import HASH_RETRY_AFTER_SECONDS, HashingPoolFull, password_hasher
+from limiter import limiter, rows_cost, RateLimit
+from pagination import (
+    NDJSON_MEDIA_TYPE,
+    PageParams,
+    page_params,
+    paginate,
+    set_pagination_headers,
+)
+from serializers import user_serializer
+from streaming import stream_page
+from lookups import (
+    fetch_by_ids,
+    fetch_document,
+    lookup_list_response,
+    lookup_response,
+    parse_ids,
+    unique_ids,
+)
+from queries import combine_filters, parse_sort, search_filter
+from uploads import CSV_MEDIA_TYPE, media_type, spool_body
+from timing import TimedRoute
 
 logger = get_logger(__name__)
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
+# Fields clients may pass to ?sort= and match with ?search=
+SORT_FIELDS = ("first_name", "last_name", "email", "username", "role", "created_at")
+SEARCH_FIELDS = ("first_name", "last_name", "email", "username")
 
-def hash_password(password: str) -> str:
-    """
-    Secure password hashing with bcrypt
-    
-    Uses 12 rounds for strong security while maintaining reasonable performance.
-    This matches the hashing used in the MongoDB initialization script.
-    
-    Args:
-        password: Plain text password to hash
-        
-    Returns:
-        bcrypt hash string that can be safely stored in the database
-    """
-    # Generate salt and hash password with 12 rounds (same as Node.js script)
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+
+def duplicate_user_error(error: DuplicateKeyError) -> HTTPException:
+    """Map a unique index violation on users to a 400 naming the field"""
+    field = "username" if "username" in duplicate_key_fields(error) else "email"
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"User with this {field} already exists",
+    )
 
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -39,53 +62,144 @@ def hash_password(password: str) -> str:
 async def create_user(request: Request, user_data: UserCreate):
     """Create a new user"""
     try:
-        # Check if user already exists
-        existing_user = await User.find_one(User.email == user_data.email)
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User with this email already exists",
-            )
-
-        # Create new user
+        # Create new user; the unique email and username indexes reject duplicates
         user_dict = user_data.model_dump()
         password = user_dict.pop("password")
-        user_dict["hashed_password"] = hash_password(password)
+        user_dict["hashed_password"] = await password_hasher.hash(password)
 
         user = User(**user_dict)
-        await user.save()
+        await user.insert()
+        document_cache.invalidate(User)
 
-        logger.info(f"Created user: {user.email}")
-        # Convert _id to id for response
-        user_dict = user.model_dump()
-        if "_id" in user_dict:
-            user_dict["id"] = user_dict.pop("_id")
-        return UserResponse(**user_dict)
+        logger.info("Created user: %s", user.email)
+        return user_serializer.response(user, status.HTTP_201_CREATED)
 
+    except HTTPException:
+        raise
+    except DuplicateKeyError as e:
+        raise duplicate_user_error(e)
+    except HashingPoolFull:
+        logger.warning("Password hashing queue full, rejecting user creation")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy creating users, please retry shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+        )
     except Exception as e:
-        logger.error(f"Error creating user: {str(e)}")
+        logger.error("Error creating user: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create user",
         )
 
 
+@router.post(
+    "/import", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED
+)
+@limiter.limit(RateLimit.BULK.value)
+async def import_users(request: Request, response: Response):
+    """
+    Import users from a CSV (text/csv) or NDJSON (application/x-ndjson) upload
+
+    CSV uploads need a header row naming the UserCreate fields. The upload is
+    spooled to a temporary file and imported by a background job; poll the
+    job URL in the Location header for progress and per-row errors.
+    """
+    upload_type = media_type(request)
+    if upload_type not in (CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Upload must be {CSV_MEDIA_TYPE} or {NDJSON_MEDIA_TYPE}",
+        )
+    try:
+        upload, lines = await spool_body(request, MAX_IMPORT_BYTES)
+        ndjson = upload_type == NDJSON_MEDIA_TYPE
+
+        def work(job):
+            return UserImport(job).run(upload, ndjson)
+
+        # Less the CSV header row
+        job = await start_job(
+            "user_import", work, total=lines if ndjson else max(0, lines - 1)
+        )
+        response.headers["Location"] = f"/api/jobs/{job.id}"
+        logger.info("Queued user import %s with about %s rows", job.id, job.total)
+        return job.to_response()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error starting user import: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start user import",
+        )
+
+
+@router.post("/lookup", response_model=LookupResponse[UserResponse])
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def lookup_users(request: Request, lookup_data: LookupRequest):
+    """Fetch users by ID in one query, reporting IDs that do not exist"""
+    try:
+        lookup = await fetch_by_ids(
+            User, unique_ids(lookup_data.ids), user_serializer.projection
+        )
+        return lookup_response(user_serializer, lookup)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error looking up users: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to look up users",
+        )
+
+
 @router.get("/", response_model=List[UserResponse])
-@limiter.limit(RateLimit.GET.value)
-async def get_users(request: Request):
-    """Get all users"""
+@limiter.limit(RateLimit.GET.value, cost=rows_cost)
+async def get_users(
+    request: Request,
+    params: PageParams = Depends(page_params),
+    ids: Optional[str] = Query(
+        None, description="Comma-separated IDs to fetch instead of a page"
+    ),
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    search: Optional[str] = Query(None, max_length=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix - for descending"),
+):
+    """Get a page of users"""
     try:
-        users = await User.find_all().to_list()
-        result = []
-        for user in users:
-            # Convert _id to id for response
-            user_dict = user.model_dump()
-            if "_id" in user_dict:
-                user_dict["id"] = user_dict.pop("_id")
-            result.append(UserResponse(**user_dict))
-        return result
+        if ids:
+            lookup = await fetch_by_ids(User, parse_ids(ids), user_serializer.projection)
+            return conditional_response(
+                request, lookup_list_response(user_serializer, lookup)
+            )
+        sort_field, descending = parse_sort(sort, SORT_FIELDS)
+        filters = combine_filters(
+            {"role": role.value} if role else {},
+            {"is_active": is_active} if is_active is not None else {},
+            search_filter(search, SEARCH_FIELDS),
+        )
+        if params.stream:
+            return await stream_page(
+                User, user_serializer, filters, params, sort_field, descending
+            )
+        page = await paginate(
+            User,
+            filters,
+            limit=params.limit,
+            after=params.after,
+            sort_field=sort_field,
+            descending=descending,
+            projection=user_serializer.projection,
+        )
+        response = user_serializer.response(page.items)
+        set_pagination_headers(response, page)
+        return conditional_response(request, response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching users: {str(e)}")
+        logger.error("Error fetching users: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch users",
@@ -97,20 +211,16 @@ async def get_users(request: Request):
 async def get_user(request: Request, user_id: PydanticObjectId):
     """Get a specific user by ID"""
     try:
-        user = await User.get(user_id)
+        user = await fetch_document(User, user_id, user_serializer.projection)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
-        # Convert _id to id for response
-        user_dict = user.model_dump()
-        if "_id" in user_dict:
-            user_dict["id"] = user_dict.pop("_id")
-        return UserResponse(**user_dict)
+        return conditional_response(request, user_serializer.response(user))
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching user {user_id}: {str(e)}")
+        logger.error("Error fetching user %s: %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch user",
@@ -134,27 +244,37 @@ async def update_user(request: Request, user_id: PydanticObjectId, user_data: Us
             setattr(user, field, value)
 
         await user.save()
-        logger.info(f"Updated user: {user.email}")
-        # Convert _id to id for response
-        user_dict = user.model_dump()
-        if "_id" in user_dict:
-            user_dict["id"] = user_dict.pop("_id")
-        return UserResponse(**user_dict)
+        document_cache.invalidate(User, user_id)
+        logger.info("Updated user: %s", user.email)
+        return user_serializer.response(user)
 
     except HTTPException:
         raise
+    except DuplicateKeyError as e:
+        raise duplicate_user_error(e)
     except Exception as e:
-        logger.error(f"Error updating user {user_id}: {str(e)}")
+        logger.error("Error updating user %s: %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update user",
         )
 
 
-@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{user_id}", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED
+)
 @limiter.limit(RateLimit.DELETE.value)
-async def delete_user(request: Request, user_id: PydanticObjectId):
-    """Delete a user"""
+async def delete_user(
+    request: Request, response: Response, user_id: PydanticObjectId
+):
+    """
+    Delete a user and queue removal of its enrollments
+
+    The user is gone once this returns; its enrollments are deleted by a
+    background job whose progress is at the URL in the Location header. The
+    job is recorded before the user is deleted, so a restart part way
+    through is resumed rather than leaving orphaned enrollments.
+    """
     try:
         user = await User.get(user_id)
         if not user:
@@ -162,13 +282,19 @@ async def delete_user(request: Request, user_id: PydanticObjectId):
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
 
+        job = await create_job("user_delete", params={"user_id": user_id})
         await user.delete()
-        logger.info(f"Deleted user: {user.email}")
+        document_cache.invalidate(User, user_id)
+        logger.info("Deleted user: %s", user.email)
+
+        run_job(job, delete_user_enrollments)
+        response.headers["Location"] = f"/api/jobs/{job.id}"
+        return job.to_response()
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting user {user_id}: {str(e)}")
+        logger.error("Error deleting user %s: %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete user",
@@ -0,0 +1,109 @@
+"""
+Fast JSON serialization of stored documents for ScottLMS responses
+
+Documents read from MongoDB have already been validated on the way in, so
+responses are encoded straight to JSON bytes with orjson instead of being
+rebuilt as *Response models and validated again by FastAPI.
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional, Type, Union
+
+import orjson
+from bson import ObjectId
+from fastapi import Response, status
+from pydantic import BaseModel
+
+from entities.courses import CourseResponse
+from entities.enrollments import EnrichedEnrollmentResponse, EnrollmentResponse
+from entities.users import UserResponse
+from timing import timed
+
+Serializable = Union[BaseModel, Mapping[str, Any]]
+
+
+def _default(value: Any) -> Any:
+    """Encode types orjson does not support natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class DocumentSerializer:
+    """Encodes stored documents as the JSON shape of a response model"""
+
+    def __init__(self, response_model: Type[BaseModel]):
+        model_fields = response_model.model_fields
+        self.response_model = response_model
+        self.fields = tuple(name for name in model_fields if name != "id")
+        # Fill fields missing from older documents the way the model would
+        self.defaults = {
+            name: field.get_default(call_default_factory=True)
+            for name, field in model_fields.items()
+            if name != "id" and not field.is_required()
+        }
+        # MongoDB projection fetching only the fields the response exposes
+        self.projection = dict.fromkeys(self.fields, 1)
+
+    def to_dict(self, document: Serializable) -> Dict[str, Any]:
+        """
+        Map a raw MongoDB document or Beanie document to the response shape
+
+        Args:
+            document: Raw document with "_id", or a Beanie document
+
+        Returns:
+            Dict with "id" plus the response model fields
+        """
+        if isinstance(document, BaseModel):
+            document = document.model_dump()
+        payload = {"id": document["_id"] if "_id" in document else document["id"]}
+        for field in self.fields:
+            if field in document:
+                payload[field] = document[field]
+            elif field in self.defaults:
+                payload[field] = self.defaults[field]
+        return payload
+
+    def dumps(self, document: Serializable) -> bytes:
+        """Encode a single document as JSON bytes"""
+        with timed("serialization"):
+            return orjson.dumps(self.to_dict(document), default=_default)
+
+    def dumps_many(self, documents: Iterable[Serializable]) -> bytes:
+        """Encode documents as a JSON array"""
+        with timed("serialization"):
+            return orjson.dumps(
+                [self.to_dict(document) for document in documents], default=_default
+            )
+
+    def dumps_envelope(self, documents: Iterable[Serializable], **fields: Any) -> bytes:
+        """Encode documents under "items" alongside other top-level fields"""
+        with timed("serialization"):
+            return orjson.dumps(
+                {"items": [self.to_dict(document) for document in documents], **fields},
+                default=_default,
+            )
+
+    def response(
+        self,
+        content: Union[Serializable, Iterable[Serializable]],
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """Build a JSON response from one document or a list of documents"""
+        if isinstance(content, (BaseModel, Mapping)):
+            body = self.dumps(content)
+        else:
+            body = self.dumps_many(content)
+        return Response(
+            content=body,
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json",
+        )
+
+
+user_serializer = DocumentSerializer(UserResponse)
+course_serializer = DocumentSerializer(CourseResponse)
+enrollment_serializer = DocumentSerializer(EnrollmentResponse)
+enriched_enrollment_serializer = DocumentSerializer(EnrichedEnrollmentResponse)
@@ -0,0 +1,366 @@
+"""
+Slow query log with sampled plan capture
+
+A driver command listener times every query and write the application
+sends. Commands slower than SLOW_QUERY_MS are logged with their collection,
+the shape of their filter (field names and operators, values redacted),
+documents returned and duration. A sample of them is explained to record
+whether the winning plan scanned the collection or used an index. Records
+are kept in a capped collection that /api/admin/slow-queries aggregates
+into the worst query shapes.
+"""
+
+import asyncio
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Slow query configuration
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Share of slow queries explained (0 disables explain)
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+SLOW_QUERY_COLLECTION = os.getenv("SLOW_QUERY_COLLECTION", "slow_queries")
+SLOW_QUERY_COLLECTION_BYTES = int(
+    os.getenv("SLOW_QUERY_COLLECTION_BYTES", str(16 * 1024 * 1024))
+)
+# Records waiting to be written; further slow queries are only logged
+SLOW_QUERY_QUEUE_SIZE = 1000
+
+# Commands whose filter and plan are worth recording
+MONITORED_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Command fields that belong to the session or transport, not the query
+_EXPLAIN_EXCLUDED = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+# Metrics
+SLOW_QUERIES = Counter(
+    "mongodb_slow_queries_total", "Commands slower than SLOW_QUERY_MS", ["command", "collection"]
+)
+SLOW_QUERIES_DROPPED = Counter(
+    "mongodb_slow_queries_dropped_total", "Slow query records not stored", ["reason"]
+)
+
+
+def redact(value: Any) -> Any:
+    """Replace the values in a filter with "?", keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = redact(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def query_filter(command_name: str, command: Dict[str, Any]) -> Any:
+    """The part of a command that selects documents"""
+    if command_name == "find":
+        return command.get("filter", {})
+    if command_name == "aggregate":
+        # Stage names with the filters of $match stages
+        return [
+            {name: stage[name] if name == "$match" else {}}
+            for stage in command.get("pipeline", [])
+            for name in stage
+        ]
+    if command_name == "update":
+        return [statement.get("q", {}) for statement in command.get("updates", [])]
+    if command_name == "delete":
+        return [statement.get("q", {}) for statement in command.get("deletes", [])]
+    return command.get("query", {})
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> str:
+    """
+    Redacted filter and sort of a command as a stable string
+
+    Commands differing only in their values share a shape, which is what
+    the admin report groups by.
+    """
+    shape = {"filter": redact(query_filter(command_name, command))}
+    if command.get("sort"):
+        shape["sort"] = dict(command["sort"])
+    return json.dumps(shape, sort_keys=True, default=str)
+
+
+def documents_returned(command_name: str, reply: Dict[str, Any]) -> int:
+    """Documents in a command's reply, or affected by a write"""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return int(reply.get("n", 0))
+
+
+def plan_summary(explain: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """
+    Classify the winning plan of an explain result
+
+    Returns:
+        ("COLLSCAN" if any stage scans the collection, "IXSCAN" if an index
+        is used, otherwise the root stage), and the index names used
+    """
+    stages: List[str] = []
+    indexes: List[str] = []
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            if isinstance(node.get("stage"), str):
+                stages.append(node["stage"])
+            if isinstance(node.get("indexName"), str) and node["indexName"] not in indexes:
+                indexes.append(node["indexName"])
+            for key, child in node.items():
+                # Rejected plans would make every query look like a COLLSCAN
+                if key != "rejectedPlans":
+                    walk(child)
+        elif isinstance(node, list):
+            for child in node:
+                walk(child)
+
+    walk(explain.get("queryPlanner", explain))
+    if "COLLSCAN" in stages:
+        return "COLLSCAN", indexes
+    if "IXSCAN" in stages or "EXPRESS_IXSCAN" in stages or "IDHACK" in stages:
+        return "IXSCAN", indexes
+    return (stages[0] if stages else "UNKNOWN"), indexes
+
+
+class SlowQueryMonitor(monitoring.CommandListener):
+    """
+    Logs and stores commands slower than a threshold
+
+    The driver calls the listener methods from its own threads; records are
+    handed to the event loop, where a background task explains a sample and
+    writes them to the capped collection.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = SLOW_QUERY_MS,
+        explain_rate: float = SLOW_QUERY_EXPLAIN_RATE,
+        collection_name: str = SLOW_QUERY_COLLECTION,
+        size: int = SLOW_QUERY_COLLECTION_BYTES,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        self.collection_name = collection_name
+        self.size = size
+        self.database = None
+        self._lock = Lock()
+        self._started: Dict[Tuple[int, int], Tuple[str, str, Dict[str, Any]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a threshold is set"""
+        return self.threshold_ms > 0
+
+    def _ignored(self, command_name: str, collection: Any) -> bool:
+        # The monitor's own writes and explains must not feed back into it
+        return (
+            command_name not in MONITORED_COMMANDS
+            or not isinstance(collection, str)
+            or collection == self.collection_name
+        )
+
+    def started(self, event):
+        command = event.command
+        if self._ignored(event.command_name, command.get(event.command_name)):
+            return
+        with self._lock:
+            self._started[(event.request_id, event.operation_id)] = (
+                event.database_name,
+                command[event.command_name],
+                command,
+            )
+
+    def _finish(self, event) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        with self._lock:
+            return self._started.pop((event.request_id, event.operation_id), None)
+
+    def succeeded(self, event):
+        started = self._finish(event)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+        database_name, collection, command = started
+        record = {
+            "database": database_name,
+            "collection": collection,
+            "command": event.command_name,
+            "shape": query_shape(event.command_name, command),
+            "docs_returned": documents_returned(event.command_name, event.reply),
+            "duration_ms": round(duration_ms, 3),
+            "plan": None,
+            "indexes": [],
+            "at": datetime.utcnow(),
+        }
+        SLOW_QUERIES.labels(event.command_name, collection).inc()
+        logger.warning(
+            "Slow %s on %s: %sms, %s docs, shape %s",
+            event.command_name,
+            collection,
+            record['duration_ms'],
+            record['docs_returned'],
+            record['shape'],
+        )
+        self._submit(record, command)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _submit(self, record: Dict[str, Any], command: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            SLOW_QUERIES_DROPPED.labels("not_started").inc()
+            return
+        explain = None
+        if self.explain_rate > 0 and random.random() < self.explain_rate:
+            explain = {
+                key: value
+                for key, value in command.items()
+                if not key.startswith("$") and key not in _EXPLAIN_EXCLUDED
+            }
+        try:
+            loop.call_soon_threadsafe(self._enqueue, record, explain)
+        except RuntimeError:
+            # Loop closed between the check and the call
+            SLOW_QUERIES_DROPPED.labels("not_started").inc()
+
+    def _enqueue(self, record: Dict[str, Any], explain: Optional[Dict[str, Any]]) -> None:
+        try:
+            self._queue.put_nowait((record, explain))
+        except asyncio.QueueFull:
+            SLOW_QUERIES_DROPPED.labels("queue_full").inc()
+
+    @property
+    def collection(self):
+        return self.database[self.collection_name]
+
+    async def start(self, database) -> None:
+        """Begin storing records in database's capped collection"""
+        if self._task is not None or not self.enabled:
+            return
+        self.database = database
+        try:
+            await database.create_collection(
+                self.collection_name, capped=True, size=self.size
+            )
+        except CollectionInvalid:
+            pass
+        self._queue = asyncio.Queue(SLOW_QUERY_QUEUE_SIZE)
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        """Stop storing records; queries are still logged"""
+        self._loop = None
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def explain(self, record: Dict[str, Any], command: Dict[str, Any]) -> None:
+        """Add the winning plan of command to record"""
+        result = await self.database.client[record["database"]].command(
+            {"explain": command, "verbosity": "queryPlanner"}
+        )
+        record["plan"], record["indexes"] = plan_summary(result)
+
+    async def _write_loop(self) -> None:
+        while True:
+            record, command = await self._queue.get()
+            if command is not None:
+                try:
+                    await self.explain(record, command)
+                except Exception as e:
+                    # Some commands cannot be explained, e.g. multi-statement
+                    # updates; the record is stored without a plan
+                    logger.warning(
+                        "Failed to explain slow %s on %s: %s",
+                        record["command"],
+                        record["collection"],
+                        e,
+                    )
+            try:
+                await self.collection.insert_one(record)
+            except Exception as e:
+                SLOW_QUERIES_DROPPED.labels("write_failed").inc()
+                logger.error("Failed to store slow query record: %s", e)
+
+
+async def worst_queries(database, limit: int = 20, hours: float = 24) -> List[Dict[str, Any]]:
+    """
+    Slow query shapes ranked by the total time they took
+
+    Args:
+        database: Database holding the slow query collection
+        limit: Shapes to return
+        hours: How far back to look
+
+    Returns:
+        Per collection, command and shape: occurrences, total, mean and
+        worst duration, most documents returned, plans seen in sampled
+        explains and when it was last seen
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    pipeline = [
+        {"$match": {"at": {"$gte": since}}},
+        {
+            "$group": {
+                "_id": {"collection": "$collection", "command": "$command", "shape": "$shape"},
+                "count": {"$sum": 1},
+                "total_ms": {"$sum": "$duration_ms"},
+                "avg_ms": {"$avg": "$duration_ms"},
+                "max_ms": {"$max": "$duration_ms"},
+                "max_docs_returned": {"$max": "$docs_returned"},
+                "plans": {"$addToSet": "$plan"},
+                "indexes": {"$addToSet": "$indexes"},
+                "last_seen": {"$max": "$at"},
+            }
+        },
+        {"$sort": {"total_ms": -1}},
+        {"$limit": limit},
+    ]
+    results = []
+    async for group in database[SLOW_QUERY_COLLECTION].aggregate(pipeline):
+        key = group.pop("_id")
+        plans: Set[str] = {plan for plan in group.pop("plans") if plan}
+        indexes: Set[str] = {name for names in group.pop("indexes") for name in names}
+        results.append(
+            {
+                **key,
+                "shape": json.loads(key["shape"]),
+                **group,
+                "avg_ms": round(group["avg_ms"], 3),
+                "total_ms": round(group["total_ms"], 3),
+                "plans": sorted(plans),
+                "indexes": sorted(indexes),
+            }
+        )
+    return results
+
+
+# Registered on the client created by init_db
+slow_query_monitor = SlowQueryMonitor()
@@ -0,0 +1,154 @@
+"""
+Streaming JSON array and NDJSON responses for large list endpoints
+"""
+
+import asyncio
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Type
+
+from beanie import Document
+from fastapi.responses import StreamingResponse
+
+from logs import get_logger
+from pagination import (
+    NDJSON_MEDIA_TYPE,
+    PageParams,
+    after_query,
+    count_documents,
+    encode_cursor,
+    page_pipeline,
+    pagination_headers,
+    position_filter,
+    sort_spec,
+    unique_sort,
+)
+from serializers import DocumentSerializer
+
+logger = get_logger(__name__)
+
+# Documents fetched per MongoDB round trip while streaming
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+# Encoded bytes buffered before a chunk is written to the socket
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+async def page_boundary(
+    document_model: Type[Document],
+    query: Dict[str, Any],
+    limit: int,
+    sort_field: str,
+    descending: bool,
+) -> Optional[Dict[str, Any]]:
+    """
+    Find the last document of a page when another page follows it
+
+    Only the sort key and _id are projected, so this is an index walk
+    rather than a fetch of the whole page.
+    """
+    projection = {sort_field: 1, "_id": 1}
+    cursor = (
+        document_model.get_motor_collection()
+        .find(query, projection)
+        .sort(sort_spec(sort_field, descending, unique_sort(document_model, sort_field)))
+        .skip(limit - 1)
+        .limit(2)
+    )
+    documents = await cursor.to_list(length=2)
+    return documents[0] if len(documents) == 2 else None
+
+
+async def _chunks(
+    documents: AsyncIterator[Dict[str, Any]],
+    encode: Callable[[Dict[str, Any]], bytes],
+    ndjson: bool,
+) -> AsyncIterator[bytes]:
+    """Encode documents as they arrive, flushing in STREAM_CHUNK_BYTES chunks"""
+    buffer = bytearray(b"" if ndjson else b"[")
+    separator = b"\n" if ndjson else b","
+    first = True
+    try:
+        async for document in documents:
+            if ndjson:
+                buffer += encode(document) + separator
+            else:
+                if not first:
+                    buffer += separator
+                buffer += encode(document)
+            first = False
+            if len(buffer) >= STREAM_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+    except Exception as e:
+        # Headers are already sent, so the client sees a truncated body
+        logger.error("Error streaming documents: %s", e)
+        raise
+    if not ndjson:
+        buffer += b"]"
+    if buffer:
+        yield bytes(buffer)
+
+
+async def stream_page(
+    document_model: Type[Document],
+    serializer: DocumentSerializer,
+    filters: Dict[str, Any],
+    params: PageParams,
+    sort_field: str = "_id",
+    descending: bool = False,
+    stages: Optional[List[Dict[str, Any]]] = None,
+) -> StreamingResponse:
+    """
+    Stream one page of documents straight from the MongoDB cursor
+
+    Documents are encoded one at a time, so memory stays flat regardless of
+    the page size. The page is bounded by its last document rather than a
+    count, so the X-Next-Cursor sent up front stays valid even if documents
+    are inserted while the body is streaming.
+
+    Args:
+        document_model: Beanie document class to query
+        serializer: Serializer each document is encoded with
+        filters: MongoDB filter applied before paging
+        params: Paging options from page_params
+        sort_field: Document field to order by
+        descending: Whether to order from highest to lowest
+        stages: Aggregation stages run on each streamed document, e.g. $lookup
+
+    Returns:
+        StreamingResponse with a JSON array, or NDJSON if requested
+    """
+    query = after_query(filters, params.after, sort_field, descending)
+    boundary, total = await asyncio.gather(
+        page_boundary(document_model, query, params.limit, sort_field, descending),
+        count_documents(document_model, filters),
+    )
+
+    next_cursor = None
+    if boundary is not None:
+        sort_value = boundary.get(sort_field)
+        next_cursor = encode_cursor(sort_value, boundary["_id"])
+        through = position_filter(
+            sort_value, boundary["_id"], sort_field, descending, after=False
+        )
+        query = {"$and": [query, through]}
+
+    collection = document_model.get_motor_collection()
+    limit = params.limit if boundary is None else None
+    unique = unique_sort(document_model, sort_field)
+    if stages:
+        documents = collection.aggregate(
+            page_pipeline(query, sort_field, descending, limit, stages, unique),
+            batchSize=STREAM_BATCH_SIZE,
+        )
+    else:
+        documents = collection.find(
+            query, serializer.projection, batch_size=STREAM_BATCH_SIZE
+        ).sort(sort_spec(sort_field, descending, unique))
+        if limit is not None:
+            documents = documents.limit(limit)
+
+    return StreamingResponse(
+        _chunks(documents, serializer.dumps, params.ndjson),
+        media_type=NDJSON_MEDIA_TYPE if params.ndjson else "application/json",
+        headers=pagination_headers(total, next_cursor),
+    )
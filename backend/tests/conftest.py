@@ -0,0 +1,85 @@
+"""
+Shared fixtures for backend tests
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cache import document_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_document_cache():
+    """Keep cached documents from leaking between tests"""
+    document_cache.clear()
+    yield
+    document_cache.clear()
+
+
+def matches(document, query):
+    """Whether document satisfies a query of equality, $in and $lt conditions"""
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$lt" in condition and (value is None or not value < condition["$lt"]):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeJobsCollection:
+    """In-memory stand-in for the jobs collection, supporting what jobs.py uses"""
+
+    def __init__(self):
+        self.documents = {}
+
+    async def insert_one(self, document):
+        self.documents[document["_id"]] = dict(document)
+
+    async def find_one(self, query):
+        found = [d for d in self.documents.values() if matches(d, query)]
+        return dict(found[0]) if found else None
+
+    async def update_one(self, query, update):
+        for document in self.documents.values():
+            if matches(document, query):
+                document.update(update["$set"])
+                return SimpleNamespace(matched_count=1)
+        return SimpleNamespace(matched_count=0)
+
+    async def update_many(self, query, update):
+        for document in self.documents.values():
+            if matches(document, query):
+                document.update(update["$set"])
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        for document in self.documents.values():
+            if matches(document, query):
+                document.update(update["$set"])
+                return dict(document)
+        return None
+
+    async def delete_many(self, query):
+        for key in [k for k, d in self.documents.items() if matches(d, query)]:
+            del self.documents[key]
+
+
+@pytest.fixture(autouse=True)
+def jobs_collection():
+    """Keep job state in memory instead of MongoDB"""
+    import jobs
+
+    collection = FakeJobsCollection()
+    with patch("jobs._collection", return_value=collection):
+        yield collection
+    jobs._running.clear()
@@ -0,0 +1,137 @@
+"""
+Tests for the in-process read cache
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bson import ObjectId
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cache import MISSING, DocumentCache, document_cache, document_tag, query_key
+from entities.users import User
+from lookups import fetch_by_ids
+from pagination import paginate
+
+
+class TestDocumentCache:
+    """Test LRU, TTL and tag behaviour"""
+
+    @pytest.mark.backend
+    def test_get_returns_put_value(self):
+        """Test that a cached value is returned until removed"""
+        cache = DocumentCache(max_bytes=1000, ttl=60, negative_ttl=1)
+        cache.put("key", {"a": 1}, 10, ["users"])
+        assert cache.get("key", "users") == {"a": 1}
+        assert cache.get("other", "users") is MISSING
+
+    @pytest.mark.backend
+    def test_evicts_least_recently_used_to_fit(self):
+        """Test that the byte budget evicts the least recently used entry"""
+        cache = DocumentCache(max_bytes=250, ttl=60, negative_ttl=1)
+        cache.put("first", 1, 100, [])
+        cache.put("second", 2, 100, [])
+        cache.get("first", "users")
+        cache.put("third", 3, 100, [])
+        assert cache.get("second", "users") is MISSING
+        assert cache.get("first", "users") == 1
+        assert cache.bytes == 200
+
+    @pytest.mark.backend
+    def test_oversized_value_not_cached(self):
+        """Test that a value larger than the whole budget is skipped"""
+        cache = DocumentCache(max_bytes=100, ttl=60, negative_ttl=1)
+        cache.put("key", 1, 101, [])
+        assert cache.get("key", "users") is MISSING
+
+    @pytest.mark.backend
+    def test_expired_entries_are_dropped(self):
+        """Test that positive and negative entries use their own TTLs"""
+        cache = DocumentCache(max_bytes=1000, ttl=60, negative_ttl=5)
+        with patch("cache.time.monotonic", return_value=100.0):
+            cache.put("found", {"a": 1}, 10, [])
+            cache.put("absent", None, 10, [], negative=True)
+        with patch("cache.time.monotonic", return_value=110.0):
+            assert cache.get("found", "users") == {"a": 1}
+            assert cache.get("absent", "users") is MISSING
+        assert cache.bytes == 10
+
+    @pytest.mark.backend
+    def test_invalidate_drops_document_and_lists(self):
+        """Test that a write drops the document's entries and the collection's lists"""
+        cache = DocumentCache(max_bytes=1000, ttl=60, negative_ttl=1)
+        written, untouched = ObjectId(), ObjectId()
+        cache.put("written", {}, 10, [document_tag("users", written)])
+        cache.put("untouched", {}, 10, [document_tag("users", untouched)])
+        cache.put("list", [], 10, ["users"])
+        cache.invalidate(User, written)
+        assert cache.get("written", "users") is MISSING
+        assert cache.get("list", "users") is MISSING
+        assert cache.get("untouched", "users") == {}
+
+    @pytest.mark.backend
+    def test_put_after_invalidation_is_skipped(self):
+        """Test that a value fetched before a concurrent write is not cached"""
+        cache = DocumentCache(max_bytes=1000, ttl=60, negative_ttl=1)
+        version = cache.version
+        cache.invalidate_tags(["users"])
+        cache.put("key", {}, 10, ["users"], since=version)
+        assert cache.get("key", "users") is MISSING
+
+    @pytest.mark.backend
+    def test_disabled(self):
+        """Test that CACHE_MAX_BYTES=0 turns caching off"""
+        cache = DocumentCache(max_bytes=0, ttl=60, negative_ttl=1)
+        cache.put("key", 1, 0, [])
+        assert cache.get("key", "users") is MISSING
+
+    @pytest.mark.backend
+    def test_query_key_ignores_dict_order(self):
+        """Test that equal queries share a key whatever their dict order"""
+        assert query_key("users", filters={"a": 1, "b": 2}) == query_key(
+            "users", filters={"b": 2, "a": 1}
+        )
+
+
+class TestCachedReads:
+    """Test reads served through the shared cache"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_paginate_reuses_page_until_invalidated(self):
+        """Test that a repeated page query skips MongoDB until the collection changes"""
+        model = MagicMock()
+        model.Settings.name = "users"
+        collection = model.get_motor_collection.return_value
+        query = collection.find.return_value.sort.return_value.limit.return_value
+        query.to_list = AsyncMock(return_value=[{"_id": ObjectId()}])
+        collection.estimated_document_count = AsyncMock(return_value=1)
+
+        await paginate(model, limit=5)
+        await paginate(model, limit=5)
+        assert query.to_list.await_count == 1
+
+        document_cache.invalidate_tags(["users"])
+        await paginate(model, limit=5)
+        assert query.to_list.await_count == 2
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_fetch_by_ids_queries_only_uncached(self):
+        """Test that cached documents and misses are not fetched again"""
+        cached_id, new_id, absent_id = ObjectId(), ObjectId(), ObjectId()
+        with patch.object(User, "get_motor_collection") as mock_collection:
+            find = mock_collection.return_value.find
+            find.return_value.__aiter__.return_value = [{"_id": cached_id}]
+            await fetch_by_ids(User, [cached_id, absent_id])
+
+            find.return_value.__aiter__.return_value = [{"_id": new_id}]
+            lookup = await fetch_by_ids(User, [cached_id, new_id, absent_id])
+
+        assert find.call_args[0][0] == {"_id": {"$in": [new_id]}}
+        assert [item["_id"] for item in lookup.items] == [cached_id, new_id]
+        assert lookup.missing == [absent_id]
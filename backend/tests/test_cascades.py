@@ -0,0 +1,164 @@
+"""
+Tests for cascading deletes
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bson import ObjectId
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cascades import delete_course_enrollments, delete_user_enrollments
+from jobs import create_job
+
+
+def enrollments_collection(batches, remaining=0):
+    """Mock enrollments collection whose find returns the given batches in turn"""
+    enrollments = MagicMock()
+    enrollments.find.return_value.limit.return_value.to_list = AsyncMock(
+        side_effect=list(batches) + [[]]
+    )
+    enrollments.count_documents = AsyncMock(return_value=remaining)
+    return enrollments
+
+
+def decrements(courses):
+    """(course _id, amount) of each decrement sent to the courses collection"""
+    return [
+        (update._filter["_id"], update._doc[0]["$set"]["enrollment_count"]["$max"][1]["$subtract"][1])
+        for call in courses.bulk_write.call_args_list
+        for update in call.args[0]
+    ]
+
+
+class TestCascades:
+    """Test enrollment cleanup jobs"""
+
+    @pytest.fixture
+    def parents(self):
+        """Mock users and courses collections"""
+        users, courses = MagicMock(), MagicMock()
+        users.delete_one = AsyncMock()
+        courses.delete_one = AsyncMock()
+        courses.bulk_write = AsyncMock()
+        courses.update_one = AsyncMock()
+        with patch('cascades.User.get_motor_collection', return_value=users), \
+                patch('cascades.Course.get_motor_collection', return_value=courses):
+            yield users, courses
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_user_delete_decrements_each_batch(self, parents, jobs_collection):
+        """Test that a fully deleted batch is subtracted from its courses in one delete"""
+        users, courses = parents
+        user_id, algebra, biology = ObjectId(), ObjectId(), ObjectId()
+        batch = [
+            {"_id": ObjectId(), "course_id": algebra},
+            {"_id": ObjectId(), "course_id": algebra},
+            {"_id": ObjectId(), "course_id": biology},
+        ]
+        enrollments = enrollments_collection([batch], remaining=3)
+        enrollments.delete_many = AsyncMock(return_value=MagicMock(deleted_count=3))
+
+        job = await create_job("user_delete", params={"user_id": user_id})
+        with patch('cascades.Enrollment.get_motor_collection', return_value=enrollments):
+            await delete_user_enrollments(job)
+
+        users.delete_one.assert_awaited_once_with({"_id": user_id})
+        enrollments.delete_many.assert_awaited_once_with(
+            {"_id": {"$in": [enrollment["_id"] for enrollment in batch]}}
+        )
+        assert decrements(courses) == [(algebra, 2), (biology, 1)]
+        courses.update_one.assert_not_awaited()
+        assert job.processed == job.succeeded == job.total == 3
+        stored = jobs_collection.documents[job.id]
+        assert stored["params"]["batch"] == []
+        assert stored["processed"] == 3
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_user_delete_recounts_when_deleted_concurrently(self, parents, jobs_collection):
+        """Test that an enrollment deleted concurrently is not subtracted twice"""
+        _, courses = parents
+        user_id, algebra, biology = ObjectId(), ObjectId(), ObjectId()
+        batch = [
+            {"_id": ObjectId(), "course_id": algebra},
+            {"_id": ObjectId(), "course_id": biology},
+        ]
+        enrollments = enrollments_collection([batch], remaining=2)
+        # The biology enrollment was deleted through the API in the meantime
+        enrollments.delete_many = AsyncMock(return_value=MagicMock(deleted_count=1))
+
+        job = await create_job("user_delete", params={"user_id": user_id})
+        with patch('cascades.Enrollment.get_motor_collection', return_value=enrollments):
+            await delete_user_enrollments(job)
+
+        courses.bulk_write.assert_not_awaited()
+        recounted = {call.args[0]["_id"] for call in courses.update_one.await_args_list}
+        assert recounted == {algebra, biology}
+        assert job.processed == job.total == 2
+        assert job.succeeded == 1
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_user_delete_loops_until_none_remain(self, parents, jobs_collection):
+        """Test that enrollments found after the first batch are deleted and counted"""
+        _, courses = parents
+        user_id, algebra = ObjectId(), ObjectId()
+        enrollments = enrollments_collection(
+            [[{"_id": ObjectId(), "course_id": algebra}]] * 3, remaining=1
+        )
+        enrollments.delete_many = AsyncMock(return_value=MagicMock(deleted_count=1))
+
+        job = await create_job("user_delete", params={"user_id": user_id})
+        with patch('cascades.Enrollment.get_motor_collection', return_value=enrollments):
+            await delete_user_enrollments(job)
+
+        assert decrements(courses) == [(algebra, 1)] * 3
+        assert job.processed == job.total == 3
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_resumed_user_delete_recounts_interrupted_batch(self, parents, jobs_collection):
+        """Test that the courses of a batch cut short are recounted, not decremented"""
+        _, courses = parents
+        user_id, algebra = ObjectId(), ObjectId()
+        enrollments = enrollments_collection([], remaining=0)
+
+        job = await create_job(
+            "user_delete", params={"user_id": user_id, "batch": [algebra]}
+        )
+        job.processed = 5
+        with patch('cascades.Enrollment.get_motor_collection', return_value=enrollments):
+            await delete_user_enrollments(job)
+
+        courses.update_one.assert_awaited_once_with(
+            {"_id": algebra}, {"$set": {"enrollment_count": 0}}
+        )
+        courses.bulk_write.assert_not_awaited()
+        assert job.total == 5
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_course_delete_removes_enrollments_in_batches(self, parents, jobs_collection):
+        """Test that a deleted course's enrollments are removed batch by batch"""
+        _, courses = parents
+        course_id = ObjectId()
+        first, second = [{"_id": ObjectId()}] * 2, [{"_id": ObjectId()}]
+        enrollments = enrollments_collection([first, second], remaining=3)
+        enrollments.delete_many = AsyncMock(
+            side_effect=[MagicMock(deleted_count=2), MagicMock(deleted_count=1)]
+        )
+
+        job = await create_job("course_delete", params={"course_id": course_id})
+        with patch('cascades.Enrollment.get_motor_collection', return_value=enrollments):
+            await delete_course_enrollments(job)
+
+        courses.delete_one.assert_awaited_once_with({"_id": course_id})
+        assert enrollments.delete_many.await_count == 2
+        assert job.succeeded == job.total == 3
+        assert jobs_collection.documents[job.id]["succeeded"] == 3
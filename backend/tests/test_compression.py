@@ -0,0 +1,134 @@
+"""
+Tests for response compression
+"""
+
+import gzip
+import pytest
+import sys
+import os
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from compression import (
+    CompressionMiddleware,
+    compress,
+    compression_level,
+    negotiate_encoding,
+    stream_compressor,
+)
+
+LARGE_BODY = b"[" + b",".join(b'{"title": "Algebra"}' for _ in range(500)) + b"]"
+
+
+def build_client(offload_size=1024 * 1024):
+    """App with a few fixed responses behind the middleware"""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, offload_size=offload_size)
+
+    @app.get("/large")
+    async def large():
+        return Response(LARGE_BODY, media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return Response(b"[]", media_type="application/json")
+
+    @app.get("/image")
+    async def image():
+        return Response(LARGE_BODY, media_type="image/png")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for _ in range(100):
+                yield b'{"title": "Algebra"}\n'
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+class TestNegotiation:
+    """Test Accept-Encoding handling"""
+
+    @pytest.mark.backend
+    def test_server_preference_breaks_ties(self):
+        """Test that the first available encoding wins among equal q-values"""
+        assert negotiate_encoding("gzip, br", ["br", "gzip"]) == "br"
+
+    @pytest.mark.backend
+    def test_client_q_values(self):
+        """Test that a higher q-value beats server preference and q=0 refuses"""
+        assert negotiate_encoding("br;q=0.5, gzip", ["br", "gzip"]) == "gzip"
+        assert negotiate_encoding("gzip;q=0", ["gzip"]) is None
+        assert negotiate_encoding("*", ["gzip"]) == "gzip"
+        assert negotiate_encoding("", ["gzip"]) is None
+
+    @pytest.mark.backend
+    def test_level_per_content_type(self):
+        """Test that streamed NDJSON uses a faster level than buffered JSON"""
+        assert compression_level("application/x-ndjson", "gzip") < compression_level(
+            "application/json; charset=utf-8", "gzip"
+        )
+
+    @pytest.mark.backend
+    def test_stream_compressor_round_trip(self):
+        """Test that flushed gzip chunks decode to the original stream"""
+        compress_chunk, finish = stream_compressor("gzip", 1)
+        data = compress_chunk(b"first\n") + compress_chunk(b"second\n") + finish()
+        assert gzip.decompress(data) == b"first\nsecond\n"
+        assert gzip.decompress(compress(b"body", "gzip", 6)) == b"body"
+
+
+class TestCompressionMiddleware:
+    """Test the ASGI middleware"""
+
+    @pytest.mark.backend
+    def test_large_json_is_compressed(self):
+        """Test that a large body is gzipped with its length and a weak ETag"""
+        response = build_client().get("/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert int(response.headers["Content-Length"]) < len(LARGE_BODY)
+        assert response.headers["ETag"] == 'W/"v1"'
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.content == LARGE_BODY
+
+    @pytest.mark.backend
+    def test_offloaded_compression(self):
+        """Test that bodies past the offload size are compressed off the loop"""
+        response = build_client(offload_size=0).get(
+            "/large", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content == LARGE_BODY
+
+    @pytest.mark.backend
+    def test_small_and_binary_bodies_pass_through(self):
+        """Test that small bodies and non-text types are sent as is"""
+        client = build_client()
+        assert "Content-Encoding" not in client.get(
+            "/small", headers={"Accept-Encoding": "gzip"}
+        ).headers
+        assert "Content-Encoding" not in client.get(
+            "/image", headers={"Accept-Encoding": "gzip"}
+        ).headers
+
+    @pytest.mark.backend
+    def test_identity_when_not_accepted(self):
+        """Test that clients without Accept-Encoding get the plain body"""
+        response = build_client().get("/large", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+        assert response.content == LARGE_BODY
+
+    @pytest.mark.backend
+    def test_streamed_body_is_compressed(self):
+        """Test that a streamed export is compressed chunk by chunk"""
+        response = build_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in response.headers
+        assert response.content == b'{"title": "Algebra"}\n' * 100
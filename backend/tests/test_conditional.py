@@ -0,0 +1,67 @@
+"""
+Tests for conditional GET helpers
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import MagicMock
+
+from fastapi import Response
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from conditional import compute_etag, conditional_response, etag_matches
+
+
+def request_with(headers):
+    request = MagicMock()
+    request.headers = headers
+    return request
+
+
+class TestEtagMatches:
+    """Test If-None-Match comparison"""
+
+    @pytest.mark.backend
+    def test_etag_is_stable_per_body(self):
+        """Test that equal bodies share a tag and different bodies do not"""
+        assert compute_etag(b"[]") == compute_etag(b"[]")
+        assert compute_etag(b"[]") != compute_etag(b"[1]")
+
+    @pytest.mark.backend
+    def test_list_and_weak_tags(self):
+        """Test that any listed tag matches, with W/ ignored"""
+        assert etag_matches('"a", W/"b"', '"b"')
+        assert etag_matches("*", '"b"')
+        assert not etag_matches('"a"', '"b"')
+        assert not etag_matches(None, '"b"')
+
+
+class TestConditionalResponse:
+    """Test 304 handling"""
+
+    @pytest.mark.backend
+    def test_no_header_keeps_body(self):
+        """Test that a first request gets the full response with validators"""
+        response = Response(content=b"[]", media_type="application/json")
+        result = conditional_response(request_with({}), response)
+        assert result is response
+        assert result.headers["ETag"] == compute_etag(b"[]")
+
+    @pytest.mark.backend
+    def test_match_keeps_headers_without_body(self):
+        """Test that a 304 repeats the response headers but not the body"""
+        response = Response(
+            content=b"[]",
+            media_type="application/json",
+            headers={"X-Total-Count": "0"},
+        )
+        result = conditional_response(
+            request_with({"if-none-match": compute_etag(b"[]")}), response
+        )
+        assert result.status_code == 304
+        assert result.body == b""
+        assert result.headers["X-Total-Count"] == "0"
+        assert "content-type" not in result.headers
@@ -5,12 +5,21 @@ Simple tests for database functionality
 import pytest
 import sys
 import os
-from unittest.mock import patch, Mock
+from unittest.mock import patch, AsyncMock, MagicMock, Mock
+
+from pymongo import IndexModel
 
 # Add backend to path for testing
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from database import get_database
+import database
+from database import (
+    build_unique_indexes,
+    deferred_indexes,
+    get_database,
+    init_db,
+    sync_indexes,
+)
 
 
 class TestDatabase:
@@ -48,3 +57,140 @@ class TestDatabase:
             # Expected to fail without MongoDB connection
             pass
 
+
+def model_with_indexes(name, indexes):
+    """Build a mock document model declaring the given indexes"""
+    model = MagicMock()
+    model.Settings.name = name
+    model.Settings.indexes = indexes
+    return model
+
+
+class TestIndexes:
+    """Test index declaration and background sync"""
+
+    @pytest.mark.backend
+    def test_deferred_indexes_hides_and_restores(self):
+        """Test that indexes are hidden during init_beanie and restored afterwards"""
+        indexes = [IndexModel("email", unique=True)]
+        model = model_with_indexes("users", indexes)
+
+        with deferred_indexes([model]):
+            assert model.Settings.indexes == []
+
+        assert model.Settings.indexes is indexes
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_sync_indexes_continues_after_failure(self):
+        """Test that one failed index build does not stop the others"""
+        failing = model_with_indexes("users", [IndexModel("email", unique=True)])
+        failing.get_motor_collection.return_value.create_indexes = AsyncMock(
+            side_effect=Exception("E11000 duplicate key")
+        )
+        working = model_with_indexes("courses", [IndexModel("status")])
+        working.get_motor_collection.return_value.create_indexes = AsyncMock(
+            return_value=["status_1"]
+        )
+
+        with patch("database.get_document_models", return_value=[failing, working]):
+            await sync_indexes()
+
+        working.get_motor_collection.return_value.create_indexes.assert_awaited_once()
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_unique_indexes_built_before_serving(self):
+        """Test that only unique indexes are built up front and failures propagate"""
+        email = IndexModel("email", unique=True)
+        users = model_with_indexes("users", [email, IndexModel("role")])
+        users.get_motor_collection.return_value.create_indexes = AsyncMock(
+            return_value=["email_1"]
+        )
+        courses = model_with_indexes("courses", [IndexModel("status")])
+
+        await build_unique_indexes([users, courses])
+
+        users.get_motor_collection.return_value.create_indexes.assert_awaited_once_with([email])
+        courses.get_motor_collection.assert_not_called()
+
+        users.get_motor_collection.return_value.create_indexes.side_effect = Exception(
+            "E11000 duplicate key"
+        )
+        with pytest.raises(Exception, match="E11000"):
+            await build_unique_indexes([users])
+
+    @pytest.mark.backend
+    def test_models_declare_indexes(self):
+        """Test that the unique indexes relied on by the API are declared"""
+        from entities.users import User
+        from entities.enrollments import Enrollment
+
+        user_indexes = {index.document["name"]: index.document for index in User.Settings.indexes}
+        assert user_indexes["email_1"].get("unique")
+        assert user_indexes["username_1"].get("unique")
+        enrollment_indexes = {
+            index.document["name"]: index.document for index in Enrollment.Settings.indexes
+        }
+        assert enrollment_indexes["user_id_1_course_id_1"].get("unique")
+
+    @pytest.mark.backend
+    def test_every_sort_is_indexed(self):
+        """Test that each ?sort= field has an index in the order sort_spec sorts"""
+        from entities.users import User
+        from entities.courses import Course
+        from entities.enrollments import Enrollment
+        from pagination import sort_spec, unique_sort
+        from routers import courses, enrollments, users
+
+        for model, router in ((User, users), (Course, courses), (Enrollment, enrollments)):
+            keys = [list(index.document["key"]) for index in model.Settings.indexes]
+            for field in router.SORT_FIELDS:
+                sort = [key for key, _ in sort_spec(field, unique=unique_sort(model, field))]
+                assert sort in keys, f"{model.Settings.name}.{field}"
+
+        enrollment_keys = [list(index.document["key"]) for index in Enrollment.Settings.indexes]
+        for field in enrollments.SORT_FIELDS:
+            assert ["course_id", field, "_id"] in enrollment_keys
+
+    @pytest.mark.backend
+    def test_no_index_is_a_prefix_of_another(self):
+        """Test that no declared index is already covered by a wider one"""
+        from entities.users import User
+        from entities.courses import Course
+        from entities.enrollments import Enrollment
+
+        for model in (User, Course, Enrollment):
+            keys = [list(index.document["key"]) for index in model.Settings.indexes]
+            for key in keys:
+                wider = [other for other in keys if other != key and other[:len(key)] == key]
+                assert not wider, f"{model.Settings.name}: {key} is covered by {wider}"
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_reconnect_restarts_index_sync(self):
+        """Test that a retried init_db syncs indexes on its new client"""
+        import asyncio
+
+        stale = asyncio.get_running_loop().create_future()
+        clients = [MagicMock(), MagicMock()]
+        for mock_client in clients:
+            mock_client.admin.command = AsyncMock()
+        sync = AsyncMock()
+        with patch("database.client", clients[0]), \
+                patch("database.index_sync_task", stale), \
+                patch("database.connected", False), \
+                patch("database.AsyncIOMotorClient", return_value=clients[1]), \
+                patch("database.warm_pool", new=AsyncMock()), \
+                patch("database.init_beanie", new=AsyncMock()), \
+                patch("database.build_unique_indexes", new=AsyncMock()), \
+                patch("database.slow_query_monitor", new=AsyncMock(enabled=False)), \
+                patch("database.sync_indexes", new=sync):
+            await init_db()
+            task = database.index_sync_task
+            await task
+
+        assert stale.cancelled()
+        clients[0].close.assert_called_once()
+        assert task is not stale
+        sync.assert_awaited_once()
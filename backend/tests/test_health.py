@@ -0,0 +1,97 @@
+"""
+Tests for background database connection and the readiness probe
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from database import connect_with_retry
+from health import ReadinessProbe
+
+
+class TestConnectWithRetry:
+    """Test startup connection retries"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_retries_until_connected(self):
+        """Test that failed attempts are retried with growing pauses"""
+        connect = AsyncMock(side_effect=[ConnectionError("down"), ConnectionError("down"), None])
+        with patch("database.asyncio.sleep", new=AsyncMock()) as sleep, patch(
+            "database.DB_CONNECT_RETRY_SECONDS", 1.0
+        ):
+            await connect_with_retry(connect)
+
+        assert connect.await_count == 3
+        first, second = [call.args[0] for call in sleep.await_args_list]
+        assert 0.5 <= first <= 1.0
+        assert 1.0 <= second <= 2.0
+
+
+class TestReadinessProbe:
+    """Test the cached readiness state"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_ready_after_startup_and_ping(self):
+        """Test that readiness needs both finished startup and a good ping"""
+        probe = ReadinessProbe()
+        with patch("health.ping", new=AsyncMock()):
+            await probe.check()
+            assert probe.database == "ok"
+            assert not probe.ready
+            probe.mark_started()
+            assert probe.ready
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_not_ready_when_unreachable(self):
+        """Test that a failed ping takes the replica out of rotation"""
+        probe = ReadinessProbe()
+        probe.mark_started()
+        with patch("health.ping", new=AsyncMock(side_effect=TimeoutError())):
+            await probe.check()
+        ready, details = probe.status()
+        assert not ready
+        assert details["database"] == "unreachable"
+        assert details["error"] == "TimeoutError"
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_connecting(self):
+        """Test the state reported before init_db completes"""
+        probe = ReadinessProbe()
+        await probe.check()
+        assert probe.database == "connecting"
+
+
+class TestProbeEndpoints:
+    """Test /health and /ready"""
+
+    @pytest.mark.backend
+    def test_ready_reports_cached_state(self):
+        """Test that /ready answers 503 until the probe is ready, without pinging"""
+        from main import app
+
+        probe = ReadinessProbe()
+        with patch("main.init_db"), patch("main.readiness", probe), patch(
+            "health.ping", new=AsyncMock()
+        ) as ping:
+            client = TestClient(app)
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert response.json()["startup"] == "in progress"
+
+            probe.started, probe.database = True, "ok"
+            response = client.get("/ready")
+            assert response.status_code == 200
+            assert response.json()["status"] == "ready"
+            assert client.get("/health").status_code == 200
+            ping.assert_not_awaited()
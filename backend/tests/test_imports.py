@@ -0,0 +1,94 @@
+"""
+Tests for bulk user import
+"""
+
+import io
+import json
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from imports import UserImport
+from jobs import create_job
+from uploads import read_rows
+
+
+def user_row(name, **overrides):
+    """Build a valid user import row"""
+    row = {
+        "email": f"{name}@example.com",
+        "username": name,
+        "first_name": name.title(),
+        "last_name": "Student",
+        "role": "student",
+        "password": "Sup3r-Secret!",
+    }
+    row.update(overrides)
+    return row
+
+
+class TestReadRows:
+    """Test reading rows from spooled uploads"""
+
+    @pytest.mark.backend
+    def test_csv_rows_drop_empty_cells(self):
+        """Test that empty CSV cells are left for model defaults"""
+        upload = io.BytesIO(b"email,username,is_active\na@example.com,alice,\n")
+        assert list(read_rows(upload, ndjson=False)) == [
+            (1, {"email": "a@example.com", "username": "alice"})
+        ]
+
+    @pytest.mark.backend
+    def test_ndjson_rows_flag_unparseable_lines(self):
+        """Test that bad NDJSON lines are yielded as None"""
+        upload = io.BytesIO(b'{"a": 1}\nnot json\n\n[1]\n')
+        assert list(read_rows(upload, ndjson=True)) == [
+            (1, {"a": 1}), (2, None), (3, None)
+        ]
+
+
+class TestUserImport:
+    """Test the import pipeline with a mocked database"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_import_reports_each_failed_row(self, jobs_collection):
+        """Test validation, in-upload duplicates and existing users"""
+        rows = [
+            user_row("alice"),
+            user_row("bob", password="short"),
+            user_row("alice2", email="alice@example.com"),
+            user_row("taken"),
+            user_row("carol"),
+        ]
+        upload = io.BytesIO("\n".join(json.dumps(row) for row in rows).encode())
+
+        users = MagicMock()
+        users.find.return_value.__aiter__.return_value = [
+            {"email": "taken@example.com", "username": "taken"}
+        ]
+        hash_many = AsyncMock(side_effect=lambda passwords: ["hashed"] * len(passwords))
+        insert_many = AsyncMock()
+
+        job = await create_job("user_import")
+        with patch('imports.User.get_motor_collection', return_value=users), \
+                patch('imports.User.insert_many', new=insert_many), \
+                patch('imports.password_hasher.hash_many', new=hash_many):
+            await UserImport(job).run(upload, ndjson=True)
+
+        assert job.processed == job.total == 5
+        assert job.succeeded == 2
+        assert [(error.item, error.detail) for error in job.errors][1:] == [
+            (3, "Duplicate email earlier in upload"),
+            (4, "User with this email already exists"),
+        ]
+        assert job.errors[0].item == 2
+        inserted = insert_many.call_args.args[0]
+        assert [user.username for user in inserted] == ["alice", "carol"]
+        assert all(user.hashed_password == "hashed" for user in inserted)
+        assert upload.closed
+        assert jobs_collection.documents[job.id]["succeeded"] == 2
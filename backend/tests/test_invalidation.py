@@ -0,0 +1,158 @@
+"""
+Tests for cross-replica cache invalidation
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bson import ObjectId
+from pymongo.errors import CollectionInvalid
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cache import MISSING, DocumentCache
+from invalidation import MemoryBus, MongoBus, create_bus
+
+
+def new_cache():
+    return DocumentCache(max_bytes=10000, ttl=60, negative_ttl=5)
+
+
+class FakeTailableCursor:
+    """Stand-in for a Motor tailable cursor that yields one batch then dies"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.alive = True
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        messages, self.messages = self.messages, []
+        for message in messages:
+            yield message
+        self.alive = False
+
+
+class TestMemoryBus:
+    """Test delivery between buses in one process"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_write_evicts_other_replica(self):
+        """Test that an invalidation on one cache reaches another replica's cache"""
+        writer_cache, reader_cache = new_cache(), new_cache()
+        writer, reader = MemoryBus(writer_cache), MemoryBus(reader_cache)
+        await writer.start()
+        await reader.start()
+        try:
+            reader_cache.put("course", {"title": "Old"}, 10, ["courses/1"])
+            writer_cache.put("unrelated", {}, 10, ["users/2"])
+            writer_cache.invalidate_tags(["courses/1"])
+            await asyncio.sleep(0)
+            assert reader_cache.get("course", "courses") is MISSING
+            assert writer_cache.get("unrelated", "users") == {}
+        finally:
+            await writer.stop()
+            await reader.stop()
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_received_invalidations_are_not_republished(self):
+        """Test that applying a remote message does not echo it back onto the bus"""
+        cache = new_cache()
+        bus = MemoryBus(cache)
+        bus.send = AsyncMock()
+        await bus.start()
+        try:
+            bus.receive({"origin": "other", "tags": ["users"], "published_at": 0})
+            await asyncio.sleep(0)
+            bus.send.assert_not_called()
+        finally:
+            await bus.stop()
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_own_messages_ignored(self):
+        """Test that a replica skips messages it published"""
+        cache = new_cache()
+        bus = MemoryBus(cache)
+        cache.put("key", {}, 10, ["users"])
+        bus.receive({"origin": bus.origin, "tags": ["users"], "published_at": 0})
+        assert cache.get("key", "users") == {}
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_publish_failure_is_logged(self):
+        """Test that a failed publish does not raise into the publishing task"""
+        bus = MemoryBus(new_cache())
+        bus.send = AsyncMock(side_effect=Exception("down"))
+        bus._enqueue(["users"])
+        await bus.flush()
+        assert not bus._pending
+
+
+class TestMongoBus:
+    """Test the capped collection backend"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_ensure_collection_seeds_empty_collection(self):
+        """Test that an existing collection is reused and seeded when empty"""
+        bus = MongoBus(new_cache())
+        collection = MagicMock()
+        collection.database.create_collection = AsyncMock(side_effect=CollectionInvalid)
+        collection.find_one = AsyncMock(return_value=None)
+        collection.insert_one = AsyncMock()
+        with patch("invalidation.get_database") as mock_database:
+            mock_database.return_value.__getitem__.return_value = collection
+            await bus.ensure_collection()
+        assert collection.insert_one.await_args[0][0]["tags"] == []
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_tail_applies_only_new_messages(self):
+        """Test that messages up to the newest at startup are skipped"""
+        cache = new_cache()
+        bus = MongoBus(cache)
+        old_id, newest_id = ObjectId(), ObjectId()
+        messages = [
+            {"_id": old_id, "origin": "other", "tags": ["users"], "published_at": 0},
+            {"_id": newest_id, "origin": "other", "tags": ["users"], "published_at": 0},
+            {"_id": ObjectId(), "origin": "other", "tags": ["courses"], "published_at": 0},
+        ]
+
+        def open_cursor(*args, **kwargs):
+            # Entries cached once the cache was cleared for the new cursor
+            cache.put("user", {}, 10, ["users"])
+            cache.put("course", {}, 10, ["courses"])
+            return FakeTailableCursor(messages)
+
+        collection = MagicMock()
+        collection.find_one = AsyncMock(return_value={"_id": newest_id})
+        collection.find.side_effect = open_cursor
+        bus.ensure_collection = AsyncMock()
+        with patch("invalidation.get_database") as mock_database, patch(
+            "invalidation.asyncio.sleep", AsyncMock(side_effect=asyncio.CancelledError)
+        ):
+            mock_database.return_value.__getitem__.return_value = collection
+            with pytest.raises(asyncio.CancelledError):
+                await bus._tail()
+
+        assert cache.get("user", "users") == {}
+        assert cache.get("course", "courses") is MISSING
+
+
+class TestCreateBus:
+    """Test backend selection"""
+
+    @pytest.mark.backend
+    def test_unknown_backend(self):
+        """Test that a misspelt backend fails at startup"""
+        with pytest.raises(ValueError):
+            create_bus("redis")
@@ -0,0 +1,185 @@
+"""
+Tests for background jobs
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import jobs
+from entities.jobs import JobStatus
+from jobs import (
+    MAX_JOB_ERRORS,
+    Job,
+    JobLost,
+    JobSupervisor,
+    create_job,
+    get_job,
+    resumable,
+    start_job,
+)
+
+
+def lapse(jobs_collection, job_id, owner="other-replica:1"):
+    """Make a job look abandoned by a replica that stopped"""
+    jobs_collection.documents[job_id].update(
+        owner=owner, lease_until=datetime.utcnow() - timedelta(seconds=1)
+    )
+
+
+class TestJobs:
+    """Test job tracking"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_job_completes(self, jobs_collection):
+        """Test that a job's progress and status are tracked and stored"""
+
+        async def work(job):
+            job.processed = job.succeeded = 3
+
+        job = await start_job("test", work, total=3)
+        assert jobs_collection.documents[job.id]["status"] == "pending"
+        await job.task
+
+        assert job.status == JobStatus.COMPLETED
+        stored = jobs_collection.documents[job.id]
+        assert stored["status"] == "completed"
+        assert stored["succeeded"] == 3
+        assert stored["finished_at"] is not None
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_job_failure_is_recorded(self, jobs_collection):
+        """Test that an exception fails the job instead of escaping the task"""
+
+        async def work(job):
+            raise RuntimeError("database unavailable")
+
+        job = await start_job("test", work)
+        await asyncio.wait_for(job.task, 1)
+
+        assert job.status == JobStatus.FAILED
+        assert jobs_collection.documents[job.id]["detail"] == "database unavailable"
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_any_replica_reads_progress(self, jobs_collection):
+        """Test that a job started elsewhere is answered from the collection"""
+        job = await create_job("test", total=10)
+        job.processed = 4
+        await job.save()
+
+        jobs._running.clear()
+        response = await get_job(job.id)
+        assert response.processed == 4
+        assert response.total == 10
+        assert await get_job("unknown") is None
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_lost_lease_stops_saving(self, jobs_collection):
+        """Test that a job taken over by another replica can no longer write"""
+        job = await create_job("test")
+        lapse(jobs_collection, job.id)
+        with pytest.raises(JobLost):
+            await job.save()
+
+    @pytest.mark.backend
+    def test_recorded_errors_are_capped(self):
+        """Test that failures past MAX_JOB_ERRORS are counted but not kept"""
+        job = Job(kind="test")
+        for item in range(MAX_JOB_ERRORS + 5):
+            job.record_error(item, "bad row")
+
+        assert job.failed == MAX_JOB_ERRORS + 5
+        assert len(job.errors) == MAX_JOB_ERRORS
+
+    @pytest.mark.backend
+    def test_documents_round_trip(self):
+        """Test that a stored job rebuilds with the same state"""
+        job = Job(kind="test", total=2, params={"user_id": "abc"})
+        job.record_error(1, "bad row")
+        rebuilt = Job.from_document(job.to_document())
+        assert rebuilt.to_response() == job.to_response()
+        assert rebuilt.params == {"user_id": "abc"}
+
+
+class TestJobSupervisor:
+    """Test lease renewal and takeover of abandoned jobs"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_resumable_jobs_are_taken_over(self, jobs_collection):
+        """Test that an abandoned resumable job runs again from its saved state"""
+        resumed = []
+
+        @resumable("test_resumable")
+        async def work(job):
+            resumed.append(job.processed)
+
+        job = await create_job("test_resumable", params={"n": 1})
+        job.processed = 7
+        await job.save()
+        lapse(jobs_collection, job.id)
+
+        assert await JobSupervisor().recover() == 1
+        await asyncio.gather(*(running.task for running in list(jobs._running.values())))
+
+        assert resumed == [7]
+        stored = jobs_collection.documents[job.id]
+        assert stored["status"] == "completed"
+        assert stored["owner"] == jobs.WORKER_ID
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_other_jobs_fail_when_abandoned(self, jobs_collection):
+        """Test that jobs that cannot resume are marked failed, not left running"""
+        job = await create_job("test_not_resumable")
+        lapse(jobs_collection, job.id)
+        live = await create_job("test_not_resumable")
+
+        assert await JobSupervisor().recover() == 1
+        stored = jobs_collection.documents[job.id]
+        assert stored["status"] == "failed"
+        assert "Interrupted" in stored["detail"]
+        assert jobs_collection.documents[live.id]["status"] == "pending"
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_cancelled_resumable_job_is_released(self, jobs_collection):
+        """Test that shutdown hands a resumable job over instead of failing it"""
+        started = asyncio.Event()
+
+        @resumable("test_release")
+        async def work(job):
+            started.set()
+            await asyncio.sleep(60)
+
+        job = await start_job("test_release", work)
+        await started.wait()
+        job.task.cancel()
+        await asyncio.gather(job.task, return_exceptions=True)
+
+        stored = jobs_collection.documents[job.id]
+        assert stored["status"] == "running"
+        assert stored["lease_until"] <= datetime.utcnow()
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_prune_removes_old_finished_jobs(self, jobs_collection):
+        """Test that finished jobs are kept for JOB_RETENTION_SECONDS"""
+        old = await create_job("test")
+        recent = await create_job("test")
+        jobs_collection.documents[old.id]["finished_at"] = datetime.utcnow() - timedelta(
+            seconds=jobs.JOB_RETENTION_SECONDS + 1
+        )
+        jobs_collection.documents[recent.id]["finished_at"] = datetime.utcnow()
+
+        await JobSupervisor().prune()
+        assert list(jobs_collection.documents) == [recent.id]
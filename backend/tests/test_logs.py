@@ -0,0 +1,178 @@
+"""
+Tests for queued JSON logging, sampling and request ids
+"""
+
+import json
+import logging
+import queue
+import pytest
+import sys
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import logs
+from logs import (
+    LOG_RECORDS_DROPPED,
+    LOG_RECORDS_SAMPLED_OUT,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    RequestIdFilter,
+    RequestIdMiddleware,
+    SamplingFilter,
+    _request_id,
+    parse_sampling,
+    setup_logging,
+    shutdown_logging,
+    start_logging,
+)
+
+
+def make_record(name="app", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestJsonFormatter:
+    """Test the JSON line format"""
+
+    @pytest.mark.backend
+    def test_fields_and_extra(self):
+        """Test that message, request id and extra fields are emitted"""
+        record = make_record(event="request_timing", status=200)
+        token = _request_id.set("abc123")
+        try:
+            RequestIdFilter().filter(record)
+        finally:
+            _request_id.reset(token)
+
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "hello world"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "app"
+        assert entry["request_id"] == "abc123"
+        assert entry["event"] == "request_timing"
+        assert entry["status"] == 200
+        assert "args" not in entry
+
+    @pytest.mark.backend
+    def test_exception(self):
+        """Test that tracebacks are included"""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("app", logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+        assert "ValueError: boom" in entry["exception"]
+
+
+class TestQueueHandler:
+    """Test the non-blocking queue handler"""
+
+    @pytest.mark.backend
+    def test_message_resolved_when_queued(self):
+        """Test that arguments mutated after logging do not change the message"""
+        log_queue = queue.Queue()
+        names = ["alice"]
+        original = make_record(args=(names,))
+        NonBlockingQueueHandler(log_queue).handle(original)
+        names.append("bob")
+
+        record = log_queue.get_nowait()
+        assert record.getMessage() == "hello ['alice']"
+        assert record.args is None
+        assert original.args == (names,)
+
+    @pytest.mark.backend
+    def test_listener_waits_for_start(self, capsys):
+        """Test that nothing is written until start_logging, then everything queued"""
+        root = logging.getLogger()
+        level, handlers = root.level, list(root.handlers)
+        try:
+            setup_logging("INFO", sampling="")
+            logging.getLogger("app").info("queued %s", 1)
+            assert logs._listener._thread is None
+
+            start_logging()
+            shutdown_logging()
+            lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+            assert [line["message"] for line in lines] == ["queued 1"]
+        finally:
+            shutdown_logging()
+            root.setLevel(level)
+            root.handlers[:] = handlers
+
+    @pytest.mark.backend
+    def test_full_queue_drops_and_counts(self):
+        """Test that a full queue drops records instead of blocking"""
+        handler = NonBlockingQueueHandler(queue.Queue(1))
+        before = LOG_RECORDS_DROPPED.labels("WARNING")._value.get()
+        for _ in range(3):
+            handler.handle(make_record(level=logging.WARNING))
+        assert LOG_RECORDS_DROPPED.labels("WARNING")._value.get() == before + 2
+
+
+class TestSampling:
+    """Test per-logger sampling"""
+
+    @pytest.mark.backend
+    def test_parse(self):
+        """Test LOG_SAMPLING parsing"""
+        assert parse_sampling("timing=0.01, uvicorn.access=2") == {
+            "timing": 0.01,
+            "uvicorn.access": 1.0,
+        }
+        assert parse_sampling("") == {}
+        with pytest.raises(ValueError):
+            parse_sampling("timing=often")
+
+    @pytest.mark.backend
+    def test_sampled_loggers(self):
+        """Test that only INFO and below of matching loggers are sampled"""
+        sampler = SamplingFilter({"timing": 0.0, "timing.keep": 1.0})
+        before = LOG_RECORDS_SAMPLED_OUT.labels("timing")._value.get()
+
+        assert not sampler.filter(make_record(name="timing"))
+        assert not sampler.filter(make_record(name="timing.child"))
+        assert sampler.filter(make_record(name="timing.keep"))
+        assert sampler.filter(make_record(name="timingx"))
+        assert sampler.filter(make_record(name="timing", level=logging.WARNING))
+        assert LOG_RECORDS_SAMPLED_OUT.labels("timing")._value.get() == before + 2
+
+
+class TestRequestIdMiddleware:
+    """Test request id assignment"""
+
+    def build_client(self):
+        app = FastAPI()
+
+        @app.get("/")
+        async def index():
+            return {"request_id": _request_id.get()}
+
+        app.add_middleware(RequestIdMiddleware)
+        return TestClient(app)
+
+    @pytest.mark.backend
+    def test_generated(self):
+        """Test that requests without an id get one, echoed in the response"""
+        response = self.build_client().get("/")
+        request_id = response.headers["X-Request-ID"]
+        assert len(request_id) == 32
+        assert response.json()["request_id"] == request_id
+
+    @pytest.mark.backend
+    def test_inbound_kept_or_replaced(self):
+        """Test that well-formed inbound ids are kept and others replaced"""
+        client = self.build_client()
+        response = client.get("/", headers={"X-Request-ID": "edge-42"})
+        assert response.headers["X-Request-ID"] == "edge-42"
+
+        response = client.get("/", headers={"X-Request-ID": "bad id with spaces"})
+        assert response.headers["X-Request-ID"] != "bad id with spaces"
+        assert _request_id.get() is None
@@ -0,0 +1,64 @@
+"""
+Tests for batch lookups by ID
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lookups import fetch_by_ids, parse_ids
+
+
+class TestParseIds:
+    """Test ?ids= parsing"""
+
+    @pytest.mark.backend
+    def test_dedupes_in_order(self):
+        """Test that repeated IDs are dropped and order is kept"""
+        first, second = ObjectId(), ObjectId()
+        assert parse_ids(f"{second}, {first},{second},") == [second, first]
+
+    @pytest.mark.backend
+    def test_invalid_id(self):
+        """Test that a malformed ID is rejected with 400"""
+        with pytest.raises(HTTPException) as exc_info:
+            parse_ids("not-an-id")
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.backend
+    def test_too_many_ids(self):
+        """Test that lookups are capped at MAX_LOOKUP_IDS"""
+        with patch("lookups.MAX_LOOKUP_IDS", 2):
+            with pytest.raises(HTTPException):
+                parse_ids(",".join(str(ObjectId()) for _ in range(3)))
+
+
+class TestFetchByIds:
+    """Test fetching documents by ID"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_keeps_requested_order_and_reports_missing(self):
+        """Test one $in query whose results follow the requested order"""
+        first, second, missing = ObjectId(), ObjectId(), ObjectId()
+        model = MagicMock()
+        collection = model.get_motor_collection.return_value
+        collection.find.return_value.__aiter__.return_value = [
+            {"_id": first, "title": "A"},
+            {"_id": second, "title": "B"},
+        ]
+
+        lookup = await fetch_by_ids(model, [second, missing, first], {"title": 1})
+
+        assert [item["_id"] for item in lookup.items] == [second, first]
+        assert lookup.missing == [missing]
+        collection.find.assert_called_once_with(
+            {"_id": {"$in": [second, missing, first]}}, {"title": 1}
+        )
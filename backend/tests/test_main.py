@@ -51,3 +51,10 @@ class TestMainApp:
         assert response.status_code == 200
         assert "openapi" in response.json()
 
+
+    @pytest.mark.backend
+    def test_metrics_endpoint(self, client):
+        """Test Prometheus metrics endpoint"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "password_hash_queue_depth" in response.text
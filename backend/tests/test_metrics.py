@@ -0,0 +1,106 @@
+"""
+Tests for per-route HTTP metrics and MongoDB command timings
+"""
+
+import pytest
+import sys
+import os
+from datetime import timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pymongo.monitoring import CommandFailedEvent, CommandStartedEvent, CommandSucceededEvent
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from metrics import CommandMetricsListener, command_collection, setup_metrics
+
+ADDRESS = ("mongo-test", 27017)
+
+
+def sample(name, **labels):
+    """Current value of a metric sample, or 0 if it was never recorded"""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def client():
+    """App with one parameterized route and the metrics middleware"""
+    app = FastAPI()
+    setup_metrics(app)
+
+    @app.get("/widgets/{widget_id}")
+    async def get_widget(widget_id: str):
+        return {"id": widget_id, "padding": "x" * 100}
+
+    return TestClient(app)
+
+
+class TestRequestMetrics:
+    """Test route-labelled HTTP metrics"""
+
+    @pytest.mark.backend
+    def test_labels_use_route_template(self, client):
+        """Test that requests for different IDs share one label set"""
+        labels = {"method": "GET", "route": "/widgets/{widget_id}"}
+        before = sample("http_requests_total", status="200", **labels)
+        client.get("/widgets/507f1f77bcf86cd799439011")
+        client.get("/widgets/507f1f77bcf86cd799439012")
+        assert sample("http_requests_total", status="200", **labels) == before + 2
+        assert sample("http_request_duration_seconds_count", **labels) >= 2
+        assert sample("http_response_size_bytes_sum", **labels) >= 200
+        assert sample("http_requests_in_progress", **labels) == 0
+
+    @pytest.mark.backend
+    def test_unknown_paths_share_a_label(self, client):
+        """Test that 404s for arbitrary paths do not create new series"""
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        before = sample("http_requests_total", **labels)
+        client.get("/no/such/path/1")
+        client.get("/no/such/path/2")
+        assert sample("http_requests_total", **labels) == before + 2
+
+    @pytest.mark.backend
+    def test_method_mismatch_uses_route(self, client):
+        """Test that a 405 is labelled with the route it almost matched"""
+        labels = {"method": "DELETE", "route": "/widgets/{widget_id}", "status": "405"}
+        before = sample("http_requests_total", **labels)
+        client.delete("/widgets/1")
+        assert sample("http_requests_total", **labels) == before + 1
+
+
+class TestCommandMetrics:
+    """Test the MongoDB command listener"""
+
+    @pytest.mark.backend
+    def test_command_collection(self):
+        """Test collection extraction for common command shapes"""
+        assert command_collection("find", {"find": "users", "filter": {}}) == "users"
+        assert command_collection("getMore", {"getMore": 123, "collection": "users"}) == "users"
+        assert command_collection("ping", {"ping": 1}) == ""
+
+    @pytest.mark.backend
+    def test_records_duration_by_command_and_collection(self):
+        """Test that succeeded and failed commands are timed"""
+        listener = CommandMetricsListener()
+        labels = {"command": "find", "collection": "metrics_test"}
+        before = sample("mongodb_command_duration_seconds_count", **labels)
+
+        listener.started(
+            CommandStartedEvent({"find": "metrics_test"}, "scottlms", 1, ADDRESS, 1)
+        )
+        listener.succeeded(
+            CommandSucceededEvent(timedelta(milliseconds=3), {"ok": 1}, "find", 1, ADDRESS, 1)
+        )
+        listener.started(
+            CommandStartedEvent({"find": "metrics_test"}, "scottlms", 2, ADDRESS, 2)
+        )
+        listener.failed(
+            CommandFailedEvent(timedelta(milliseconds=1), {"ok": 0}, "find", 2, ADDRESS, 2)
+        )
+
+        assert sample("mongodb_command_duration_seconds_count", **labels) == before + 2
+        assert sample("mongodb_command_failures_total", **labels) >= 1
+        assert listener._collections == {}
@@ -0,0 +1,167 @@
+"""
+Tests for keyset pagination helpers
+"""
+
+import pytest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    paginate,
+    sort_spec,
+    unique_sort,
+)
+
+
+def mock_document_model(documents, estimated=0, counted=0):
+    """Build a stand-in for a Beanie document class"""
+    model = MagicMock()
+    collection = model.get_motor_collection.return_value
+    query = collection.find.return_value.sort.return_value.limit.return_value
+    query.to_list = AsyncMock(return_value=documents)
+    collection.estimated_document_count = AsyncMock(return_value=estimated)
+    collection.count_documents = AsyncMock(return_value=counted)
+    return model
+
+
+class TestCursor:
+    """Test cursor encoding"""
+
+    @pytest.mark.backend
+    def test_cursor_round_trip(self):
+        """Test that a cursor decodes to the values it was built from"""
+        last_id = ObjectId()
+        created = datetime(2024, 1, 2, 3, 4, 5, 123000)
+        cursor = encode_cursor(created, last_id)
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == [created, last_id]
+
+    @pytest.mark.backend
+    def test_invalid_cursor(self):
+        """Test that malformed cursors are rejected with 400"""
+        with pytest.raises(HTTPException) as exc_info:
+            decode_cursor("not-a-cursor")
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.backend
+    def test_cursor_with_operators_rejected(self):
+        """Test that cursors carrying documents or arrays are rejected with 400"""
+        for sort_value in ({"$ne": None}, {"$regex": ".*"}, ["a", "b"]):
+            with pytest.raises(HTTPException) as exc_info:
+                decode_cursor(encode_cursor(sort_value, ObjectId()))
+            assert exc_info.value.status_code == 400
+        with pytest.raises(HTTPException):
+            decode_cursor(encode_cursor("draft", {"$gt": ""}))
+
+    @pytest.mark.backend
+    def test_keyset_filter_on_id(self):
+        """Test the filter for the default _id ordering"""
+        last_id = ObjectId()
+        cursor = encode_cursor(last_id, last_id)
+
+        assert keyset_filter(cursor) == {"_id": {"$gt": last_id}}
+        assert keyset_filter(cursor, descending=True) == {"_id": {"$lt": last_id}}
+
+    @pytest.mark.backend
+    def test_keyset_filter_with_tie_breaker(self):
+        """Test the filter for a custom sort key breaks ties on _id"""
+        last_id = ObjectId()
+        cursor = encode_cursor("draft", last_id)
+
+        assert keyset_filter(cursor, "status") == {
+            "$or": [
+                {"status": {"$gt": "draft"}},
+                {"status": "draft", "_id": {"$gt": last_id}},
+            ]
+        }
+
+    @pytest.mark.backend
+    def test_unique_sort_skips_tie_breaker(self):
+        """Test that fields with a unique index sort without the _id tiebreak"""
+        from entities.users import User
+
+        assert unique_sort(User, "email")
+        assert not unique_sort(User, "last_name")
+        assert sort_spec("email", unique=True) == [("email", 1)]
+        assert sort_spec("last_name", descending=True) == [("last_name", -1), ("_id", -1)]
+
+
+class TestPaginate:
+    """Test page fetching"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_cursor(self):
+        """Test that a short page returns no next cursor"""
+        documents = [{"_id": ObjectId()} for _ in range(2)]
+        model = mock_document_model(documents, estimated=2)
+
+        page = await paginate(model, limit=5)
+
+        assert page.items == documents
+        assert page.next_cursor is None
+        assert page.total == 2
+        collection = model.get_motor_collection.return_value
+        collection.find.return_value.sort.return_value.limit.assert_called_once_with(6)
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_full_page_has_cursor(self):
+        """Test that an extra document produces a cursor after the last item"""
+        documents = [{"_id": ObjectId()} for _ in range(3)]
+        model = mock_document_model(documents, estimated=10)
+
+        page = await paginate(model, limit=2)
+
+        assert len(page.items) == 2
+        assert decode_cursor(page.next_cursor) == [documents[1]["_id"]] * 2
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_filtered_count_is_exact(self):
+        """Test that filtered queries count matches instead of estimating"""
+        model = mock_document_model([], estimated=100, counted=3)
+        filters = {"role": "student"}
+
+        page = await paginate(model, filters)
+
+        assert page.total == 3
+        collection = model.get_motor_collection.return_value
+        collection.count_documents.assert_awaited_once_with(filters)
+        collection.estimated_document_count.assert_not_called()
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_stages_run_after_paging(self):
+        """Test that extra aggregation stages only see the page's documents"""
+        documents = [{"_id": ObjectId(), "progress": 10.0}]
+        model = mock_document_model([], counted=1)
+        collection = model.get_motor_collection.return_value
+        collection.aggregate.return_value.to_list = AsyncMock(return_value=documents)
+        lookup = {"$lookup": {"from": "users", "as": "user"}}
+
+        page = await paginate(
+            model, {"status": "active"}, limit=5, sort_field="progress", stages=[lookup]
+        )
+
+        assert page.items == documents
+        pipeline = collection.aggregate.call_args.args[0]
+        assert pipeline == [
+            {"$match": {"status": "active"}},
+            {"$sort": {"progress": 1, "_id": 1}},
+            {"$limit": 6},
+            lookup,
+        ]
+        collection.find.assert_not_called()
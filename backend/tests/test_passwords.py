@@ -0,0 +1,62 @@
+"""
+Tests for the password hashing pool
+"""
+
+import asyncio
+import threading
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+import bcrypt
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from passwords import HashingPoolFull, PasswordHasher, hash_password
+
+
+class TestPasswords:
+    """Test password hashing"""
+
+    @pytest.mark.backend
+    def test_hash_password_verifies(self):
+        """Test that hashes verify against the original password"""
+        hashed = hash_password("Sup3r-Secret!")
+        assert hashed.startswith("$2b$12$")
+        assert bcrypt.checkpw(b"Sup3r-Secret!", hashed.encode("utf-8"))
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_hash_runs_off_event_loop(self):
+        """Test that hashing happens on a worker thread"""
+        hasher = PasswordHasher(workers=1, queue_size=1)
+        with patch("passwords.hash_password", side_effect=lambda p: threading.current_thread().name):
+            thread_name = await hasher.hash("password")
+        hasher.shutdown()
+
+        assert thread_name.startswith("password-hash")
+        assert hasher.pending == 0
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_full_queue_fails_fast(self):
+        """Test that hashes beyond workers + queue size are rejected"""
+        hasher = PasswordHasher(workers=1, queue_size=1)
+        release = threading.Event()
+
+        def blocking_hash(password):
+            release.wait(5)
+            return password
+
+        with patch("passwords.hash_password", side_effect=blocking_hash):
+            running = [asyncio.create_task(hasher.hash(str(i))) for i in range(2)]
+            await asyncio.sleep(0)
+
+            with pytest.raises(HashingPoolFull):
+                await hasher.hash("overflow")
+
+            release.set()
+            assert await asyncio.gather(*running) == ["0", "1"]
+        hasher.shutdown()
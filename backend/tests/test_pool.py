@@ -0,0 +1,103 @@
+"""
+Tests for connection pool settings, warmup and metrics
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+from prometheus_client import REGISTRY
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCheckOutFailedEvent,
+    ConnectionCheckOutStartedEvent,
+    ConnectionClosedEvent,
+    ConnectionCreatedEvent,
+)
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pool import PoolMetricsListener, pool_options, warm_pool
+
+ADDRESS = ("mongo-test", 27017)
+
+
+def sample(name, **labels):
+    """Current value of a metric sample, or 0 if it was never recorded"""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestPoolMetricsListener:
+    """Test that CMAP events are exported"""
+
+    @pytest.mark.backend
+    def test_tracks_open_and_in_use_connections(self):
+        """Test connection gauges follow create, checkout, checkin and close"""
+        listener = PoolMetricsListener()
+        labels = {"address": "mongo-test:27017"}
+        waits = sample("mongodb_pool_checkout_wait_seconds_count")
+
+        listener.connection_created(ConnectionCreatedEvent(ADDRESS, 1))
+        listener.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+        assert sample("mongodb_pool_waiting", **labels) == 1
+        listener.connection_checked_out(ConnectionCheckedOutEvent(ADDRESS, 1, 0.02))
+        assert sample("mongodb_pool_waiting", **labels) == 0
+        assert sample("mongodb_pool_connections", **labels) == 1
+        assert sample("mongodb_pool_connections_in_use", **labels) == 1
+        assert sample("mongodb_pool_checkout_wait_seconds_count") == waits + 1
+        assert listener.open_connections() == 1
+
+        listener.connection_checked_in(ConnectionCheckedInEvent(ADDRESS, 1))
+        listener.connection_closed(ConnectionClosedEvent(ADDRESS, 1, "idle"))
+        assert sample("mongodb_pool_connections_in_use", **labels) == 0
+        assert sample("mongodb_pool_connections", **labels) == 0
+        assert listener.open_connections() == 0
+
+    @pytest.mark.backend
+    def test_counts_checkout_timeouts(self):
+        """Test that failed checkouts are counted by reason"""
+        listener = PoolMetricsListener()
+        before = sample("mongodb_pool_checkout_failures_total", reason="timeout")
+        listener.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+        listener.connection_check_out_failed(
+            ConnectionCheckOutFailedEvent(ADDRESS, "timeout", 2.0)
+        )
+        assert sample("mongodb_pool_checkout_failures_total", reason="timeout") == before + 1
+        assert sample("mongodb_pool_waiting", address="mongo-test:27017") == 0
+
+
+class TestPoolSettings:
+    """Test client options and warmup"""
+
+    @pytest.mark.backend
+    def test_pool_options(self):
+        """Test that the settings map to driver options"""
+        options = pool_options()
+        assert options["maxPoolSize"] >= options["minPoolSize"]
+        assert options["waitQueueTimeoutMS"] > 0
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_warm_pool_waits_for_target(self):
+        """Test that warmup pings in parallel and returns once the pool is full"""
+        listener = PoolMetricsListener()
+        client = MagicMock()
+
+        async def ping(command):
+            listener.connection_created(ConnectionCreatedEvent(ADDRESS, 1))
+
+        client.admin.command = AsyncMock(side_effect=ping)
+        assert await warm_pool(client, target=3, timeout=1, listener=listener) == 3
+        assert client.admin.command.await_count == 3
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_warm_pool_gives_up_after_timeout(self):
+        """Test that startup continues with a partly warmed pool"""
+        listener = PoolMetricsListener()
+        client = MagicMock()
+        client.admin.command = AsyncMock()
+        assert await warm_pool(client, target=2, timeout=0.1, listener=listener) == 0
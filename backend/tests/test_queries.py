@@ -0,0 +1,63 @@
+"""
+Tests for list query parameter helpers
+"""
+
+import pytest
+import sys
+import os
+
+from fastapi import HTTPException
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from queries import combine_filters, parse_sort, range_filter, search_filter
+
+
+class TestQueries:
+    """Test query translation helpers"""
+
+    @pytest.mark.backend
+    def test_parse_sort(self):
+        """Test sort parsing with and without direction prefix"""
+        allowed = ("title", "created_at")
+        assert parse_sort(None, allowed) == ("_id", False)
+        assert parse_sort("title", allowed) == ("title", False)
+        assert parse_sort("-created_at", allowed) == ("created_at", True)
+
+    @pytest.mark.backend
+    def test_parse_sort_rejects_unknown_field(self):
+        """Test that unsortable fields are a client error"""
+        with pytest.raises(HTTPException) as exc_info:
+            parse_sort("hashed_password", ("email",))
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.backend
+    def test_search_filter_escapes_regex(self):
+        """Test that search terms are matched literally"""
+        result = search_filter("a.b", ("title", "description"))
+        assert result == {
+            "$or": [
+                {"title": {"$regex": r"a\.b", "$options": "i"}},
+                {"description": {"$regex": r"a\.b", "$options": "i"}},
+            ]
+        }
+        assert search_filter("", ("title",)) == {}
+
+    @pytest.mark.backend
+    def test_range_filter(self):
+        """Test inclusive ranges with open bounds"""
+        assert range_filter("progress", 25, 50) == {
+            "progress": {"$gte": 25, "$lte": 50}
+        }
+        assert range_filter("progress", maximum=10) == {"progress": {"$lte": 10}}
+        assert range_filter("progress") == {}
+        with pytest.raises(HTTPException):
+            range_filter("progress", 60, 40)
+
+    @pytest.mark.backend
+    def test_combine_filters(self):
+        """Test that empty filters are dropped"""
+        assert combine_filters({}, {}) == {}
+        assert combine_filters({"role": "student"}, {}) == {"role": "student"}
+        assert combine_filters({"a": 1}, {"b": 2}) == {"$and": [{"a": 1}, {"b": 2}]}
@@ -0,0 +1,231 @@
+"""
+Tests for the shared rate limiting engine and the route limiter
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from limiter import Limiter, RateLimitExceeded, client_address, rows_cost, setup_rate_limiting
+from ratelimit import MemoryStorage, MongoStorage, Rate, RateLimiter
+
+
+class FakeClock:
+    """Controllable time source"""
+
+    def __init__(self, now=6000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestRate:
+    """Test limit string parsing"""
+
+    @pytest.mark.backend
+    def test_parse(self):
+        """Test the forms used by RateLimit"""
+        assert Rate.parse("200/minute").amount == 200
+        assert Rate.parse("200/minute").period == 60
+        assert Rate.parse("10 per 5 seconds").period == 5
+        with pytest.raises(ValueError):
+            Rate.parse("lots")
+
+
+class TestRateLimiter:
+    """Test sliding window decisions"""
+
+    @pytest.mark.backend
+    def test_denies_past_limit(self):
+        """Test that the limit is enforced within one window"""
+        limiter = RateLimiter(clock=FakeClock())
+        rate = Rate.parse("3/minute")
+        results = [limiter.hit("client", rate) for _ in range(4)]
+        assert [result.allowed for result in results] == [True, True, True, False]
+        assert results[2].remaining == 0
+        assert results[3].retry_after > 0
+
+    @pytest.mark.backend
+    def test_previous_window_is_weighted(self):
+        """Test that hits from the previous window count by their overlap"""
+        clock = FakeClock(6000.0)
+        limiter = RateLimiter(clock=clock)
+        rate = Rate.parse("4/minute")
+        for _ in range(4):
+            limiter.hit("client", rate)
+        # Halfway through the next window half of the previous hits remain
+        clock.now = 6090.0
+        assert limiter.hit("client", rate).allowed
+        assert limiter.hit("client", rate).allowed
+        assert not limiter.hit("client", rate).allowed
+
+    @pytest.mark.backend
+    def test_keys_are_independent(self):
+        """Test that one client's hits do not count against another"""
+        limiter = RateLimiter(clock=FakeClock())
+        rate = Rate.parse("1/minute")
+        assert limiter.hit("a", rate).allowed
+        assert limiter.hit("b", rate).allowed
+        assert not limiter.hit("a", rate).allowed
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_replicas_share_counts_after_sync(self):
+        """Test that hits on one replica count on another once both have synced"""
+        clock = FakeClock()
+        storage = MemoryStorage(clock)
+        first = RateLimiter(storage, clock=clock)
+        second = RateLimiter(storage, clock=clock)
+        rate = Rate.parse("2/minute")
+        assert first.hit("client", rate).allowed
+        assert first.hit("client", rate).allowed
+        await first.sync()
+        assert second.hit("client", rate).allowed
+        await second.sync()
+        assert not second.hit("client", rate).allowed
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_expired_buckets_are_dropped(self):
+        """Test that state for idle keys is released"""
+        clock = FakeClock()
+        limiter = RateLimiter(clock=clock)
+        limiter.hit("client", Rate.parse("1/minute"))
+        clock.now += 180
+        await limiter.sync()
+        assert not limiter._pending and not limiter._expiries
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_local_limiter_releases_idle_keys(self):
+        """Test that a limiter without storage still drops expired buckets"""
+        clock = FakeClock()
+        limiter = RateLimiter(sync_interval=0.01, clock=clock)
+        await limiter.start()
+        try:
+            limiter.hit("client", Rate.parse("1/minute"))
+            assert limiter._expiries
+            clock.now += 180
+            await asyncio.sleep(0.05)
+            assert not limiter._pending and not limiter._expiries
+        finally:
+            await limiter.stop()
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_mongo_storage_increments_buckets(self):
+        """Test that pending hits are pushed with one unordered bulk $inc"""
+        collection = MagicMock()
+        collection.bulk_write = AsyncMock()
+        collection.find.return_value.__aiter__.return_value = [
+            {"_id": "bucket", "count": 7}
+        ]
+        storage = MongoStorage()
+        with patch("ratelimit.get_database") as mock_database:
+            mock_database.return_value.__getitem__.return_value = collection
+            totals = await storage.exchange({"bucket": 3}, {"bucket": 6120.0})
+
+        assert totals == {"bucket": 7}
+        operation = collection.bulk_write.await_args[0][0][0]
+        assert operation._doc["$inc"] == {"count": 3}
+        assert operation._upsert is True
+
+
+class TestLimiter:
+    """Test the endpoint decorator and client keying"""
+
+    @pytest.mark.backend
+    def test_limit_returns_429(self):
+        """Test that requests over the limit get 429 with Retry-After"""
+        app = FastAPI()
+        setup_rate_limiting(app)
+        route_limiter = Limiter(RateLimiter())
+
+        @app.get("/limited")
+        @route_limiter.limit("2/minute")
+        async def limited(request: Request):
+            return {"ok": True}
+
+        client = TestClient(app)
+        statuses = [client.get("/limited").status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        response = client.get("/limited")
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.json() == {"error": "Rate limit exceeded: 2/minute"}
+        assert response.headers["RateLimit-Remaining"] == "0"
+        assert response.headers["RateLimit-Policy"] == "2;w=60"
+
+    @pytest.mark.backend
+    def test_cost_spends_budget(self):
+        """Test that expensive requests exhaust the shared budget sooner"""
+        app = FastAPI()
+        setup_rate_limiting(app)
+        route_limiter = Limiter(RateLimiter(), budget="10/minute")
+
+        @app.get("/cheap")
+        @route_limiter.limit("100/minute")
+        async def cheap(request: Request):
+            return {"ok": True}
+
+        @app.get("/expensive")
+        @route_limiter.limit("100/minute", cost=lambda arguments: arguments["size"])
+        async def expensive(request: Request, size: int = 1):
+            return {"ok": True}
+
+        client = TestClient(app)
+        response = client.get("/cheap")
+        assert response.headers["RateLimit-Limit"] == "10"
+        assert response.headers["RateLimit-Remaining"] == "9"
+        assert client.get("/expensive", params={"size": 8}).status_code == 200
+        assert client.get("/expensive", params={"size": 2}).status_code == 429
+        response = client.get("/cheap")
+        assert response.status_code == 200
+        assert response.headers["RateLimit-Remaining"] == "0"
+        assert client.get("/cheap").status_code == 429
+
+    @pytest.mark.backend
+    def test_refused_request_uses_no_quota(self):
+        """Test that a request refused by the budget does not count against its route"""
+        engine = RateLimiter(clock=FakeClock())
+        route_limiter = Limiter(engine, budget="3/minute")
+        request = MagicMock()
+        request.client.host = "10.0.0.1"
+        route = Rate.parse("2/minute")
+
+        route_limiter.check(request, "route", route, cost=3)
+        with pytest.raises(RateLimitExceeded):
+            route_limiter.check(request, "route", route, cost=1)
+
+        # Only the first request counted, so the route still has room for one more
+        assert engine.hit("route:10.0.0.1", route).allowed
+
+    @pytest.mark.backend
+    def test_rows_cost(self):
+        """Test that list requests pay per rows asked for"""
+        assert rows_cost({"request": None}) == 1
+        assert rows_cost({"params": MagicMock(limit=50), "ids": None}) == 1
+        assert rows_cost({"params": MagicMock(limit=1000), "ids": None}) == 11
+        ids = ",".join(["507f1f77bcf86cd799439011"] * 250)
+        assert rows_cost({"params": MagicMock(limit=50), "ids": ids}) == 3
+        assert rows_cost({"lookup_data": MagicMock(ids=["a"] * 100)}) == 2
+
+    @pytest.mark.backend
+    def test_forwarded_client(self):
+        """Test that the client is read from the right of X-Forwarded-For"""
+        request = MagicMock()
+        request.client.host = "10.0.0.5"
+        request.headers = {"x-forwarded-for": "1.1.1.1, 203.0.113.9"}
+        assert client_address(request) == "10.0.0.5"
+        with patch("limiter.RATE_LIMIT_PROXY_HOPS", 1):
+            assert client_address(request) == "203.0.113.9"
+            request.headers = {}
+            assert client_address(request) == "10.0.0.5"
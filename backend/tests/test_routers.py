@@ -2,10 +2,11 @@
 Tests for API routers - Basic endpoint testing
 """
 
+import json
 import pytest
 import sys
 import os
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 
 # Add backend to path for testing
@@ -109,3 +110,450 @@ class TestEnrollmentRouter:
         response = client.post("/api/enrollments/", json=invalid_enrollment_data)
         # Should return validation error or 500 (both are acceptable for this test)
         assert response.status_code in [400, 422, 500]
+
+
+class TestPagination:
+    """Test pagination parameters on list endpoints"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.mark.backend
+    def test_limit_is_bounded(self, client):
+        """Test that page sizes above the maximum are rejected"""
+        response = client.get("/api/enrollments/", params={"limit": 100000})
+        assert response.status_code == 422
+
+    @pytest.mark.backend
+    def test_invalid_cursor(self, client):
+        """Test that a malformed cursor is a client error"""
+        response = client.get("/api/courses/", params={"after": "bogus"})
+        assert response.status_code == 400
+
+    @pytest.mark.backend
+    def test_unknown_sort_field(self, client):
+        """Test that sorting by an unsupported field is rejected"""
+        response = client.get("/api/users/", params={"sort": "-hashed_password"})
+        assert response.status_code == 400
+
+    @pytest.mark.backend
+    def test_invalid_filter_value(self, client):
+        """Test that filter values are validated against the entity enums"""
+        response = client.get("/api/enrollments/", params={"status": "paused"})
+        assert response.status_code == 422
+
+    @pytest.mark.backend
+    def test_large_limit_requires_streaming(self, client):
+        """Test that only streamed responses may exceed MAX_PAGE_SIZE"""
+        response = client.get("/api/users/", params={"limit": 5000})
+        assert response.status_code == 422
+
+
+class TestUserCreationBackpressure:
+    """Test user creation when the hashing pool is saturated"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.mark.backend
+    def test_full_hash_queue_returns_503(self, client):
+        """Test that a full hash queue fails fast with Retry-After"""
+        from passwords import HashingPoolFull
+
+        user_data = {
+            "email": "new@example.com",
+            "username": "newuser",
+            "first_name": "New",
+            "last_name": "User",
+            "role": "student",
+            "password": "Sup3r-Secret!",
+        }
+        with patch('routers.users.password_hasher.hash', new=AsyncMock(side_effect=HashingPoolFull())):
+            response = client.post("/api/users/", json=user_data)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+
+
+class TestUniqueConstraints:
+    """Test that unique index violations map to 400 responses"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.fixture
+    def enrollment_data(self):
+        """Enrollment payload with valid ObjectIds"""
+        return {
+            "user_id": "507f1f77bcf86cd799439011",
+            "course_id": "507f1f77bcf86cd799439012",
+        }
+
+    def mock_collections(self, user_count=1, course_matched=1):
+        """Mock the user and course collections used by create_enrollment"""
+        users = MagicMock()
+        users.count_documents = AsyncMock(return_value=user_count)
+        courses = MagicMock()
+        courses.update_one = AsyncMock(return_value=MagicMock(matched_count=course_matched))
+        return users, courses
+
+    @pytest.mark.backend
+    def test_duplicate_username_returns_400(self, client):
+        """Test that a duplicate username is reported by field"""
+        from pymongo.errors import DuplicateKeyError
+
+        user_data = {
+            "email": "new@example.com",
+            "username": "taken",
+            "first_name": "New",
+            "last_name": "User",
+            "role": "student",
+            "password": "Sup3r-Secret!",
+        }
+        error = DuplicateKeyError("E11000", 11000, {"keyPattern": {"username": 1}})
+        mock_user = MagicMock()
+        mock_user.return_value.insert = AsyncMock(side_effect=error)
+        with patch('routers.users.User', mock_user), \
+                patch('routers.users.password_hasher.hash', new=AsyncMock(return_value="hashed")):
+            response = client.post("/api/users/", json=user_data)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "User with this username already exists"
+
+    @pytest.mark.backend
+    def test_duplicate_enrollment_returns_400_and_releases_count(self, client, enrollment_data):
+        """Test that a repeat enrollment undoes its enrollment_count increment"""
+        from pymongo.errors import DuplicateKeyError
+
+        users, courses = self.mock_collections()
+        mock_enrollment = MagicMock()
+        mock_enrollment.return_value.insert = AsyncMock(
+            side_effect=DuplicateKeyError("E11000", 11000)
+        )
+        with patch('routers.enrollments.User.get_motor_collection', return_value=users), \
+                patch('routers.enrollments.Course.get_motor_collection', return_value=courses), \
+                patch('routers.enrollments.Enrollment', mock_enrollment):
+            response = client.post("/api/enrollments/", json=enrollment_data)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "User is already enrolled in this course"
+        increments = [call.args[1]["$inc"]["enrollment_count"] for call in courses.update_one.call_args_list]
+        assert increments == [1, -1]
+
+    @pytest.mark.backend
+    def test_enrollment_for_missing_course_returns_400(self, client, enrollment_data):
+        """Test that an unmatched course update is reported as a missing course"""
+        users, courses = self.mock_collections(course_matched=0)
+        with patch('routers.enrollments.User.get_motor_collection', return_value=users), \
+                patch('routers.enrollments.Course.get_motor_collection', return_value=courses):
+            response = client.post("/api/enrollments/", json=enrollment_data)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Course not found"
+        courses.update_one.assert_awaited_once()
+
+
+class TestBulkEnrollment:
+    """Test bulk enrollment creation"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.mark.backend
+    def test_bulk_enrollment_reports_each_item(self, client):
+        """Test per-item results and one aggregated $inc per course"""
+        from bson import ObjectId
+        from pymongo.errors import BulkWriteError
+
+        user, other_user, missing_user = ObjectId(), ObjectId(), ObjectId()
+        course = ObjectId()
+        items = [
+            {"user_id": str(user), "course_id": str(course)},
+            {"user_id": str(user)},
+            {"user_id": str(user), "course_id": str(course)},
+            {"user_id": str(missing_user), "course_id": str(course)},
+            {"user_id": str(other_user), "course_id": str(course)},
+        ]
+        body = "\n".join(json.dumps(item) for item in items)
+
+        users = MagicMock()
+        users.find.return_value.__aiter__.return_value = [{"_id": user}, {"_id": other_user}]
+        courses = MagicMock()
+        courses.find.return_value.__aiter__.return_value = [{"_id": course}]
+        courses.bulk_write = AsyncMock()
+        # The second insert collides with an existing enrollment
+        insert_error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}]})
+
+        with patch('routers.enrollments.User.get_motor_collection', return_value=users), \
+                patch('routers.enrollments.Course.get_motor_collection', return_value=courses), \
+                patch('routers.enrollments.Enrollment.get_motor_collection'), \
+                patch('routers.enrollments.Enrollment.insert_many', new=AsyncMock(side_effect=insert_error)):
+            response = client.post(
+                "/api/enrollments/bulk",
+                content=body,
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["created"] == 1
+        assert summary["failed"] == 4
+        details = [result["detail"] for result in summary["results"]]
+        assert summary["results"][0]["created"] is True
+        assert details[1].startswith("course_id")
+        assert details[2:] == [
+            "Duplicate of an earlier item",
+            "User not found",
+            "User is already enrolled in this course",
+        ]
+        updates = courses.bulk_write.call_args.args[0]
+        assert [update._doc for update in updates] == [{"$inc": {"enrollment_count": 1}}]
+
+    @pytest.mark.backend
+    def test_bulk_enrollment_rejects_malformed_body(self, client):
+        """Test that a body that is not a JSON array is rejected"""
+        response = client.post("/api/enrollments/bulk", content='{"user_id": "x"}')
+        assert response.status_code == 400
+
+
+class TestUserImport:
+    """Test the user import endpoint"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.mark.backend
+    def test_import_requires_csv_or_ndjson(self, client):
+        """Test that other upload types are rejected"""
+        response = client.post(
+            "/api/users/import", content="[]", headers={"Content-Type": "application/json"}
+        )
+        assert response.status_code == 415
+
+    @pytest.mark.backend
+    def test_import_returns_job(self, client):
+        """Test that an upload is accepted as a job whose progress can be polled"""
+        csv_body = "email,username,first_name,last_name,role,password\n" \
+            "a@example.com,alice,Alice,Smith,student,Sup3r-Secret!\n"
+        user_import = MagicMock()
+        user_import.return_value.run = AsyncMock()
+        with patch('routers.users.UserImport', user_import):
+            response = client.post(
+                "/api/users/import", content=csv_body, headers={"Content-Type": "text/csv"}
+            )
+
+        assert response.status_code == 202
+        job = response.json()
+        assert job["kind"] == "user_import"
+        assert job["total"] == 1
+        assert response.headers["Location"] == f"/api/jobs/{job['id']}"
+
+        status_response = client.get(response.headers["Location"])
+        assert status_response.status_code == 200
+        assert status_response.json()["id"] == job["id"]
+
+    @pytest.mark.backend
+    def test_unknown_job_returns_404(self, client):
+        """Test polling a job that does not exist"""
+        response = client.get("/api/jobs/unknown")
+        assert response.status_code == 404
+
+
+class TestLookups:
+    """Test multi-get endpoints"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    def mock_courses(self, documents):
+        """Mock the course collection returning documents for any $in query"""
+        courses = MagicMock()
+        courses.find.return_value.__aiter__.return_value = documents
+        return courses
+
+    @pytest.mark.backend
+    def test_get_by_ids(self, client):
+        """Test ?ids= returns found documents in order with missing IDs in a header"""
+        from bson import ObjectId
+
+        found, missing = ObjectId(), ObjectId()
+        courses = self.mock_courses([{"_id": found, "title": "Algebra"}])
+        with patch('routers.courses.Course.get_motor_collection', return_value=courses):
+            response = client.get(f"/api/courses/?ids={missing},{found}")
+
+        assert response.status_code == 200
+        assert [course["id"] for course in response.json()] == [str(found)]
+        assert response.headers["X-Missing-Ids"] == str(missing)
+        assert response.headers["X-Missing-Count"] == "1"
+
+    @pytest.mark.backend
+    def test_missing_ids_header_is_capped(self, client):
+        """Test that a long list of missing IDs is truncated in the header but counted"""
+        from bson import ObjectId
+
+        ids = [ObjectId() for _ in range(5)]
+        courses = self.mock_courses([])
+        with patch('routers.courses.Course.get_motor_collection', return_value=courses), \
+                patch('lookups.MAX_MISSING_IDS_HEADER', 2):
+            response = client.get(f"/api/courses/?ids={','.join(map(str, ids))}")
+
+        assert response.headers["X-Missing-Ids"] == f"{ids[0]},{ids[1]}"
+        assert response.headers["X-Missing-Count"] == "5"
+
+    @pytest.mark.backend
+    def test_post_lookup(self, client):
+        """Test the POST variant reports missing IDs in the body"""
+        from bson import ObjectId
+
+        found, missing = ObjectId(), ObjectId()
+        courses = self.mock_courses([{"_id": found, "title": "Algebra"}])
+        with patch('routers.courses.Course.get_motor_collection', return_value=courses):
+            response = client.post(
+                "/api/courses/lookup", json={"ids": [str(found), str(missing)]}
+            )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [course["title"] for course in body["items"]] == ["Algebra"]
+        assert body["missing"] == [str(missing)]
+
+    @pytest.mark.backend
+    def test_invalid_ids(self, client):
+        """Test that malformed IDs are rejected"""
+        response = client.get("/api/users/?ids=abc")
+        assert response.status_code == 400
+
+
+class TestConditionalGet:
+    """Test ETag revalidation of GET responses"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.mark.backend
+    def test_matching_etag_returns_304(self, client):
+        """Test that an unchanged course is revalidated without a body"""
+        from bson import ObjectId
+
+        course_id = ObjectId()
+        courses = MagicMock()
+        courses.find.return_value.__aiter__.return_value = [
+            {"_id": course_id, "title": "Algebra"}
+        ]
+        with patch('routers.courses.Course.get_motor_collection', return_value=courses):
+            first = client.get(f"/api/courses/{course_id}")
+            second = client.get(
+                f"/api/courses/{course_id}",
+                headers={"If-None-Match": first.headers["ETag"]},
+            )
+
+        assert first.status_code == 200
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["ETag"] == first.headers["ETag"]
+
+    @pytest.mark.backend
+    def test_stale_etag_returns_body(self, client):
+        """Test that a changed list is sent in full with its new ETag"""
+        users = MagicMock()
+        query = users.find.return_value.sort.return_value.limit.return_value
+        query.to_list = AsyncMock(return_value=[])
+        users.estimated_document_count = AsyncMock(return_value=0)
+        with patch('routers.users.User.get_motor_collection', return_value=users):
+            response = client.get("/api/users/", headers={"If-None-Match": '"stale"'})
+
+        assert response.status_code == 200
+        assert response.json() == []
+        assert response.headers["ETag"] != '"stale"'
+        assert response.headers["X-Total-Count"] == "0"
+
+
+class TestEnrichedEnrollments:
+    """Test the enriched enrollment list"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.mark.backend
+    def test_enriched_enrollments(self, client):
+        """Test that joined summaries are returned and missing joins are null"""
+        from bson import ObjectId
+
+        joined = {
+            "_id": ObjectId(),
+            "user_id": ObjectId(),
+            "course_id": ObjectId(),
+            "status": "active",
+            "progress": 50.0,
+            "enrolled_at": "2024-01-01T00:00:00",
+            "user": {"first_name": "Ada", "last_name": "Lovelace", "email": "ada@example.com"},
+            "course": {"title": "Algebra", "status": "published"},
+        }
+        orphan = {**joined, "_id": ObjectId()}
+        del orphan["user"], orphan["course"]
+
+        enrollments = MagicMock()
+        enrollments.aggregate.return_value.to_list = AsyncMock(return_value=[joined, orphan])
+        enrollments.count_documents = AsyncMock(return_value=2)
+        with patch('routers.enrollments.Enrollment.get_motor_collection', return_value=enrollments):
+            response = client.get("/api/enrollments/enriched?status=active")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body[0]["user"]["first_name"] == "Ada"
+        assert body[0]["course"]["title"] == "Algebra"
+        assert body[1]["user"] is None and body[1]["course"] is None
+        assert response.headers["X-Total-Count"] == "2"
+        pipeline = enrollments.aggregate.call_args.args[0]
+        assert [list(stage)[0] for stage in pipeline] == [
+            "$match", "$sort", "$limit", "$lookup", "$lookup", "$project"
+        ]
+
+
+class TestCascadeDeletes:
+    """Test that deletes return a cleanup job"""
+
+    @pytest.fixture
+    def client(self):
+        """Create test client with mocked database"""
+        with patch('main.init_db'):
+            return TestClient(app)
+
+    @pytest.mark.backend
+    def test_delete_course_returns_job(self, client):
+        """Test that deleting a course answers 202 with the cascade job"""
+        course = MagicMock(title="Algebra")
+        course.delete = AsyncMock()
+        with patch('routers.courses.Course.get', new=AsyncMock(return_value=course)), \
+                patch('routers.courses.delete_course_enrollments', new=AsyncMock()):
+            response = client.delete("/api/courses/507f1f77bcf86cd799439011")
+
+        assert response.status_code == 202
+        assert response.json()["kind"] == "course_delete"
+        assert response.headers["Location"] == f"/api/jobs/{response.json()['id']}"
+        course.delete.assert_awaited_once()
@@ -0,0 +1,83 @@
+"""
+Tests for the fast response serializers
+"""
+
+import json
+import pytest
+import sys
+import os
+from datetime import datetime
+
+from bson import ObjectId
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from entities.courses import CourseResponse
+from entities.users import UserResponse
+from serializers import course_serializer, user_serializer
+
+
+def raw_user():
+    """Build a user document as stored in MongoDB"""
+    return {
+        "_id": ObjectId(),
+        "email": "ada@example.com",
+        "username": "ada",
+        "first_name": "Ada",
+        "last_name": "Lovelace",
+        "role": "instructor",
+        "is_active": True,
+        "hashed_password": "$2b$12$secret",
+        "created_at": datetime(2024, 5, 1, 12, 30, 15, 250000),
+        "updated_at": datetime(2024, 5, 2, 8, 0, 0),
+    }
+
+
+class TestSerializers:
+    """Test document serialization"""
+
+    @pytest.mark.backend
+    def test_matches_response_model_json(self):
+        """Test that output is identical to the validated response model"""
+        document = raw_user()
+        expected = dict(document, id=document["_id"])
+        expected = json.loads(UserResponse(**expected).model_dump_json())
+
+        assert json.loads(user_serializer.dumps(document)) == expected
+
+    @pytest.mark.backend
+    def test_excludes_private_fields(self):
+        """Test that fields outside the response model are never emitted"""
+        payload = json.loads(user_serializer.dumps(raw_user()))
+
+        assert "hashed_password" not in payload
+        assert "_id" not in payload
+        assert "hashed_password" not in user_serializer.projection
+
+    @pytest.mark.backend
+    def test_fills_defaults_for_missing_fields(self):
+        """Test that older documents get the response model defaults"""
+        document = {
+            "_id": ObjectId(),
+            "title": "Intro",
+            "description": "Basics",
+            "instructor_id": ObjectId(),
+            "created_at": datetime(2024, 1, 1),
+            "updated_at": datetime(2024, 1, 1),
+            "enrollment_count": 0,
+        }
+        payload = json.loads(course_serializer.dumps(document))
+
+        assert payload["status"] == "draft"
+        assert payload["tags"] == []
+        assert payload["price"] == 0.0
+        CourseResponse(**payload)
+
+    @pytest.mark.backend
+    def test_list_response(self):
+        """Test that a list of documents becomes a JSON array response"""
+        response = user_serializer.response([raw_user(), raw_user()])
+
+        assert response.media_type == "application/json"
+        assert len(json.loads(response.body)) == 2
@@ -0,0 +1,207 @@
+"""
+Tests for the slow query log
+"""
+
+import asyncio
+import json
+import pytest
+import sys
+import os
+import threading
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+from pymongo.monitoring import CommandStartedEvent, CommandSucceededEvent
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from slowqueries import (
+    SlowQueryMonitor,
+    documents_returned,
+    plan_summary,
+    query_shape,
+    worst_queries,
+)
+
+ADDRESS = ("mongo-test", 27017)
+FIND = {
+    "find": "enrollments",
+    "filter": {"user_id": "507f1f77bcf86cd799439011", "status": {"$in": ["active", "completed"]}},
+    "sort": {"created_at": -1},
+    "lsid": {"id": "session"},
+    "$db": "scottlms",
+}
+REPLY = {"cursor": {"firstBatch": [{}, {}, {}], "id": 0}, "ok": 1}
+
+
+def run_command(monitor, request_id, milliseconds, command=FIND, reply=REPLY):
+    """Feed a command's started and succeeded events to the monitor"""
+    monitor.started(CommandStartedEvent(command, "scottlms", request_id, ADDRESS, request_id))
+    monitor.succeeded(
+        CommandSucceededEvent(
+            timedelta(milliseconds=milliseconds),
+            reply,
+            next(iter(command)),
+            request_id,
+            ADDRESS,
+            request_id,
+        )
+    )
+
+
+class TestQueryShape:
+    """Test filter redaction and reply parsing"""
+
+    @pytest.mark.backend
+    def test_values_are_redacted(self):
+        """Test that queries differing only in values share a shape"""
+        other = {**FIND, "filter": {"user_id": "x", "status": {"$in": ["dropped"]}}}
+        shape = json.loads(query_shape("find", FIND))
+        assert shape == {
+            "filter": {"status": {"$in": ["?"]}, "user_id": "?"},
+            "sort": {"created_at": -1},
+        }
+        assert query_shape("find", other) == query_shape("find", FIND)
+
+    @pytest.mark.backend
+    def test_aggregate_shape_keeps_stages(self):
+        """Test that pipelines are described by stage names and $match filters"""
+        command = {
+            "aggregate": "courses",
+            "pipeline": [{"$match": {"status": "published"}}, {"$count": "n"}],
+        }
+        assert json.loads(query_shape("aggregate", command)) == {
+            "filter": [{"$match": {"status": "?"}}, {"$count": {}}]
+        }
+
+    @pytest.mark.backend
+    def test_documents_returned(self):
+        """Test counts for cursors and writes"""
+        assert documents_returned("find", REPLY) == 3
+        assert documents_returned("update", {"n": 7, "ok": 1}) == 7
+        assert documents_returned("findAndModify", {"value": None, "ok": 1}) == 0
+
+    @pytest.mark.backend
+    def test_plan_summary(self):
+        """Test that only the winning plan decides the classification"""
+        explain = {
+            "queryPlanner": {
+                "winningPlan": {
+                    "stage": "FETCH",
+                    "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1"},
+                },
+                "rejectedPlans": [{"stage": "COLLSCAN"}],
+            }
+        }
+        assert plan_summary(explain) == ("IXSCAN", ["user_id_1"])
+        assert plan_summary({"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}) == (
+            "COLLSCAN",
+            [],
+        )
+
+
+class TestSlowQueryMonitor:
+    """Test slow command capture"""
+
+    @pytest.mark.backend
+    def test_fast_and_ignored_commands_are_skipped(self):
+        """Test that nothing is recorded below the threshold or for the log itself"""
+        monitor = SlowQueryMonitor(threshold_ms=50)
+        monitor._submit = MagicMock()
+        run_command(monitor, 1, 10)
+        run_command(monitor, 2, 500, command={"insert": "slow_queries", "documents": []})
+        run_command(monitor, 3, 500, command={"ping": 1}, reply={"ok": 1})
+        monitor._submit.assert_not_called()
+        assert monitor._started == {}
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_slow_command_is_explained_and_stored(self):
+        """Test that a slow command from a driver thread reaches the capped collection"""
+        monitor = SlowQueryMonitor(threshold_ms=50, explain_rate=1.0)
+        database = MagicMock()
+        database.create_collection = AsyncMock()
+        stored = asyncio.Event()
+        collection = MagicMock()
+        collection.insert_one = AsyncMock(side_effect=lambda record: stored.set())
+        database.__getitem__.return_value = collection
+        explain = AsyncMock(
+            return_value={"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}
+        )
+        database.client.__getitem__.return_value.command = explain
+
+        await monitor.start(database)
+        try:
+            thread = threading.Thread(target=run_command, args=(monitor, 1, 120))
+            thread.start()
+            thread.join()
+            await asyncio.wait_for(stored.wait(), 1)
+        finally:
+            await monitor.stop()
+
+        record = collection.insert_one.await_args[0][0]
+        assert record["collection"] == "enrollments"
+        assert record["docs_returned"] == 3
+        assert record["duration_ms"] == 120
+        assert record["plan"] == "COLLSCAN"
+        explained = explain.await_args[0][0]["explain"]
+        assert "lsid" not in explained and "$db" not in explained
+        assert explained["filter"] == FIND["filter"]
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_failed_explain_still_stores_record(self):
+        """Test that a command that cannot be explained is stored without a plan"""
+        monitor = SlowQueryMonitor(threshold_ms=50, explain_rate=1.0)
+        database = MagicMock()
+        database.create_collection = AsyncMock()
+        stored = asyncio.Event()
+        collection = MagicMock()
+        collection.insert_one = AsyncMock(side_effect=lambda record: stored.set())
+        database.__getitem__.return_value = collection
+        database.client.__getitem__.return_value.command = AsyncMock(
+            side_effect=Exception("Explain of multi-statement update not supported")
+        )
+
+        await monitor.start(database)
+        try:
+            run_command(monitor, 1, 120)
+            await asyncio.wait_for(stored.wait(), 1)
+        finally:
+            await monitor.stop()
+
+        record = collection.insert_one.await_args[0][0]
+        assert record["plan"] is None
+        assert record["indexes"] == []
+
+
+class TestWorstQueries:
+    """Test the admin report"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_groups_are_formatted(self):
+        """Test that aggregated groups come back flat with decoded shapes"""
+        group = {
+            "_id": {"collection": "enrollments", "command": "find", "shape": '{"filter": {}}'},
+            "count": 3,
+            "total_ms": 300.0,
+            "avg_ms": 100.0,
+            "max_ms": 150.0,
+            "max_docs_returned": 10,
+            "plans": [None, "COLLSCAN"],
+            "indexes": [[], []],
+            "last_seen": None,
+        }
+        cursor = MagicMock()
+        cursor.__aiter__.return_value = [group]
+        database = MagicMock()
+        database.__getitem__.return_value.aggregate.return_value = cursor
+
+        results = await worst_queries(database, limit=5)
+        assert results[0]["collection"] == "enrollments"
+        assert results[0]["shape"] == {"filter": {}}
+        assert results[0]["plans"] == ["COLLSCAN"]
+        pipeline = database.__getitem__.return_value.aggregate.call_args[0][0]
+        assert pipeline[-1] == {"$limit": 5}
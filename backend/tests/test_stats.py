@@ -0,0 +1,52 @@
+"""
+Tests for the aggregate stats endpoint
+"""
+
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from entities.users import UserRole
+from routers import stats
+
+
+def mock_document_model(total, per_value):
+    """Build a stand-in document class whose collection returns fixed counts"""
+    model = MagicMock()
+    collection = model.get_motor_collection.return_value
+    collection.estimated_document_count = AsyncMock(return_value=total)
+    collection.count_documents = AsyncMock(
+        side_effect=lambda query: per_value.get(next(iter(query.values())), 0)
+    )
+    return model
+
+
+class TestStats:
+    """Test stats aggregation and caching"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_count_by_covers_every_enum_value(self):
+        """Test that each enum value gets a count, including zero"""
+        model = mock_document_model(5, {"student": 4, "instructor": 1})
+
+        counts = await stats.count_by(model, "role", UserRole)
+
+        assert counts.total == 5
+        assert counts.breakdown == {"student": 4, "instructor": 1, "admin": 0}
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_stats_are_cached(self):
+        """Test that repeated calls within the TTL compute once"""
+        stats._cached_stats = None
+        sentinel = MagicMock()
+        with patch("routers.stats.compute_stats", new=AsyncMock(return_value=sentinel)) as compute:
+            assert await stats.get_cached_stats() is sentinel
+            assert await stats.get_cached_stats() is sentinel
+        compute.assert_awaited_once()
+        stats._cached_stats = None
@@ -0,0 +1,85 @@
+"""
+Tests for streamed list responses
+"""
+
+import json
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+from bson import ObjectId
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pagination import PageParams, decode_cursor
+from streaming import _chunks, stream_page
+
+
+async def aiter_items(items):
+    """Yield items from an async iterator"""
+    for item in items:
+        yield item
+
+
+async def collect(chunks):
+    """Join all chunks of a streamed body"""
+    return b"".join([chunk async for chunk in chunks])
+
+
+def encode(item):
+    """Encode a test item as JSON bytes"""
+    return json.dumps(item).encode("utf-8")
+
+
+class TestStreaming:
+    """Test streamed encoding"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_json_array(self):
+        """Test that streamed chunks form a valid JSON array"""
+        body = await collect(_chunks(aiter_items([{"a": 1}, {"a": 2}]), encode, False))
+        assert json.loads(body) == [{"a": 1}, {"a": 2}]
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_empty_json_array(self):
+        """Test that an empty stream is still valid JSON"""
+        body = await collect(_chunks(aiter_items([]), encode, False))
+        assert json.loads(body) == []
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_ndjson(self):
+        """Test that NDJSON streams one document per line"""
+        body = await collect(_chunks(aiter_items([{"a": 1}, {"a": 2}]), encode, True))
+        lines = body.decode("utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == [{"a": 1}, {"a": 2}]
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_stream_page_bounds_query_by_boundary(self):
+        """Test that a full page is bounded by its last document, not a limit"""
+        boundary_id = ObjectId()
+        model = MagicMock()
+        collection = model.get_motor_collection.return_value
+        raw_cursor = collection.find.return_value.sort.return_value
+        raw_cursor.skip.return_value.limit.return_value.to_list = AsyncMock(
+            return_value=[{"_id": boundary_id}, {"_id": ObjectId()}]
+        )
+        collection.estimated_document_count = AsyncMock(return_value=10)
+
+        params = PageParams(limit=5, after=None, stream=True, ndjson=True)
+        response = await stream_page(model, MagicMock(), {}, params)
+
+        assert response.media_type == "application/x-ndjson"
+        assert response.headers["X-Total-Count"] == "10"
+        assert decode_cursor(response.headers["X-Next-Cursor"]) == [
+            boundary_id,
+            boundary_id,
+        ]
+        query = collection.find.call_args.args[0]
+        assert query == {"$and": [{}, {"_id": {"$lte": boundary_id}}]}
+        raw_cursor.skip.assert_called_once_with(4)
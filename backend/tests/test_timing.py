@@ -0,0 +1,102 @@
+"""
+Tests for the Server-Timing breakdown
+"""
+
+import asyncio
+import contextvars
+import pytest
+import sys
+import os
+from datetime import timedelta
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from pymongo.monitoring import CommandSucceededEvent
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from timing import (
+    ServerTimingMiddleware,
+    TimedRoute,
+    database_timing_listener,
+    server_timing_header,
+    timed,
+)
+
+
+class Item(BaseModel):
+    name: str
+
+
+def build_app(enabled=True):
+    """App with one timed router, feeding every phase"""
+    app = FastAPI()
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.post("/items")
+    async def create_item(item: Item):
+        event = CommandSucceededEvent(
+            timedelta(milliseconds=4), {"ok": 1}, "insert", 1, ("mongo-test", 27017), 1
+        )
+        # Motor runs driver calls on threads with a copy of the caller's context
+        context = contextvars.copy_context()
+        await asyncio.get_running_loop().run_in_executor(
+            None, context.run, database_timing_listener.succeeded, event
+        )
+        with timed("hashing"):
+            await asyncio.sleep(0.01)
+        return {"name": item.name}
+
+    app.include_router(router, prefix="/api")
+    if enabled:
+        app.add_middleware(ServerTimingMiddleware)
+    return TestClient(app)
+
+
+def parse(header):
+    """Milliseconds per metric name"""
+    return {
+        part.split(";")[0].strip(): float(part.split("dur=")[1].split(";")[0])
+        for part in header.split(",")
+    }
+
+
+class TestServerTiming:
+    """Test the header and the phases feeding it"""
+
+    @pytest.mark.backend
+    def test_header_breaks_down_request(self):
+        """Test that each phase shows up in the Server-Timing header"""
+        response = build_app().post("/api/items", json={"name": "a"})
+        assert response.status_code == 200
+        metrics = parse(response.headers["Server-Timing"])
+        assert metrics["db"] == pytest.approx(4.0)
+        assert metrics["hashing"] >= 10
+        assert "validation" in metrics
+        assert metrics["handler"] >= metrics["hashing"]
+        assert metrics["total"] >= metrics["handler"]
+        assert 'db;dur=4.00;desc="1 commands"' in response.headers["Server-Timing"]
+
+    @pytest.mark.backend
+    def test_rejected_request_counts_as_validation(self):
+        """Test that a 422 attributes its handler time to validation"""
+        response = build_app().post("/api/items", json={"wrong": 1})
+        assert response.status_code == 422
+        metrics = parse(response.headers["Server-Timing"])
+        assert metrics["validation"] == pytest.approx(metrics["handler"])
+
+    @pytest.mark.backend
+    def test_disabled(self):
+        """Test that routes work unchanged without the middleware"""
+        response = build_app(enabled=False).post("/api/items", json={"name": "a"})
+        assert response.status_code == 200
+        assert "Server-Timing" not in response.headers
+
+    @pytest.mark.backend
+    def test_header_format(self):
+        """Test the header syntax"""
+        assert server_timing_header([("db", 1.5, 2), ("total", 3.0, 1)]) == (
+            'db;dur=1.50;desc="2 commands", total;dur=3.00'
+        )
@@ -0,0 +1,74 @@
+"""
+Tests for incremental request body parsing
+"""
+
+import pytest
+import sys
+import os
+
+from fastapi import HTTPException
+
+# Add backend to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from uploads import iter_json_array, iter_ndjson
+
+
+async def chunked(text, size):
+    """Yield text as UTF-8 chunks of a fixed byte size"""
+    data = text.encode("utf-8")
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def parse(parser, text, size=3):
+    """Collect every item a parser yields"""
+    return [item async for item in parser(chunked(text, size))]
+
+
+class TestJsonArray:
+    """Test streamed JSON array parsing"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("size", [1, 2, 5, 1024])
+    async def test_items_split_across_chunks(self, size):
+        """Test that items are decoded correctly wherever chunks split"""
+        text = ' [{"name": "Zoë"}, 1234, [1, 2], "x"] '
+        assert await parse(iter_json_array, text, size) == [
+            {"name": "Zoë"}, 1234, [1, 2], "x"
+        ]
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_empty_array(self):
+        """Test that an empty array yields nothing"""
+        assert await parse(iter_json_array, "[]") == []
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("text", ['{"a": 1}', "[1, 2", "[1 2]", "[1]x", ""])
+    async def test_malformed_body(self, text):
+        """Test that malformed arrays are rejected with 400"""
+        with pytest.raises(HTTPException) as exc_info:
+            await parse(iter_json_array, text)
+        assert exc_info.value.status_code == 400
+
+
+class TestNdjson:
+    """Test streamed NDJSON parsing"""
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_lines(self):
+        """Test that blank lines are skipped and a final newline is optional"""
+        text = '{"a": 1}\n\n{"b": "é"}'
+        assert await parse(iter_ndjson, text, 2) == [{"a": 1}, {"b": "é"}]
+
+    @pytest.mark.backend
+    @pytest.mark.asyncio
+    async def test_invalid_line(self):
+        """Test that the failing line number is reported"""
+        with pytest.raises(HTTPException) as exc_info:
+            await parse(iter_ndjson, '{"a": 1}\nnot json\n')
+        assert "line 2" in exc_info.value.detail
@@ -0,0 +1,233 @@
+"""
+Server-Timing breakdown of API responses
+
+Each request gets a timing context that the layers it passes through feed:
+MongoDB command round trips (from a driver command listener), request
+parsing and validation, password hashing and JSON serialization. The
+totals are sent as a Server-Timing header, which browsers show in the
+network panel, and logged as one JSON line per request.
+
+Motor runs driver calls on worker threads with a copy of the caller's
+context, so the command listener finds the request's timings as well.
+With SERVER_TIMING off, every hook costs a single context variable lookup.
+"""
+
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Timing configuration
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+# Only requests at least this slow get a timing log line (0 logs every request)
+SERVER_TIMING_LOG_MS = float(os.getenv("SERVER_TIMING_LOG_MS", "0"))
+
+# Order of the metrics in the header
+PHASES = ("db", "validation", "hashing", "serialization")
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Time spent per phase while serving one request"""
+
+    __slots__ = ("started", "handler_started", "endpoint_started", "handler_seconds", "entries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.handler_started: Optional[float] = None
+        self.endpoint_started: Optional[float] = None
+        self.handler_seconds: Optional[float] = None
+        # list.append is atomic, so driver threads can add to it directly
+        self.entries: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        """Count seconds against a phase"""
+        self.entries.append((name, seconds))
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        """Total seconds and number of entries per phase"""
+        totals: Dict[str, Tuple[float, int]] = {}
+        for name, seconds in list(self.entries):
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + seconds, count + 1)
+        return totals
+
+    def metrics(self, elapsed: float) -> List[Tuple[str, float, int]]:
+        """
+        (name, milliseconds, count) per metric after elapsed seconds
+
+        handler is the time inside the route, which includes the phases
+        before it; middleware is everything else before the response started.
+        """
+        totals = self.totals()
+        metrics = [
+            (name, totals[name][0] * 1000, totals[name][1]) for name in PHASES if name in totals
+        ]
+        if self.handler_seconds is not None:
+            metrics.append(("handler", self.handler_seconds * 1000, 1))
+            metrics.append(
+                ("middleware", max(0.0, elapsed - self.handler_seconds) * 1000, 1)
+            )
+        metrics.append(("total", elapsed * 1000, 1))
+        return metrics
+
+
+@contextmanager
+def timed(name: str):
+    """Count the time spent in the block against a phase of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def server_timing_header(metrics: List[Tuple[str, float, int]]) -> str:
+    """Format metrics as a Server-Timing header value"""
+    parts = []
+    for name, milliseconds, count in metrics:
+        part = f"{name};dur={milliseconds:.2f}"
+        if name == "db":
+            part += f';desc="{count} commands"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an async endpoint so the time before it runs counts as validation"""
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timings = _current.get()
+        if timings is not None and timings.handler_started is not None:
+            timings.endpoint_started = time.perf_counter()
+            timings.add("validation", timings.endpoint_started - timings.handler_started)
+        return await endpoint(*args, **kwargs)
+
+    wrapper.__timed__ = True
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Route recording how long its handler ran and how long validation took
+
+    FastAPI reads the body and resolves dependencies between the handler
+    starting and the endpoint being called; that gap is the validation phase.
+    A request rejected before reaching the endpoint spent all of it there.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        # include_router re-creates routes from the already wrapped endpoint
+        if inspect.iscoroutinefunction(endpoint) and not getattr(endpoint, "__timed__", False):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = _current.get()
+            if timings is None:
+                return await handler(request)
+            timings.handler_started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                timings.handler_seconds = time.perf_counter() - timings.handler_started
+                if timings.endpoint_started is None:
+                    timings.add("validation", timings.handler_seconds)
+
+        return timed_handler
+
+
+class DatabaseTimingListener(monitoring.CommandListener):
+    """Counts MongoDB command round trips against the current request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        timings = _current.get()
+        if timings is not None:
+            timings.add("db", event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+# Registered on the client created by init_db
+database_timing_listener = DatabaseTimingListener()
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware opening a timing context per request and reporting it"""
+
+    def __init__(self, app: ASGIApp, log_threshold_ms: float = SERVER_TIMING_LOG_MS):
+        self.app = app
+        self.log_threshold_ms = log_threshold_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - timings.started
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", server_timing_header(timings.metrics(elapsed)))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._log(scope, status, timings)
+
+    def _log(self, scope: Scope, status: int, timings: RequestTimings) -> None:
+        # Includes what happened after the headers went out, e.g. streaming
+        elapsed = time.perf_counter() - timings.started
+        if elapsed * 1000 < self.log_threshold_ms:
+            return
+        route = getattr(scope.get("route"), "path", scope["path"])
+        logger.info(
+            "%s %s %s in %.1fms",
+            scope["method"],
+            route,
+            status,
+            elapsed * 1000,
+            extra={
+                "event": "request_timing",
+                "method": scope["method"],
+                "route": route,
+                "status": status,
+                "timings_ms": {
+                    name: round(milliseconds, 3)
+                    for name, milliseconds, _ in timings.metrics(elapsed)
+                },
+            },
+        )
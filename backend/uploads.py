@@ -0,0 +1,233 @@
+"""
+Incremental parsing of large request bodies
+
+Bulk endpoints accept thousands of items; items are decoded as the body
+arrives instead of buffering and parsing the whole payload at once. Uploads
+processed after the response is sent are spooled to a temporary file first.
+"""
+
+import codecs
+import csv
+import io
+import json
+import tempfile
+from typing import IO, Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+
+from pagination import NDJSON_MEDIA_TYPE
+
+
+# Uploads larger than this are spooled to disk instead of memory
+SPOOL_MEMORY_BYTES = 1024 * 1024
+CSV_MEDIA_TYPE = "text/csv"
+
+
+def media_type(request: Request) -> str:
+    """The request's Content-Type without parameters"""
+    content_type = request.headers.get("content-type", "")
+    return content_type.split(";")[0].strip().lower()
+
+
+def is_ndjson(request: Request) -> bool:
+    """Whether the request body is declared as NDJSON"""
+    return media_type(request) == NDJSON_MEDIA_TYPE
+
+
+def validation_detail(error: ValidationError) -> str:
+    """Flatten a pydantic ValidationError into one line"""
+    return "; ".join(
+        ".".join(str(part) for part in e["loc"]) + f": {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    )
+
+
+def invalid_body(reason: str) -> HTTPException:
+    """400 for a request body that cannot be parsed"""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Invalid request body: {reason}",
+    )
+
+
+async def _text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode UTF-8 chunks, carrying split multi-byte characters over"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        async for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise invalid_body("not UTF-8")
+    if tail:
+        yield tail
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Yield one decoded value per non-empty line"""
+    buffer = ""
+    line_number = 0
+    async for text in _text(chunks):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _loads(line, line_number)
+    if buffer.strip():
+        yield _loads(buffer, line_number + 1)
+
+
+def _loads(line: str, line_number: int) -> Any:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        raise invalid_body(f"line {line_number} is not valid JSON")
+
+
+# Parser states while reading a JSON array
+_START, _FIRST, _ITEM, _SEPARATOR, _DONE = range(5)
+
+
+def _drain_array(decoder: json.JSONDecoder, buffer: str, state: int, eof: bool):
+    """Decode every complete element in buffer; return items, rest and state"""
+    items = []
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            break
+        if state == _START:
+            if buffer[0] != "[":
+                raise invalid_body("expected a JSON array")
+            buffer, state = buffer[1:], _FIRST
+        elif state in (_FIRST, _SEPARATOR) and buffer[0] == "]":
+            buffer, state = buffer[1:], _DONE
+        elif state == _SEPARATOR:
+            if buffer[0] != ",":
+                raise invalid_body("malformed JSON array")
+            buffer, state = buffer[1:], _ITEM
+        elif state == _DONE:
+            raise invalid_body("unexpected data after the JSON array")
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise invalid_body("malformed JSON array")
+                break
+            # A value running to the end of the buffer (e.g. a number) may
+            # continue in the next chunk
+            if end == len(buffer) and not eof:
+                break
+            items.append(item)
+            buffer, state = buffer[end:], _SEPARATOR
+    return items, buffer, state
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Yield the elements of a top-level JSON array as each one completes"""
+    decoder = json.JSONDecoder()
+    buffer, state = "", _START
+    async for text in _text(chunks):
+        items, buffer, state = _drain_array(decoder, buffer + text, state, eof=False)
+        for item in items:
+            yield item
+    items, buffer, state = _drain_array(decoder, buffer, state, eof=True)
+    for item in items:
+        yield item
+    if state != _DONE:
+        raise invalid_body("unterminated JSON array")
+
+
+async def read_items(request: Request, max_items: int) -> AsyncIterator[Any]:
+    """
+    Stream items from a JSON array or NDJSON request body
+
+    Args:
+        request: Incoming request; NDJSON when its Content-Type says so
+        max_items: Items allowed before the request is rejected
+
+    Raises:
+        HTTPException: 400 if the body is malformed, 413 past max_items
+    """
+    parse = iter_ndjson if is_ndjson(request) else iter_json_array
+    count = 0
+    async for item in parse(request.stream()):
+        count += 1
+        if count > max_items:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {max_items} items may be sent per request",
+            )
+        yield item
+
+
+async def spool_body(request: Request, max_bytes: int) -> Tuple[IO[bytes], int]:
+    """
+    Copy the request body to a temporary file as it arrives
+
+    Args:
+        request: Incoming request
+        max_bytes: Largest body accepted
+
+    Returns:
+        The file, rewound, and the number of lines it holds
+
+    Raises:
+        HTTPException: 413 if the body exceeds max_bytes
+    """
+    upload = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    size = lines = 0
+    last = b"\n"
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Uploads are limited to {max_bytes} bytes",
+                )
+            if chunk:
+                upload.write(chunk)
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+    except BaseException:
+        upload.close()
+        raise
+    if last != b"\n":
+        lines += 1
+    upload.seek(0)
+    return upload, lines
+
+
+def read_rows(
+    upload: IO[bytes], ndjson: bool
+) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    Yield (row number, fields) for each row of a spooled CSV or NDJSON upload
+
+    CSV rows are keyed by the header row and empty cells are dropped so model
+    defaults apply. Rows that cannot be decoded are yielded as None.
+    """
+    text = io.TextIOWrapper(upload, encoding="utf-8", errors="replace", newline="")
+    if ndjson:
+        row_number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError:
+                value = None
+            yield row_number, value if isinstance(value, dict) else None
+    else:
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and isinstance(value, str) and value.strip()
+            }
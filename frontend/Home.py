@@ -4,7 +4,7 @@ Home page - Welcome and overview for ScottLMS
 
 import streamlit as st
 
-from components.utils import get_api_status, make_api_request
+from components.utils import get_api_status, get_stats, stat_value
 from config import PAGE_CONFIG, CUSTOM_CSS
 
 # Configure the page
@@ -50,31 +50,17 @@ st.markdown("### 📊 Quick Stats")
 if api_connected:
     col1, col2, col3 = st.columns(3)
 
-    # Get stats from API
-    users_result = make_api_request("GET", "/api/users/")
-    courses_result = make_api_request("GET", "/api/courses/")
-    enrollments_result = make_api_request("GET", "/api/enrollments/")
+    # Get aggregate counts from API (one request, cached server-side)
+    stats_result = get_stats()
 
     with col1:
-        if users_result["success"]:
-            user_count = len(users_result["data"])
-            st.metric("👥 Total Users", user_count)
-        else:
-            st.metric("👥 Total Users", "Error")
+        st.metric("👥 Total Users", stat_value(stats_result, "users"))
 
     with col2:
-        if courses_result["success"]:
-            course_count = len(courses_result["data"])
-            st.metric("📚 Total Courses", course_count)
-        else:
-            st.metric("📚 Total Courses", "Error")
+        st.metric("📚 Total Courses", stat_value(stats_result, "courses"))
 
     with col3:
-        if enrollments_result["success"]:
-            enrollment_count = len(enrollments_result["data"])
-            st.metric("📝 Total Enrollments", enrollment_count)
-        else:
-            st.metric("📝 Total Enrollments", "Error")
+        st.metric("📝 Total Enrollments", stat_value(stats_result, "enrollments"))
 else:
     st.error("📡 Cannot load stats - API is disconnected")
 
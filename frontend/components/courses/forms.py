@@ -4,7 +4,7 @@ Course form components
 
 import streamlit as st
 
-from components.utils import make_api_request
+from components.utils import MAX_PAGE_SIZE, make_api_request
 
 
 def create_course_form():
@@ -12,11 +12,13 @@ def create_course_form():
     st.subheader("➕ Create New Course")
 
     # Get users for instructor selection
-    users_result = make_api_request("GET", "/api/users/")
+    users_result = make_api_request(
+        "GET", "/api/users/", params={"role": "instructor", "limit": MAX_PAGE_SIZE}
+    )
     instructors = []
 
     if users_result["success"]:
-        instructors = [u for u in users_result["data"] if u.get("role") == "instructor"]
+        instructors = users_result["data"]
 
     with st.form("create_course"):
         col1, col2 = st.columns(2)
@@ -74,11 +76,13 @@ def edit_course_form(course):
     st.subheader("✏️ Edit Course")
 
     # Get users for instructor selection
-    users_result = make_api_request("GET", "/api/users/")
+    users_result = make_api_request(
+        "GET", "/api/users/", params={"role": "instructor", "limit": MAX_PAGE_SIZE}
+    )
     instructors = []
 
     if users_result["success"]:
-        instructors = [u for u in users_result["data"] if u.get("role") == "instructor"]
+        instructors = users_result["data"]
 
     with st.form(f"edit_course_{course.get('id')}"):
         col1, col2 = st.columns(2)
@@ -173,7 +177,8 @@ def delete_course_confirmation(course):
             result = make_api_request("DELETE", f"/api/courses/{course.get('id')}")
 
             if result["success"]:
-                st.success("✅ Course deleted successfully!")
+                # Enrollments are removed by a background job on the API
+                st.success("✅ Course deleted successfully! Its enrollments are being removed.")
                 del st.session_state.delete_course
                 st.rerun()
             else:
@@ -4,11 +4,20 @@ Course table and display components
 
 import streamlit as st
 
-from components.utils import make_api_request
+from components.shared import paginated_fetch
+from components.utils import fetch_by_ids, get_stats, stat_value
 from .forms import edit_course_form, delete_course_confirmation
 
+# Sort choices mapped to the API's ?sort= parameter
+SORT_OPTIONS = {
+    "Title": "title",
+    "Price": "-price",
+    "Status": "status",
+    "Created": "-created_at",
+}
 
-def display_course_details(course):
+
+def display_course_details(course, instructors=None):
     """Display detailed course information"""
     st.markdown("---")
     st.subheader(f"📖 Course Details: {course.get('title', '')}")
@@ -21,6 +30,11 @@ def display_course_details(course):
         st.markdown(f"**Price:** ${course.get('price', 0):.2f}")
         st.markdown(f"**Status:** {course.get('status', '').title()}")
         st.markdown(f"**Course ID:** {course.get('id', '')}")
+        instructor = (instructors or {}).get(course.get("instructor_id"))
+        if instructor:
+            st.markdown(
+                f"**Instructor:** {instructor.get('first_name', '')} {instructor.get('last_name', '')}"
+            )
         st.markdown(f"**Instructor ID:** {course.get('instructor_id', '')}")
 
     with col2:
@@ -54,123 +68,45 @@ def display_courses():
     """Display courses section"""
     st.subheader("📚 Courses")
 
-    # Get courses
-    result = make_api_request("GET", "/api/courses/")
+    # Metrics
+    stats = get_stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Courses", stat_value(stats, "courses"))
+    with col2:
+        st.metric("Published", stat_value(stats, "courses", "published"))
+    with col3:
+        st.metric("Drafts", stat_value(stats, "courses", "draft"))
+
+    # Search and filter
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        search_term = st.text_input(
+            "🔍 Search courses", placeholder="Search by title or description..."
+        )
+    with col2:
+        status_filter = st.selectbox(
+            "Filter by status", ["All", "published", "draft", "archived"]
+        )
+    with col3:
+        sort_by = st.selectbox("Sort by", list(SORT_OPTIONS))
+
+    # Filtering and sorting run in MongoDB; only the visible page is fetched
+    params = {
+        "search": search_term,
+        "status": None if status_filter == "All" else status_filter,
+        "sort": SORT_OPTIONS[sort_by],
+    }
+    result = paginated_fetch("courses", "/api/courses/", params)
 
     if result["success"]:
-        courses = result["data"]
-
-        # Metrics
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Courses", len(courses))
-        with col2:
-            published = len([c for c in courses if c.get("status") == "published"])
-            st.metric("Published", published)
-        with col3:
-            drafts = len([c for c in courses if c.get("status") == "draft"])
-            st.metric("Drafts", drafts)
-
-        # Search and filter
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            search_term = st.text_input(
-                "🔍 Search courses", placeholder="Search by title or description..."
-            )
-        with col2:
-            status_filter = st.selectbox(
-                "Filter by status", ["All", "published", "draft"]
+        if result["data"]:
+            # Resolve every instructor on the page with a single request
+            instructors = fetch_by_ids(
+                "/api/users/", [course.get("instructor_id") for course in result["data"]]
             )
-        with col3:
-            sort_by = st.selectbox("Sort by", ["Title", "Price", "Status", "Created"])
-
-        # Filter courses
-        filtered_courses = courses
-        if search_term:
-            filtered_courses = [
-                c
-                for c in filtered_courses
-                if search_term.lower() in c.get("title", "").lower()
-                or search_term.lower() in c.get("description", "").lower()
-            ]
-
-        if status_filter != "All":
-            filtered_courses = [
-                c for c in filtered_courses if c.get("status") == status_filter
-            ]
-
-        # Sort courses
-        if sort_by == "Title":
-            filtered_courses.sort(key=lambda x: x.get("title", ""))
-        elif sort_by == "Price":
-            filtered_courses.sort(key=lambda x: x.get("price", 0), reverse=True)
-        elif sort_by == "Status":
-            filtered_courses.sort(key=lambda x: x.get("status", ""))
-        elif sort_by == "Created":
-            filtered_courses.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-
-        # Display filtered results
-        if filtered_courses:
-            st.info(f"Showing {len(filtered_courses)} of {len(courses)} courses")
-
-            # Pagination
-            items_per_page = 5
-            total_pages = (len(filtered_courses) + items_per_page - 1) // items_per_page
-
-            if total_pages > 1:
-                # Initialize page state
-                if "courses_current_page" not in st.session_state:
-                    st.session_state.courses_current_page = 1
-
-                # Navigation controls with better column spacing
-                nav_col1, nav_col2, nav_col3 = st.columns([2, 3, 2])
-
-                with nav_col1:
-                    if st.button(
-                        "⬅️ Prev",
-                        disabled=st.session_state.courses_current_page <= 1,
-                        key="courses_prev",
-                    ):
-                        st.session_state.courses_current_page -= 1
-                        st.rerun()
-
-                with nav_col2:
-                    page = st.selectbox(
-                        "Page",
-                        range(1, total_pages + 1),
-                        index=st.session_state.courses_current_page - 1,
-                        key="courses_page_selector",
-                        on_change=lambda: setattr(
-                            st.session_state,
-                            "courses_current_page",
-                            st.session_state.courses_page_selector,
-                        ),
-                    )
-
-                with nav_col3:
-                    if st.button(
-                        "Next ➡️",
-                        disabled=st.session_state.courses_current_page >= total_pages,
-                        key="courses_next",
-                    ):
-                        st.session_state.courses_current_page += 1
-                        st.rerun()
-
-                # Calculate start and end indices
-                start_idx = (st.session_state.courses_current_page - 1) * items_per_page
-                end_idx = min(start_idx + items_per_page, len(filtered_courses))
-
-                st.info(
-                    f"Showing courses {start_idx + 1}-{end_idx} of {len(filtered_courses)}"
-                )
-
-                # Display courses for current page
-                for course in filtered_courses[start_idx:end_idx]:
-                    display_course_details(course)
-            else:
-                # Display all courses if only one page
-                for course in filtered_courses:
-                    display_course_details(course)
+            for course in result["data"]:
+                display_course_details(course, instructors)
         else:
             st.info("No courses found matching your criteria")
     else:
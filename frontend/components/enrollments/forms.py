@@ -4,7 +4,7 @@ Enrollment form components
 
 import streamlit as st
 
-from components.utils import make_api_request
+from components.utils import MAX_PAGE_SIZE, make_api_request
 
 
 def create_enrollment_form():
@@ -12,17 +12,21 @@ def create_enrollment_form():
     st.subheader("➕ Create New Enrollment")
 
     # Get users and courses
-    users_result = make_api_request("GET", "/api/users/")
-    courses_result = make_api_request("GET", "/api/courses/")
+    users_result = make_api_request(
+        "GET", "/api/users/", params={"role": "student", "limit": MAX_PAGE_SIZE}
+    )
+    courses_result = make_api_request(
+        "GET", "/api/courses/", params={"status": "published", "limit": MAX_PAGE_SIZE}
+    )
 
     students = []
     courses = []
 
     if users_result["success"]:
-        students = [u for u in users_result["data"] if u.get("role") == "student"]
+        students = users_result["data"]
 
     if courses_result["success"]:
-        courses = [c for c in courses_result["data"] if c.get("status") == "published"]
+        courses = courses_result["data"]
 
     with st.form("create_enrollment"):
         col1, col2 = st.columns(2)
@@ -9,6 +9,7 @@ from .password_validation import (
     display_password_requirements_checklist,
     display_password_strength,
 )
+from .pagination import paginated_fetch
 
 __all__ = [
     "validate_password",
@@ -16,4 +17,5 @@ __all__ = [
     "display_inline_password_requirements",
     "display_password_requirements_checklist",
     "display_password_strength",
+    "paginated_fetch",
 ]
@@ -0,0 +1,70 @@
+"""
+Cursor pagination controls for list tables
+"""
+
+from typing import Dict
+
+import streamlit as st
+
+from components.utils import fetch_page
+
+
+def paginated_fetch(key: str, endpoint: str, params: Dict, page_size: int = 5) -> Dict:
+    """
+    Fetch the page currently shown in a table and render Prev/Next controls
+
+    Cursors of the pages visited so far are kept in session state so Prev can
+    step back; they are reset whenever the filters or sort order change.
+
+    Args:
+        key: Session state prefix unique to the table
+        endpoint: Paginated list endpoint
+        params: Filter and sort query parameters
+        page_size: Number of rows per page
+
+    Returns:
+        fetch_page result for the current page
+    """
+    cursors_key = f"{key}_cursors"
+    filters_key = f"{key}_filters"
+
+    signature = repr(sorted(params.items()))
+    if st.session_state.get(filters_key) != signature:
+        st.session_state[filters_key] = signature
+        st.session_state[cursors_key] = [None]
+
+    cursors = st.session_state[cursors_key]
+    result = fetch_page(endpoint, {**params, "limit": page_size, "after": cursors[-1]})
+    if not result["success"]:
+        return result
+
+    page_number = len(cursors)
+    total_pages = max(1, (result["total"] + page_size - 1) // page_size)
+
+    if total_pages > 1:
+        # Navigation controls with better column spacing
+        nav_col1, nav_col2, nav_col3 = st.columns([2, 3, 2])
+
+        with nav_col1:
+            if st.button("⬅️ Prev", disabled=page_number <= 1, key=f"{key}_prev"):
+                cursors.pop()
+                st.rerun()
+
+        with nav_col2:
+            st.markdown(f"Page {page_number} of {total_pages}")
+
+        with nav_col3:
+            if st.button(
+                "Next ➡️", disabled=not result["next_cursor"], key=f"{key}_next"
+            ):
+                cursors.append(result["next_cursor"])
+                st.rerun()
+
+    start_idx = (page_number - 1) * page_size
+    if result["data"]:
+        st.info(
+            f"Showing {key} {start_idx + 1}-{start_idx + len(result['data'])} "
+            f"of {result['total']}"
+        )
+
+    return result
@@ -224,7 +224,8 @@ def delete_user_confirmation(user):
             result = make_api_request("DELETE", f"/api/users/{user.get('id')}")
 
             if result["success"]:
-                st.success("✅ User deleted successfully!")
+                # Enrollments are removed by a background job on the API
+                st.success("✅ User deleted successfully! Their enrollments are being removed.")
                 del st.session_state.delete_user
                 st.rerun()
             else:
@@ -2,14 +2,77 @@
 Utility functions for the frontend
 """
 
-from typing import Any, Dict
+import copy
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
 
 import requests
 
 from config import API_BASE_URL
 
+# Largest page the API accepts (MAX_PAGE_SIZE on the backend)
+MAX_PAGE_SIZE = 500
 
-def make_api_request(method: str, endpoint: str, data: Dict = None) -> Dict:
+# Responses kept for revalidation with If-None-Match, keyed by URL and params
+MAX_CACHED_RESPONSES = 128
+_etag_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+
+
+def _cache_key(url: str, params: Dict = None) -> Tuple:
+    return (url, tuple(sorted((params or {}).items())))
+
+
+def _cached_result(key: Tuple) -> Dict:
+    """Result of the cached response for key, copied so callers can modify it"""
+    _etag_cache.move_to_end(key)
+    cached = _etag_cache[key]
+    return {
+        "success": True,
+        "data": copy.deepcopy(cached["data"]),
+        "headers": cached["headers"],
+    }
+
+
+def _remember(key: Tuple, response) -> None:
+    """Keep a GET response that carries an ETag for later revalidation"""
+    etag = response.headers.get("ETag")
+    if not isinstance(etag, str):
+        return
+    _etag_cache[key] = {
+        "etag": etag,
+        "data": copy.deepcopy(response.json()),
+        "headers": response.headers,
+    }
+    _etag_cache.move_to_end(key)
+    while len(_etag_cache) > MAX_CACHED_RESPONSES:
+        _etag_cache.popitem(last=False)
+
+
+def parse_server_timing(header: Any) -> Dict[str, float]:
+    """
+    Milliseconds per metric from a Server-Timing header
+
+    e.g. 'db;dur=12.50;desc="3 commands", total;dur=20.00' gives
+    {"db": 12.5, "total": 20.0}
+    """
+    if not isinstance(header, str):
+        return {}
+    timing = {}
+    for metric in header.split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur" and name:
+                try:
+                    timing[name] = float(value)
+                except ValueError:
+                    pass
+    return timing
+
+
+def make_api_request(
+    method: str, endpoint: str, data: Dict = None, params: Dict = None
+) -> Dict:
     """Make API request and handle errors"""
     try:
         url = f"{API_BASE_URL}{endpoint}"
@@ -18,7 +81,17 @@ def make_api_request(method: str, endpoint: str, data: Dict = None) -> Dict:
         headers = {"User-Agent": "ScottLMS-Frontend/1.0"}
 
         if method.upper() == "GET":
-            response = requests.get(url, headers=headers, timeout=10)
+            # Revalidate a previous copy; unchanged data comes back as an empty 304
+            key = _cache_key(url, params)
+            if key in _etag_cache:
+                headers["If-None-Match"] = _etag_cache[key]["etag"]
+            response = requests.get(url, params=params, headers=headers, timeout=10)
+            if response.status_code == 304 and key in _etag_cache:
+                result = _cached_result(key)
+                result["timing"] = parse_server_timing(response.headers.get("Server-Timing"))
+                return result
+            if response.status_code == 200:
+                _remember(key, response)
         elif method.upper() == "POST":
             response = requests.post(url, json=data, headers=headers, timeout=10)
         elif method.upper() == "PUT":
@@ -26,12 +99,18 @@ def make_api_request(method: str, endpoint: str, data: Dict = None) -> Dict:
         elif method.upper() == "DELETE":
             response = requests.delete(url, headers=headers, timeout=10)
 
-        if response.status_code in [200, 201, 204]:
+        if response.status_code in [200, 201, 202, 204]:
             # Handle 204 No Content (successful DELETE) which has no response body
             if response.status_code == 204:
                 return {"success": True, "data": None}
             else:
-                return {"success": True, "data": response.json()}
+                return {
+                    "success": True,
+                    "data": response.json(),
+                    "headers": response.headers,
+                    # Where the API spent its time, for diagnosing slow calls
+                    "timing": parse_server_timing(response.headers.get("Server-Timing")),
+                }
         else:
             return {
                 "success": False,
@@ -49,6 +128,54 @@ def make_api_request(method: str, endpoint: str, data: Dict = None) -> Dict:
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
 
 
+def fetch_page(endpoint: str, params: Dict = None) -> Dict:
+    """
+    Fetch one page from a paginated list endpoint
+
+    Adds "total" (from X-Total-Count) and "next_cursor" (from X-Next-Cursor)
+    to the result of make_api_request.
+    """
+    # Drop unset filters so they are not sent as empty strings
+    params = {k: v for k, v in (params or {}).items() if v not in (None, "", [])}
+    result = make_api_request("GET", endpoint, params=params)
+    if result["success"]:
+        headers = result.get("headers") or {}
+        result["total"] = int(headers.get("X-Total-Count", len(result["data"])))
+        result["next_cursor"] = headers.get("X-Next-Cursor")
+    return result
+
+
+def fetch_by_ids(endpoint: str, ids: List[str]) -> Dict[str, Dict]:
+    """
+    Fetch several documents from a list endpoint in one request
+
+    Returns a dict keyed by ID; IDs that failed to resolve are left out, so
+    callers can fall back to showing the raw ID.
+    """
+    ids = sorted({id_ for id_ in ids if id_})
+    if not ids:
+        return {}
+    result = make_api_request("GET", endpoint, params={"ids": ",".join(ids)})
+    if not result["success"]:
+        return {}
+    return {document["id"]: document for document in result["data"]}
+
+
+def get_stats() -> Dict:
+    """Fetch totals and breakdowns for users, courses and enrollments"""
+    return make_api_request("GET", "/api/stats/")
+
+
+def stat_value(stats_result: Dict, collection: str, breakdown: str = None) -> Any:
+    """Read one count from a get_stats result, or "Error" if unavailable"""
+    if not stats_result["success"]:
+        return "Error"
+    counts = stats_result["data"][collection]
+    if breakdown is None:
+        return counts["total"]
+    return counts["breakdown"].get(breakdown, 0)
+
+
 def get_api_status() -> Dict:
     """Check API connection status"""
     return make_api_request("GET", "/health")
@@ -2,7 +2,13 @@
 Tests for frontend utilities
 """
 
-from components.utils import make_api_request
+from components.utils import (
+    fetch_by_ids,
+    fetch_page,
+    make_api_request,
+    parse_server_timing,
+    stat_value,
+)
 import pytest
 import os
 import sys
@@ -47,6 +53,20 @@ class TestFrontendUtils:
             assert result["data"]["id"] == "123"
             mock_post.assert_called_once()
 
+    @pytest.mark.frontend
+    def test_make_api_request_accepted(self):
+        """Test that 202 Accepted (queued cascade delete) counts as success"""
+        with patch("requests.delete") as mock_delete:
+            mock_response = Mock()
+            mock_response.json.return_value = {"id": "job-1", "status": "pending"}
+            mock_response.status_code = 202
+            mock_delete.return_value = mock_response
+
+            result = make_api_request("DELETE", "/api/users/123")
+
+            assert result["success"] is True
+            assert result["data"]["id"] == "job-1"
+
     @pytest.mark.frontend
     def test_make_api_request_connection_error(self):
         """Test connection error handling"""
@@ -65,3 +85,85 @@ class TestFrontendUtils:
 
         assert result["success"] is False
         assert "Unexpected error" in result["error"]
+
+    @pytest.mark.frontend
+    def test_get_revalidates_with_etag(self):
+        """Test that an unchanged list is reused after a 304"""
+        with patch("requests.get") as mock_get:
+            fresh = Mock()
+            fresh.status_code = 200
+            fresh.json.return_value = [{"id": "1"}]
+            fresh.headers = {"ETag": '"v1"', "X-Total-Count": "1"}
+            not_modified = Mock()
+            not_modified.status_code = 304
+            not_modified.headers = {"ETag": '"v1"'}
+            mock_get.side_effect = [fresh, not_modified]
+
+            make_api_request("GET", "/api/etag-test/")
+            result = make_api_request("GET", "/api/etag-test/")
+
+            assert result["success"] is True
+            assert result["data"] == [{"id": "1"}]
+            assert mock_get.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+
+    @pytest.mark.frontend
+    def test_server_timing_is_parsed(self):
+        """Test that the API's time breakdown is returned with the result"""
+        header = 'db;dur=12.50;desc="3 commands", hashing;dur=180, total;dur=200.25'
+        assert parse_server_timing(header) == {"db": 12.5, "hashing": 180.0, "total": 200.25}
+        assert parse_server_timing(None) == {}
+        with patch("requests.post") as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 201
+            mock_response.json.return_value = {"id": "1"}
+            mock_response.headers = {"Server-Timing": header}
+            mock_post.return_value = mock_response
+
+            result = make_api_request("POST", "/api/enrollments/", data={})
+
+            assert result["timing"]["hashing"] == 180.0
+
+    @pytest.mark.frontend
+    def test_fetch_page_reads_pagination_headers(self):
+        """Test that fetch_page exposes total count and next cursor"""
+        with patch("requests.get") as mock_get:
+            mock_response = Mock()
+            mock_response.json.return_value = [{"id": "1"}]
+            mock_response.status_code = 200
+            mock_response.headers = {"X-Total-Count": "42", "X-Next-Cursor": "abc"}
+            mock_get.return_value = mock_response
+
+            result = fetch_page("/api/users/", {"role": "student", "search": ""})
+
+            assert result["total"] == 42
+            assert result["next_cursor"] == "abc"
+            assert mock_get.call_args.kwargs["params"] == {"role": "student"}
+
+    @pytest.mark.frontend
+    def test_fetch_by_ids_makes_one_request(self):
+        """Test that IDs are resolved with a single ?ids= request"""
+        with patch("requests.get") as mock_get:
+            mock_response = Mock()
+            mock_response.json.return_value = [{"id": "a", "first_name": "Ada"}]
+            mock_response.status_code = 200
+            mock_response.headers = {}
+            mock_get.return_value = mock_response
+
+            result = fetch_by_ids("/api/users/", ["b", "a", "a", None])
+
+            assert result == {"a": {"id": "a", "first_name": "Ada"}}
+            mock_get.assert_called_once()
+            assert mock_get.call_args.kwargs["params"] == {"ids": "a,b"}
+
+    @pytest.mark.frontend
+    def test_stat_value(self):
+        """Test reading totals and breakdowns from a stats result"""
+        stats = {
+            "success": True,
+            "data": {"users": {"total": 7, "breakdown": {"student": 5}}},
+        }
+
+        assert stat_value(stats, "users") == 7
+        assert stat_value(stats, "users", "student") == 5
+        assert stat_value(stats, "users", "admin") == 0
+        assert stat_value({"success": False, "error": "down"}, "users") == "Error"
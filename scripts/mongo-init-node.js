@@ -87,14 +87,12 @@ async function initDatabase() {
             }
         });
         
-        // Create indexes for better performance
+        // Create unique indexes so seed data respects them; the full index set
+        // is declared on the Beanie models and synced by the API at startup
         console.log('🔍 Creating indexes...');
         await db.collection('users').createIndex({ 'email': 1 }, { unique: true });
         await db.collection('users').createIndex({ 'username': 1 }, { unique: true });
-        await db.collection('courses').createIndex({ 'instructor_id': 1 });
-        await db.collection('courses').createIndex({ 'title': 'text', 'description': 'text' });
         await db.collection('enrollments').createIndex({ 'user_id': 1, 'course_id': 1 }, { unique: true });
-        await db.collection('enrollments').createIndex({ 'course_id': 1 });
         
         // Generate bcrypt hashes
         console.log('🔐 Generating secure password hashes...');